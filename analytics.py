@@ -0,0 +1,218 @@
+"""
+Revenue Analytics
+Occupancy, ADR, RevPAR and booking pace over any date range, aggregated on NumPy columns
+"""
+
+from datetime import timedelta
+
+import numpy as np
+
+from stats import REVENUE_STATUSES
+
+DEFAULT_PACE_HORIZON = 90
+MAX_RANGE_DAYS = 366
+
+# julianday() of a date minus this is its Python date ordinal
+_JULIAN_ORDINAL_OFFSET = 1721424.5
+
+# Stays are sold room nights: bookings whose price counts as revenue. Archived
+# bookings (see lifecycle.py) are past stays too, so they are read alongside.
+_STAY_COLUMNS = f'''
+    room_id,
+    CAST(julianday(check_in_date) - {_JULIAN_ORDINAL_OFFSET} AS INTEGER),
+    CAST(julianday(check_out_date) - {_JULIAN_ORDINAL_OFFSET} AS INTEGER),
+    CAST(julianday(date(created_at)) - {_JULIAN_ORDINAL_OFFSET} AS INTEGER),
+    total_price
+'''
+
+
+def _rows(conn, query, params=()):
+    """fetchall() as plain tuples, whatever the connection's row factory"""
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    return cursor.execute(query, params).fetchall()
+
+
+def load_rooms(conn, hotel_id=None):
+    """Rooms as columns {room_id, hotel_id, room_type}, sorted by room_id"""
+    query = 'SELECT id, hotel_id, room_type FROM rooms'
+    params = ()
+    if hotel_id is not None:
+        query += ' WHERE hotel_id = ?'
+        params = (hotel_id,)
+    rows = _rows(conn, query + ' ORDER BY id', params)
+    return {
+        'room_id': np.array([row[0] for row in rows], dtype=np.int64),
+        'hotel_id': np.array([row[1] for row in rows], dtype=np.int64),
+        'room_type': np.array([row[2] for row in rows], dtype=object),
+    }
+
+
+def load_stays(conn, start, end, hotel_id=None):
+    """Revenue bookings overlapping nights [start, end) as columns.
+
+    {room_id, check_in, check_out, booked (day ordinals), price}; one
+    query per table, no per-row Python work beyond building the arrays.
+    """
+    statuses = ', '.join('?' for _ in REVENUE_STATUSES)
+    where = f'status IN ({statuses}) AND check_in_date < ? AND check_out_date > ?'
+    params = [*REVENUE_STATUSES, end.isoformat(), start.isoformat()]
+    if hotel_id is not None:
+        where += ' AND hotel_id = ?'
+        params.append(hotel_id)
+
+    query = f'SELECT {_STAY_COLUMNS} FROM bookings WHERE {where}'
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'bookings_archive'").fetchone():
+        query += f' UNION ALL SELECT {_STAY_COLUMNS} FROM bookings_archive WHERE {where}'
+        params = params * 2
+
+    data = np.array(_rows(conn, query, params), dtype=np.float64).reshape(-1, 5)
+    return {
+        'room_id': data[:, 0].astype(np.int64),
+        'check_in': data[:, 1].astype(np.int64),
+        'check_out': data[:, 2].astype(np.int64),
+        'booked': data[:, 3].astype(np.int64),
+        'price': data[:, 4],
+    }
+
+
+def _nights_in_range(stays, start, end):
+    """(nights of each stay inside [start, end), revenue of those nights)"""
+    first = np.maximum(stays['check_in'], start.toordinal())
+    last = np.minimum(stays['check_out'], end.toordinal())
+    nights = np.clip(last - first, 0, None)
+    length = np.maximum(stays['check_out'] - stays['check_in'], 1)
+    return nights, nights * (stays['price'] / length)
+
+
+def performance(conn, start, end, hotel_id=None):
+    """Room nights available and sold, and revenue, per hotel and room type over [start, end).
+
+    Returns sums only, so results from several hotel shards combine with
+    merge_performance(), which adds the ratios.
+    """
+    days = (end - start).days
+    rooms = load_rooms(conn, hotel_id)
+    stays = load_stays(conn, start, end, hotel_id)
+
+    # Segment (hotel, room type) of every room, then of every stay via its room
+    type_names, type_codes = np.unique(rooms['room_type'].astype(str), return_inverse=True)
+    segment_keys, room_segment = np.unique(rooms['hotel_id'] * len(type_names) + type_codes, return_inverse=True)
+    position = np.searchsorted(rooms['room_id'], stays['room_id'])
+    known = position < len(rooms['room_id'])
+    known[known] = rooms['room_id'][position[known]] == stays['room_id'][known]
+    stays = {name: column[known] for name, column in stays.items()}
+    stay_segment = room_segment[position[known]]
+
+    nights, revenue = _nights_in_range(stays, start, end)
+    segment_count = len(segment_keys)
+    room_counts = np.bincount(room_segment, minlength=segment_count)
+    sold = np.bincount(stay_segment, weights=nights, minlength=segment_count)
+    earned = np.bincount(stay_segment, weights=revenue, minlength=segment_count)
+
+    # Rooms sold per night: +1 on each stay's first night in range, -1 after its last
+    changes = np.zeros(days + 1, dtype=np.int64)
+    first = np.clip(stays['check_in'] - start.toordinal(), 0, days)
+    last = np.clip(stays['check_out'] - start.toordinal(), 0, days)
+    np.add.at(changes, first, 1)
+    np.add.at(changes, last, -1)
+
+    return {
+        'segments': [
+            {'hotel_id': int(key // len(type_names)), 'room_type': str(type_names[key % len(type_names)]),
+             'rooms': int(count), 'room_nights_sold': int(sold_nights), 'revenue': float(amount)}
+            for key, count, sold_nights, amount in zip(segment_keys, room_counts, sold, earned)
+        ],
+        'rooms_sold': np.cumsum(changes[:days]).tolist(),
+    }
+
+
+def _kpis(rooms, days, sold, revenue):
+    available = rooms * days
+    return {
+        'rooms': rooms,
+        'room_nights_available': available,
+        'room_nights_sold': sold,
+        'revenue': round(revenue, 2),
+        'occupancy': round(sold / available, 4) if available else None,
+        'adr': round(revenue / sold, 2) if sold else None,
+        'revpar': round(revenue / available, 2) if available else None,
+    }
+
+
+def merge_performance(parts, start, end):
+    """Occupancy, ADR and RevPAR in total, per hotel and per room type, plus nightly occupancy"""
+    days = (end - start).days
+    segments = [segment for part in parts for segment in part['segments']]
+    rooms_sold = np.sum([part['rooms_sold'] for part in parts], axis=0)
+
+    hotels = {}
+    for segment in segments:
+        hotel = hotels.setdefault(segment['hotel_id'], [0, 0, 0.0])
+        hotel[0] += segment['rooms']
+        hotel[1] += segment['room_nights_sold']
+        hotel[2] += segment['revenue']
+    total_rooms = sum(hotel[0] for hotel in hotels.values())
+
+    return {
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'nights': days,
+        'total': _kpis(total_rooms, days, sum(hotel[1] for hotel in hotels.values()),
+                       sum(hotel[2] for hotel in hotels.values())),
+        'hotels': [dict(_kpis(rooms, days, sold, revenue), hotel_id=hotel_id)
+                   for hotel_id, (rooms, sold, revenue) in sorted(hotels.items())],
+        'room_types': [
+            dict(_kpis(segment['rooms'], days, segment['room_nights_sold'], segment['revenue']),
+                 hotel_id=segment['hotel_id'], room_type=segment['room_type'])
+            for segment in sorted(segments, key=lambda segment: (segment['hotel_id'], segment['room_type']))
+        ],
+        'daily': [
+            {'date': (start + timedelta(days=offset)).isoformat(), 'rooms_sold': int(count),
+             'occupancy': round(int(count) / total_rooms, 4) if total_rooms else None}
+            for offset, count in enumerate(rooms_sold)
+        ],
+    }
+
+
+def pace(conn, start, end, hotel_id=None, horizon=DEFAULT_PACE_HORIZON):
+    """Room nights and revenue in [start, end) on the books n days before start, n = horizon..0.
+
+    Index n of the returned lists counts bookings made on or before
+    start - n days; bookings made after start are summed as pickup.
+    Returns sums only, for merge_pace().
+    """
+    stays = load_stays(conn, start, end, hotel_id)
+    nights, revenue = _nights_in_range(stays, start, end)
+    lead = start.toordinal() - stays['booked']
+    ahead = lead >= 0
+    bucket = np.minimum(lead[ahead], horizon)
+    # On the books n days out = bookings with lead >= n: a reversed cumulative sum
+    room_nights = np.cumsum(np.bincount(bucket, weights=nights[ahead], minlength=horizon + 1)[::-1])[::-1]
+    earned = np.cumsum(np.bincount(bucket, weights=revenue[ahead], minlength=horizon + 1)[::-1])[::-1]
+    return {
+        'room_nights': room_nights.tolist(),
+        'revenue': earned.tolist(),
+        'pickup_room_nights': float(nights[~ahead].sum()),
+        'pickup_revenue': float(revenue[~ahead].sum()),
+    }
+
+
+def merge_pace(parts, start, end, horizon=DEFAULT_PACE_HORIZON):
+    """Booking pace curve from one or more pace() results"""
+    room_nights = np.sum([part['room_nights'] for part in parts], axis=0)
+    revenue = np.sum([part['revenue'] for part in parts], axis=0)
+    return {
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'horizon': horizon,
+        'curve': [
+            {'days_before': days_before, 'as_of': (start - timedelta(days=days_before)).isoformat(),
+             'room_nights': int(room_nights[days_before]), 'revenue': round(float(revenue[days_before]), 2)}
+            for days_before in range(horizon, -1, -1)
+        ],
+        'pickup': {
+            'room_nights': int(sum(part['pickup_room_nights'] for part in parts)),
+            'revenue': round(sum(part['pickup_revenue'] for part in parts), 2),
+        },
+    }
@@ -0,0 +1,96 @@
+"""
+Availability Engine
+Set-based room availability lookups for the SmartStay Hotel Booking System
+"""
+
+# Booking statuses that occupy a room for their date range
+OCCUPYING_STATUSES = ('confirmed', 'pending')
+
+# Stay under SQLite's default host parameter limit (999) per statement
+MAX_IDS_PER_QUERY = 900
+
+
+def occupying_clause(booking_alias='b'):
+    """SQL fragment matching bookings that occupy their room.
+
+    A pending booking with hold_expires_at is a checkout hold and stops
+    counting the moment it expires, before any sweep deletes it.
+    """
+    statuses = ', '.join(f"'{status}'" for status in OCCUPYING_STATUSES)
+    return (
+        f'{booking_alias}.status IN ({statuses}) '
+        f'AND ({booking_alias}.hold_expires_at IS NULL OR {booking_alias}.hold_expires_at > CURRENT_TIMESTAMP)'
+    )
+
+
+def overlap_clause(booking_alias='b'):
+    """SQL fragment matching occupying bookings that overlap a stay.
+
+    Expects two parameters in order: check_out, check_in.
+    """
+    return (
+        f'{occupying_clause(booking_alias)} '
+        f'AND {booking_alias}.check_in_date < ? AND {booking_alias}.check_out_date > ?'
+    )
+
+
+def free_room_clause(room_alias='r'):
+    """Anti-join fragment keeping only rooms with no overlapping booking.
+
+    Append to a rooms query with ``AND``; expects check_out, check_in params.
+    """
+    return (
+        'NOT EXISTS (SELECT 1 FROM bookings b '
+        f'WHERE b.room_id = {room_alias}.id AND {overlap_clause("b")})'
+    )
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def booked_room_ids(conn, room_ids, check_in, check_out, exclude_booking_id=None):
+    """Return the subset of room_ids that have an overlapping booking"""
+    room_ids = list(dict.fromkeys(room_ids))
+    booked = set()
+
+    for chunk in _chunks(room_ids, MAX_IDS_PER_QUERY):
+        placeholders = ', '.join('?' for _ in chunk)
+        query = f'''
+            SELECT DISTINCT b.room_id FROM bookings b
+            WHERE b.room_id IN ({placeholders})
+            AND {overlap_clause("b")}
+        '''
+        params = list(chunk) + [check_out, check_in]
+
+        if exclude_booking_id:
+            query += ' AND b.booking_id != ?'
+            params.append(exclude_booking_id)
+
+        booked.update(row[0] for row in conn.execute(query, params))
+
+    return booked
+
+
+def existing_room_ids(conn, room_ids):
+    """Return the subset of room_ids that name a room"""
+    existing = set()
+    for chunk in _chunks(list(dict.fromkeys(room_ids)), MAX_IDS_PER_QUERY):
+        existing.update(row[0] for row in conn.execute(
+            f"SELECT id FROM rooms WHERE id IN ({', '.join('?' for _ in chunk)})", chunk
+        ))
+    return existing
+
+
+def available_room_ids(conn, room_ids, check_in, check_out, exclude_booking_id=None):
+    """Return room_ids that are free for the whole stay, preserving order"""
+    booked = booked_room_ids(conn, room_ids, check_in, check_out, exclude_booking_id)
+    return [room_id for room_id in dict.fromkeys(room_ids) if room_id not in booked]
+
+
+def availability_map(conn, room_ids, check_in, check_out):
+    """Return {room_id: available} for every requested room; unknown rooms are unavailable"""
+    existing = existing_room_ids(conn, room_ids)
+    booked = booked_room_ids(conn, existing, check_in, check_out)
+    return {room_id: room_id in existing and room_id not in booked for room_id in room_ids}
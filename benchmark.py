@@ -0,0 +1,412 @@
+"""
+Route Benchmarks
+Seeds a synthetic database and measures latency, throughput and SQL query counts
+for the hot HTTP routes, through Flask's test client or a local gunicorn
+
+Usage:
+    python benchmark.py run --scale small --requests 200 --output baseline.json
+    python benchmark.py run --mode gunicorn --workers 4 --concurrency 8 --output current.json
+    python benchmark.py compare baseline.json current.json --threshold 0.15
+"""
+
+import argparse
+import http.cookiejar
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from datetime import date, datetime, timedelta
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+SCALES = {
+    'tiny': dict(hotels=5, rooms_per_hotel=10, users=50, bookings=1000, reviews=200),
+    'small': dict(hotels=20, rooms_per_hotel=25, users=500, bookings=20000, reviews=5000),
+    'medium': dict(hotels=100, rooms_per_hotel=40, users=5000, bookings=200000, reviews=50000),
+    'large': dict(hotels=300, rooms_per_hotel=100, users=20000, bookings=2000000, reviews=300000),
+}
+
+ROUTES = ['search', 'hotel_detail', 'room_detail', 'create_booking', 'my_bookings', 'admin_dashboard']
+
+ADMIN_EMAIL = 'bench-admin@example.com'
+GUEST_EMAIL = 'bench-guest@example.com'
+PASSWORD = 'password123'
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, int(round(pct / 100.0 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+# Database seeding
+
+def seed_database(path, scale, seed):
+    """Create and populate a benchmark database; returns seconds spent seeding"""
+    os.environ['DATABASE_PATH'] = path
+    import hotel
+    from datagen import generate
+    from stats import reconcile
+    from werkzeug.security import generate_password_hash
+
+    hotel.init_db(path)
+    conn = hotel.connect(path)
+    password = generate_password_hash(PASSWORD)
+    conn.executemany(
+        'INSERT OR IGNORE INTO users (name, email, password, role) VALUES (?, ?, ?, ?)',
+        [('Bench Admin', ADMIN_EMAIL, password, 'admin'), ('Bench Guest', GUEST_EMAIL, password, 'guest')]
+    )
+    conn.commit()
+
+    started = time.perf_counter()
+    generate(conn, seed=seed, **scale)
+    reconcile(conn)
+    seeded_in = time.perf_counter() - started
+    conn.close()
+    return seeded_in
+
+
+def load_targets(path):
+    """Hotel, room and city values to drive the scenarios with"""
+    import sqlite3
+    conn = sqlite3.connect(path)
+    targets = {
+        'hotel_ids': [row[0] for row in conn.execute('SELECT id FROM hotels')],
+        'room_ids': [row[0] for row in conn.execute('SELECT id FROM rooms')],
+        'cities': [row[0] for row in conn.execute('SELECT DISTINCT city FROM hotels')],
+    }
+    conn.close()
+    return targets
+
+
+# Scenarios: each returns (method, path, json_body, session_role)
+
+def _stay(rng, max_ahead=540):
+    check_in = date.today() + timedelta(days=rng.randint(1, max_ahead))
+    return check_in.isoformat(), (check_in + timedelta(days=rng.randint(1, 5))).isoformat()
+
+
+def scenario(route, rng, targets):
+    if route == 'search':
+        check_in, check_out = _stay(rng)
+        city = rng.choice(targets['cities'])
+        return 'GET', f'/search?city={city.replace(" ", "+")}&check_in={check_in}&check_out={check_out}', None, None
+    if route == 'hotel_detail':
+        return 'GET', f"/hotel/{rng.choice(targets['hotel_ids'])}", None, None
+    if route == 'room_detail':
+        return 'GET', f"/room/{rng.choice(targets['room_ids'])}", None, None
+    if route == 'create_booking':
+        check_in, check_out = _stay(rng)
+        body = {'check_in_date': check_in, 'check_out_date': check_out, 'number_of_guests': 1}
+        return 'POST', f"/booking/{rng.choice(targets['room_ids'])}", body, 'guest'
+    if route == 'my_bookings':
+        return 'GET', '/my-bookings', None, 'guest'
+    if route == 'admin_dashboard':
+        return 'GET', '/admin', None, 'admin'
+    raise ValueError(f'Unknown route {route}')
+
+
+# Drivers
+
+class ClientDriver:
+    """In-process driver using Flask's test client; query counts come from X-DB-Queries"""
+
+    name = 'client'
+
+    def __init__(self, path):
+        os.environ['DATABASE_PATH'] = path
+        import hotel
+        self.app = hotel.app
+        self.app.config['DB_QUERY_HEADERS'] = True
+        self._local = threading.local()
+
+    def _client(self, role):
+        clients = self._local.__dict__.setdefault('clients', {})
+        if role not in clients:
+            client = self.app.test_client()
+            if role:
+                email = ADMIN_EMAIL if role == 'admin' else GUEST_EMAIL
+                client.post('/login', json={'email': email, 'password': PASSWORD})
+            clients[role] = client
+        return clients[role]
+
+    def request(self, method, path, body, role):
+        client = self._client(role)
+        started = time.perf_counter()
+        response = client.open(path, method=method, json=body)
+        response.get_data()
+        elapsed = time.perf_counter() - started
+        queries = response.headers.get('X-DB-Queries')
+        return response.status_code, elapsed, int(queries) if queries is not None else None
+
+    def close(self):
+        pass
+
+
+class GunicornDriver:
+    """Drives a local gunicorn over HTTP; query counts come from X-DB-Queries"""
+
+    name = 'gunicorn'
+
+    def __init__(self, path, workers=2, threads=1):
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            self.port = sock.getsockname()[1]
+        self.base = f'http://127.0.0.1:{self.port}'
+        env = dict(os.environ, DATABASE_PATH=path, DB_QUERY_HEADERS='1',
+                   TEMPLATE_FOLDER=os.environ.get('TEMPLATE_FOLDER', HERE))
+        self.process = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '-w', str(workers), '--threads', str(threads),
+             '-b', f'127.0.0.1:{self.port}', '--log-level', 'warning', 'hotel:app'],
+            cwd=HERE, env=env
+        )
+        self._local = threading.local()
+        self._wait_ready()
+
+    def _wait_ready(self, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError('gunicorn exited during startup')
+            try:
+                urllib.request.urlopen(self.base + '/api/health', timeout=1).read()
+                return
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.2)
+        raise RuntimeError('gunicorn did not become ready')
+
+    def _opener(self, role):
+        openers = self._local.__dict__.setdefault('openers', {})
+        if role not in openers:
+            opener = urllib.request.build_opener(
+                urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+            if role:
+                email = ADMIN_EMAIL if role == 'admin' else GUEST_EMAIL
+                self._send(opener, 'POST', '/login', {'email': email, 'password': PASSWORD})
+            openers[role] = opener
+        return openers[role]
+
+    def _send(self, opener, method, path, body):
+        data = json.dumps(body).encode() if body is not None else None
+        request = urllib.request.Request(self.base + path, data=data, method=method)
+        if data is not None:
+            request.add_header('Content-Type', 'application/json')
+        try:
+            with opener.open(request, timeout=60) as response:
+                response.read()
+                return response.status, response.headers
+        except urllib.error.HTTPError as e:
+            e.read()
+            return e.code, e.headers
+
+    def request(self, method, path, body, role):
+        opener = self._opener(role)
+        started = time.perf_counter()
+        status, headers = self._send(opener, method, path, body)
+        elapsed = time.perf_counter() - started
+        queries = headers.get('X-DB-Queries')
+        return status, elapsed, int(queries) if queries is not None else None
+
+    def close(self):
+        self.process.terminate()
+        self.process.wait(timeout=10)
+
+
+# Running
+
+def run_route(driver, route, requests, concurrency, targets, seed):
+    """Issue `requests` calls to one route across `concurrency` threads"""
+    samples = []
+    lock = threading.Lock()
+    per_thread = [requests // concurrency + (1 if i < requests % concurrency else 0)
+                  for i in range(concurrency)]
+
+    def worker(index, count):
+        rng = random.Random(seed * 1000 + index)
+        local = []
+        for _ in range(count):
+            local.append(driver.request(*scenario(route, rng, targets)))
+        with lock:
+            samples.extend(local)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i, n)) for i, n in enumerate(per_thread) if n]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    latencies = sorted(sample[1] * 1000 for sample in samples)
+    statuses = {}
+    for status, _, _ in samples:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    query_counts = [sample[2] for sample in samples if sample[2] is not None]
+
+    return {
+        'requests': len(samples),
+        'errors': sum(1 for status, _, _ in samples if status >= 500),
+        'status_counts': statuses,
+        'mean_ms': round(sum(latencies) / len(latencies), 3) if latencies else None,
+        'p50_ms': round(percentile(latencies, 50), 3) if latencies else None,
+        'p95_ms': round(percentile(latencies, 95), 3) if latencies else None,
+        'p99_ms': round(percentile(latencies, 99), 3) if latencies else None,
+        'throughput_rps': round(len(samples) / wall, 1) if wall else None,
+        'queries_per_request': round(sum(query_counts) / len(query_counts), 2) if query_counts else None,
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=HERE,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    scale = dict(SCALES[args.scale])
+    for key in scale:
+        override = getattr(args, key)
+        if override is not None:
+            scale[key] = override
+
+    os.environ.setdefault('TEMPLATE_FOLDER', HERE)
+    path = args.database or os.path.join(tempfile.mkdtemp(), 'benchmark.db')
+    seeded_in = None
+    if not args.database or not os.path.exists(path):
+        print(f'Seeding {path} with {scale} ...', file=sys.stderr)
+        seeded_in = seed_database(path, scale, args.seed)
+    targets = load_targets(path)
+
+    if args.mode == 'gunicorn':
+        driver = GunicornDriver(path, args.workers, args.threads)
+    else:
+        driver = ClientDriver(path)
+
+    routes = args.routes or ROUTES
+    results = {}
+    try:
+        for route in routes:
+            # Warm up pools, caches and the occupancy index before measuring
+            run_route(driver, route, min(args.warmup, args.requests), 1, targets, args.seed + 1)
+            results[route] = run_route(driver, route, args.requests, args.concurrency, targets, args.seed)
+            r = results[route]
+            print(f"{route:>16}: p50 {r['p50_ms']}ms  p95 {r['p95_ms']}ms  p99 {r['p99_ms']}ms  "
+                  f"{r['throughput_rps']} req/s  queries {r['queries_per_request']}  errors {r['errors']}",
+                  file=sys.stderr)
+    finally:
+        driver.close()
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'git_revision': git_revision(),
+            'python': platform.python_version(),
+            'mode': driver.name,
+            'concurrency': args.concurrency,
+            'requests_per_route': args.requests,
+            'scale': scale,
+            'seed': args.seed,
+            'seed_seconds': round(seeded_in, 2) if seeded_in else None,
+        },
+        'routes': results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as handle:
+            handle.write(output + '\n')
+    else:
+        print(output)
+    return 1 if any(r['errors'] for r in results.values()) else 0
+
+
+def compare_reports(baseline, current, threshold):
+    """List of regression messages between two benchmark reports"""
+    regressions = []
+    for route, base in baseline['routes'].items():
+        now = current['routes'].get(route)
+        if not now:
+            continue
+        for metric in ('p50_ms', 'p95_ms', 'p99_ms'):
+            if base.get(metric) and now.get(metric) and now[metric] > base[metric] * (1 + threshold):
+                regressions.append(f'{route}: {metric} {base[metric]} -> {now[metric]}')
+        if base.get('throughput_rps') and now.get('throughput_rps') \
+                and now['throughput_rps'] < base['throughput_rps'] * (1 - threshold):
+            regressions.append(f"{route}: throughput {base['throughput_rps']} -> {now['throughput_rps']} req/s")
+        if base.get('queries_per_request') is not None and now.get('queries_per_request') is not None \
+                and now['queries_per_request'] > base['queries_per_request']:
+            regressions.append(f"{route}: queries/request {base['queries_per_request']} -> {now['queries_per_request']}")
+        if now.get('errors', 0) > base.get('errors', 0):
+            regressions.append(f"{route}: server errors {base.get('errors', 0)} -> {now['errors']}")
+    return regressions
+
+
+def compare(args):
+    with open(args.baseline) as handle:
+        baseline = json.load(handle)
+    with open(args.current) as handle:
+        current = json.load(handle)
+
+    for key in ('mode', 'scale', 'concurrency'):
+        if baseline['meta'].get(key) != current['meta'].get(key):
+            print(f"⚠️  {key} differs: {baseline['meta'].get(key)} vs {current['meta'].get(key)}")
+
+    for route in baseline['routes']:
+        base, now = baseline['routes'][route], current['routes'].get(route)
+        if now:
+            print(f"{route:>16}: p95 {base['p95_ms']} -> {now['p95_ms']} ms, "
+                  f"{base['throughput_rps']} -> {now['throughput_rps']} req/s")
+
+    regressions = compare_reports(baseline, current, args.threshold)
+    if regressions:
+        print(f'❌ {len(regressions)} regression(s) beyond {args.threshold:.0%}:')
+        for message in regressions:
+            print(f'   - {message}')
+        return 1
+    print('✅ No regressions')
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='SmartStay route benchmarks')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='seed a database and benchmark the routes')
+    run_parser.add_argument('--scale', choices=sorted(SCALES), default='small')
+    for key in SCALES['small']:
+        run_parser.add_argument(f"--{key.replace('_', '-')}", dest=key, type=int,
+                                help=f'override {key} for the chosen scale')
+    run_parser.add_argument('--database', help='reuse (or create) this database file')
+    run_parser.add_argument('--mode', choices=['client', 'gunicorn'], default='client')
+    run_parser.add_argument('--workers', type=int, default=2, help='gunicorn workers')
+    run_parser.add_argument('--threads', type=int, default=1, help='gunicorn threads per worker')
+    run_parser.add_argument('--requests', type=int, default=200, help='requests per route')
+    run_parser.add_argument('--concurrency', type=int, default=1, help='client threads')
+    run_parser.add_argument('--warmup', type=int, default=20, help='unmeasured requests per route')
+    run_parser.add_argument('--routes', nargs='+', choices=ROUTES)
+    run_parser.add_argument('--seed', type=int, default=42)
+    run_parser.add_argument('--output', '-o', help='write the JSON report here')
+
+    compare_parser = commands.add_parser('compare', help='flag regressions between two reports')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--threshold', type=float, default=0.15,
+                                help='allowed relative slowdown (default 0.15)')
+
+    args = parser.parse_args(argv)
+    return run(args) if args.command == 'run' else compare(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,285 @@
+"""
+Bulk Import
+Batched, validated ingestion of hotels, rooms and historical bookings from CSV/JSON
+"""
+
+import csv
+import io
+import json
+import secrets
+import sqlite3
+import time
+from datetime import date
+
+DEFAULT_BATCH_SIZE = 5000
+MAX_REPORTED_ERRORS = 1000
+
+ROOM_STATUSES = ('available', 'booked', 'maintenance')
+BOOKING_STATUSES = ('pending', 'confirmed', 'cancelled', 'completed')
+
+
+class RowError(ValueError):
+    """A single input row failed validation"""
+
+
+def _text(value):
+    return str(value).strip()
+
+
+def _int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise RowError(f'expected an integer, got {value!r}')
+
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise RowError(f'expected a number, got {value!r}')
+
+
+def _date(value):
+    try:
+        return date.fromisoformat(str(value).strip()[:10]).isoformat()
+    except ValueError:
+        raise RowError(f'expected a YYYY-MM-DD date, got {value!r}')
+
+
+def _choice(*choices):
+    def convert(value):
+        value = _text(value)
+        if value not in choices:
+            raise RowError(f'expected one of {choices}, got {value!r}')
+        return value
+    return convert
+
+
+# entity -> (table, [(column, converter, required, default)])
+ENTITIES = {
+    'hotels': ('hotels', [
+        ('name', _text, True, None),
+        ('description', _text, False, ''),
+        ('city', _text, True, None),
+        ('address', _text, True, None),
+        ('phone', _text, False, ''),
+        ('email', _text, False, ''),
+        ('rating', _float, False, 4.5),
+    ]),
+    'rooms': ('rooms', [
+        ('hotel_id', _int, True, None),
+        ('room_number', _text, True, None),
+        ('room_type', _text, True, None),
+        ('capacity', _int, True, None),
+        ('price_per_night', _float, True, None),
+        ('description', _text, False, ''),
+        ('amenities', _text, False, ''),
+        ('status', _choice(*ROOM_STATUSES), False, 'available'),
+    ]),
+    'bookings': ('bookings', [
+        ('booking_id', _text, False, None),
+        ('user_id', _int, True, None),
+        ('room_id', _int, True, None),
+        ('hotel_id', _int, False, None),
+        ('check_in_date', _date, True, None),
+        ('check_out_date', _date, True, None),
+        ('number_of_guests', _int, False, 1),
+        ('total_price', _float, False, None),
+        ('status', _choice(*BOOKING_STATUSES), False, 'confirmed'),
+        ('special_requests', _text, False, ''),
+        ('created_at', _text, False, None),
+    ]),
+}
+
+
+class ImportReport:
+    """Counters and per-row errors for one import run"""
+
+    def __init__(self, entity):
+        self.entity = entity
+        self.processed = 0
+        self.inserted = 0
+        self.failed = 0
+        self.errors = []
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    def error(self, row_number, message):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': row_number, 'message': message})
+
+    def finish(self):
+        self.elapsed = time.perf_counter() - self.started
+        return self
+
+    @property
+    def rows_per_second(self):
+        return round(self.inserted / self.elapsed, 1) if self.elapsed else 0.0
+
+    def to_dict(self):
+        return {
+            'entity': self.entity,
+            'processed': self.processed,
+            'inserted': self.inserted,
+            'failed': self.failed,
+            'elapsed_seconds': round(self.elapsed, 3),
+            'rows_per_second': self.rows_per_second,
+            'errors': self.errors,
+        }
+
+
+def read_records(source, fmt=None):
+    """Iterate dict records from a CSV, JSON array or NDJSON file/stream.
+
+    source may be a path or a text file object; fmt defaults to the file
+    extension ('csv', 'json' or 'ndjson').
+    """
+    if isinstance(source, str):
+        fmt = fmt or source.rsplit('.', 1)[-1].lower()
+        with open(source, newline='', encoding='utf-8') as handle:
+            yield from read_records(handle, fmt)
+        return
+
+    if fmt == 'csv':
+        for record in csv.DictReader(source):
+            yield {key: value for key, value in record.items() if value not in ('', None)}
+    elif fmt == 'ndjson':
+        for line in source:
+            if line.strip():
+                yield json.loads(line)
+    elif fmt == 'json':
+        yield from json.load(source)
+    else:
+        raise ValueError(f'Unsupported import format: {fmt}')
+
+
+def records_from_upload(data, fmt):
+    """Records from uploaded bytes"""
+    return read_records(io.StringIO(data.decode('utf-8')), fmt)
+
+
+def _validate(fields, record):
+    row = {}
+    for column, convert, required, default in fields:
+        value = record.get(column)
+        if value is None or value == '':
+            if required:
+                raise RowError(f'missing required field {column!r}')
+            row[column] = default
+        else:
+            row[column] = convert(value)
+    return row
+
+
+class _BookingResolver:
+    """Fills in hotel_id, total_price and booking_id for booking rows"""
+
+    def __init__(self, conn):
+        self.rooms = {
+            row[0]: (row[1], row[2])
+            for row in conn.execute('SELECT id, hotel_id, price_per_night FROM rooms')
+        }
+
+    def __call__(self, row):
+        room = self.rooms.get(row['room_id'])
+        if room is None:
+            raise RowError(f"room {row['room_id']} does not exist")
+        hotel_id, price = room
+        if row['hotel_id'] is None:
+            row['hotel_id'] = hotel_id
+        elif row['hotel_id'] != hotel_id:
+            raise RowError(f"room {row['room_id']} belongs to hotel {hotel_id}, not {row['hotel_id']}")
+        if row['check_out_date'] <= row['check_in_date']:
+            raise RowError('check_out_date must be after check_in_date')
+        if row['total_price'] is None:
+            nights = (date.fromisoformat(row['check_out_date']) - date.fromisoformat(row['check_in_date'])).days
+            row['total_price'] = nights * price
+        if not row['booking_id']:
+            row['booking_id'] = f'BKI{secrets.token_hex(8).upper()}'
+        return row
+
+
+def secondary_indexes(conn, table):
+    """(name, sql) for the table's non-unique, explicitly created indexes"""
+    return conn.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? "
+        "AND sql IS NOT NULL AND sql NOT LIKE 'CREATE UNIQUE%'",
+        (table,)
+    ).fetchall()
+
+
+def _insert_batch(conn, table, columns, batch, report):
+    """executemany a batch; on constraint errors fall back to per-row inserts"""
+    placeholders = ', '.join('?' for _ in columns)
+    sql = f'INSERT INTO {table} ({", ".join(columns)}) VALUES ({placeholders})'
+    if not conn.in_transaction:
+        conn.execute('BEGIN')
+    try:
+        conn.execute('SAVEPOINT import_batch')
+        conn.executemany(sql, [tuple(row[c] for c in columns) for _, row in batch])
+        conn.execute('RELEASE import_batch')
+        report.inserted += len(batch)
+        return
+    except sqlite3.IntegrityError:
+        conn.execute('ROLLBACK TO import_batch')
+        conn.execute('RELEASE import_batch')
+
+    for row_number, row in batch:
+        try:
+            conn.execute(sql, tuple(row[c] for c in columns))
+            report.inserted += 1
+        except sqlite3.IntegrityError as e:
+            report.error(row_number, str(e))
+
+
+def import_records(conn, entity, records, batch_size=DEFAULT_BATCH_SIZE, defer_indexes=False):
+    """Validate and insert records in chunked transactions; returns an ImportReport.
+
+    With defer_indexes, the table's secondary indexes are dropped for the
+    load and rebuilt once at the end, which is much faster for large files.
+    """
+    if entity not in ENTITIES:
+        raise ValueError(f'Unknown entity {entity!r}; expected one of {sorted(ENTITIES)}')
+
+    table, fields = ENTITIES[entity]
+    report = ImportReport(entity)
+    resolve = _BookingResolver(conn) if entity == 'bookings' else None
+
+    dropped = secondary_indexes(conn, table) if defer_indexes else []
+    for name, _ in dropped:
+        conn.execute(f'DROP INDEX IF EXISTS {name}')
+    conn.commit()
+
+    try:
+        batch, columns = [], None
+        for row_number, record in enumerate(records, start=1):
+            report.processed += 1
+            try:
+                row = _validate(fields, record)
+                if resolve:
+                    row = resolve(row)
+            except RowError as e:
+                report.error(row_number, str(e))
+                continue
+
+            # Let SQLite defaults apply to optional columns left empty
+            row = {key: value for key, value in row.items() if value is not None}
+            row_columns = tuple(sorted(row))
+            if columns not in (None, row_columns) or len(batch) >= batch_size:
+                _insert_batch(conn, table, columns, batch, report)
+                conn.commit()
+                batch = []
+            columns = row_columns
+            batch.append((row_number, row))
+
+        if batch:
+            _insert_batch(conn, table, columns, batch, report)
+        conn.commit()
+    finally:
+        for _, sql in dropped:
+            conn.execute(sql)
+        conn.commit()
+
+    return report.finish()
@@ -0,0 +1,295 @@
+"""
+Result Cache
+Bounded LRU+TTL cache for catalog pages, invalidated by tags on writes
+"""
+
+import glob
+import hashlib
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_TTL = 300
+DEFAULT_MAX_ENTRIES = 1000
+
+
+def make_key(prefix, params=None):
+    """Stable key from a prefix and request parameters.
+
+    Empty values are dropped and lists sorted, so equivalent requests
+    (parameter order, repeated amenities, blank fields) share one entry.
+    """
+    if not params:
+        return prefix
+    parts = []
+    for name in sorted(params):
+        value = params[name]
+        if value in (None, '', [], ()):
+            continue
+        if isinstance(value, (list, tuple, set)):
+            value = ','.join(sorted(str(v).strip().lower() for v in value))
+        elif isinstance(value, str):
+            value = value.strip().lower()
+        parts.append(f'{name}={value}')
+    return f"{prefix}?{'&'.join(parts)}"
+
+
+class MemoryStore:
+    """In-process LRU store; tag versions are local to this worker"""
+
+    shared = False
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._tags = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def tag_versions(self, tags):
+        with self._lock:
+            return {tag: self._tags.get(tag, 0) for tag in tags}
+
+    def bump(self, tags):
+        with self._lock:
+            for tag in tags:
+                self._tags[tag] = time.time_ns()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class FileStore:
+    """Store shared by every worker on the host, one pickle file per entry.
+
+    Writes go through a temp file and os.replace, so readers never see a
+    partial entry. Reads touch the file's mtime, and pruning removes the
+    least recently used files once the store exceeds max_entries.
+    """
+
+    shared = True
+    PRUNE_EVERY = 100
+
+    def __init__(self, directory, max_entries=DEFAULT_MAX_ENTRIES):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._writes = 0
+        os.makedirs(os.path.join(directory, 'entries'), exist_ok=True)
+        os.makedirs(os.path.join(directory, 'tags'), exist_ok=True)
+
+    def _path(self, kind, name):
+        digest = hashlib.sha1(name.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, kind, digest)
+
+    def _write(self, path, data):
+        temp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(temp, 'wb') as handle:
+            handle.write(data)
+        os.replace(temp, path)
+
+    def get(self, key):
+        path = self._path('entries', key)
+        try:
+            with open(path, 'rb') as handle:
+                entry = pickle.load(handle)
+            os.utime(path)
+            return entry
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+
+    def set(self, key, entry):
+        self._write(self._path('entries', key), pickle.dumps(entry, pickle.HIGHEST_PROTOCOL))
+        self._writes += 1
+        if self._writes % self.PRUNE_EVERY == 0:
+            self.prune()
+
+    def delete(self, key):
+        try:
+            os.remove(self._path('entries', key))
+        except OSError:
+            pass
+
+    def clear(self):
+        for path in glob.glob(os.path.join(self.directory, 'entries', '*')):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def prune(self):
+        """Drop least recently used entries beyond max_entries"""
+        paths = glob.glob(os.path.join(self.directory, 'entries', '*'))
+        if len(paths) <= self.max_entries:
+            return
+        aged = []
+        for path in paths:
+            try:
+                aged.append((os.path.getmtime(path), path))
+            except OSError:
+                continue
+        aged.sort()
+        for _, path in aged[:len(aged) - self.max_entries]:
+            try:
+                os.remove(path)
+                self.evictions += 1
+            except OSError:
+                pass
+
+    def tag_versions(self, tags):
+        versions = {}
+        for tag in tags:
+            try:
+                with open(self._path('tags', tag), 'rb') as handle:
+                    versions[tag] = int(handle.read() or 0)
+            except (OSError, ValueError):
+                versions[tag] = 0
+        return versions
+
+    def bump(self, tags):
+        for tag in tags:
+            self._write(self._path('tags', tag), str(time.time_ns()).encode())
+
+    def __len__(self):
+        return len(glob.glob(os.path.join(self.directory, 'entries', '*')))
+
+
+class Cache:
+    """TTL cache over a store, with tag-based invalidation and hit/miss stats.
+
+    Each entry remembers the versions of its tags when it was written; an
+    invalidate(tag) bumps the tag's version, so every entry carrying that
+    tag is treated as a miss from then on without having to find it.
+    """
+
+    def __init__(self, store, name='default', ttl=DEFAULT_TTL, on_lookup=None):
+        self.store = store
+        self.name = name
+        self.ttl = ttl
+        self.on_lookup = on_lookup
+        self._lock = threading.Lock()
+        self._counts = {'hits': 0, 'misses': 0, 'expired': 0, 'stale': 0, 'sets': 0, 'invalidations': 0}
+
+    _LOOKUP_RESULTS = {'hits': 'hit', 'misses': 'miss', 'expired': 'expired', 'stale': 'stale'}
+
+    def _count(self, result):
+        with self._lock:
+            self._counts[result] += 1
+        if self.on_lookup and result in self._LOOKUP_RESULTS:
+            self.on_lookup(self.name, self._LOOKUP_RESULTS[result])
+
+    def get(self, key, default=None):
+        entry = self.store.get(key)
+        if entry is None:
+            self._count('misses')
+            return default
+
+        expires_at, tag_versions, value = entry
+        if expires_at < time.time():
+            self.store.delete(key)
+            self._count('expired')
+            return default
+        if tag_versions and self.store.tag_versions(tag_versions) != tag_versions:
+            self.store.delete(key)
+            self._count('stale')
+            return default
+
+        self._count('hits')
+        return value
+
+    def _put(self, key, value, tag_versions, ttl):
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        self.store.set(key, (expires_at, tag_versions, value))
+        self._count('sets')
+
+    def set(self, key, value, tags=(), ttl=None):
+        self._put(key, value, self.store.tag_versions(tags), ttl)
+
+    def get_or_set(self, key, compute, tags=(), ttl=None):
+        """Cached value for key, computing and storing it on a miss.
+
+        Tag versions are read before computing, so an invalidation that
+        lands while the value is being built leaves the new entry stale.
+        """
+        sentinel = object()
+        value = self.get(key, sentinel)
+        if value is sentinel:
+            tag_versions = self.store.tag_versions(tags)
+            value = compute()
+            self._put(key, value, tag_versions, ttl)
+        return value
+
+    def invalidate(self, *tags):
+        """Expire every entry carrying any of the tags"""
+        self.store.bump(tags)
+        with self._lock:
+            self._counts['invalidations'] += 1
+
+    def clear(self):
+        self.store.clear()
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self._counts)
+        lookups = counts['hits'] + counts['misses'] + counts['expired'] + counts['stale']
+        return dict(
+            counts,
+            name=self.name,
+            backend='file' if self.store.shared else 'memory',
+            entries=len(self.store),
+            max_entries=self.store.max_entries,
+            evictions=self.store.evictions,
+            ttl=self.ttl,
+            hit_ratio=round(counts['hits'] / lookups, 4) if lookups else 0.0,
+        )
+
+
+class NullCache(Cache):
+    """Cache that never stores anything, for CACHE_BACKEND=none"""
+
+    def __init__(self, name='default'):
+        super().__init__(MemoryStore(max_entries=0), name=name, ttl=0)
+
+    def get_or_set(self, key, compute, tags=(), ttl=None):
+        return compute()
+
+
+def create_cache(backend, name='default', ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES,
+                 directory=None, on_lookup=None):
+    """Cache for a CACHE_BACKEND setting: 'memory', 'file' or 'none'"""
+    if backend == 'none':
+        return NullCache(name)
+    if backend == 'file':
+        if not directory:
+            raise ValueError('CACHE_DIR is required for the file cache backend')
+        store = FileStore(directory, max_entries)
+    elif backend == 'memory':
+        store = MemoryStore(max_entries)
+    else:
+        raise ValueError(f'Unknown cache backend: {backend}')
+    return Cache(store, name=name, ttl=ttl, on_lookup=on_lookup)
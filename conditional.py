@@ -0,0 +1,82 @@
+"""
+Conditional Responses
+Version-based ETags, Last-Modified and Cache-Control policies with early 304s
+"""
+
+import hashlib
+
+from flask import current_app, g, request, session
+
+# Route policy -> Cache-Control for anonymous responses. Pages rendered for a
+# signed-in user (navbar, flashes) are always private and revalidated.
+POLICIES = {
+    'catalog': 'public, max-age=60, stale-while-revalidate=300',
+    'search': 'public, max-age=30, stale-while-revalidate=60',
+    'availability': 'public, max-age=0, must-revalidate',
+}
+PRIVATE = 'private, no-cache'
+
+
+def make_etag(*parts):
+    """Weak ETag from version parts"""
+    digest = hashlib.sha1('|'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+    return f'W/"{digest[:20]}"'
+
+
+def _viewer():
+    return (session.get('user_id'), session.get('user_role'))
+
+
+def precondition(policy, *version_parts, last_modified=None, per_user=True):
+    """Return a 304 response if the client's copy is current, else None.
+
+    Call this with cheap version lookups before any heavy query or template
+    rendering. With per_user, the signed-in user is part of the ETag and
+    the response varies on the session cookie.
+    """
+    salt = current_app.config.get('ETAG_SALT', '')
+    viewer = _viewer() if per_user else ()
+    etag = make_etag(salt, request.path, *version_parts, *viewer)
+    private = per_user and viewer[0] is not None
+    g.conditional = {
+        'etag': etag,
+        'last_modified': last_modified,
+        'cache_control': PRIVATE if private else POLICIES[policy],
+        'vary': 'Cookie, Accept-Encoding' if per_user else 'Accept-Encoding',
+    }
+
+    if per_user and session.get('_flashes'):
+        fresh = False  # the page must render to deliver pending flash messages
+    elif request.if_none_match:
+        fresh = request.if_none_match.contains_weak(etag.split('"')[1])
+    elif last_modified and request.if_modified_since:
+        fresh = last_modified.replace(microsecond=0) <= request.if_modified_since
+    else:
+        fresh = False
+
+    if fresh:
+        response = current_app.response_class(status=304)
+        return _apply(response, g.conditional)
+    return None
+
+
+def _apply(response, validators):
+    response.headers['ETag'] = validators['etag']
+    if validators['last_modified']:
+        response.last_modified = validators['last_modified']
+    response.headers['Cache-Control'] = validators['cache_control']
+    response.headers['Vary'] = validators['vary']
+    return response
+
+
+def _add_validators(response):
+    validators = g.pop('conditional', None)
+    if validators and response.status_code == 200:
+        _apply(response, validators)
+    return response
+
+
+def init_app(app):
+    """Attach the validators computed by precondition() to 200 responses"""
+    app.config.setdefault('ETAG_SALT', '')
+    app.after_request(_add_validators)
@@ -38,8 +38,77 @@ MAIL_PORT = int(os.environ.get('MAIL_PORT', 587))
 MAIL_USE_TLS = os.environ.get('MAIL_USE_TLS', True)
 MAIL_USERNAME = os.environ.get('MAIL_USERNAME', '')
 MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD', '')
+MAIL_DEFAULT_SENDER = os.environ.get('MAIL_DEFAULT_SENDER', 'SmartStay <bookings@smartstay.com>')
+MAIL_BACKEND = os.environ.get('MAIL_BACKEND', 'smtp' if MAIL_USERNAME else 'file')  # outbox worker: smtp or file
+MAIL_FILE_DIR = os.environ.get('MAIL_FILE_DIR', 'outbox_mail')  # .eml files when MAIL_BACKEND=file
 
 # Admin Settings
 ADMIN_EMAIL = os.environ.get('ADMIN_EMAIL', 'admin@smartstay.com')
 ADMIN_USERNAME = os.environ.get('ADMIN_USERNAME', 'admin')
 ADMIN_PASSWORD = os.environ.get('ADMIN_PASSWORD', 'admin123')
+
+# Database Connection Pool (per worker process)
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 8))
+DB_SYNCHRONOUS = os.environ.get('DB_SYNCHRONOUS', 'NORMAL')
+DB_CACHE_SIZE = int(os.environ.get('DB_CACHE_SIZE', -16000))  # negative = KiB
+DB_MMAP_SIZE = int(os.environ.get('DB_MMAP_SIZE', 134217728))
+DB_BUSY_TIMEOUT = int(os.environ.get('DB_BUSY_TIMEOUT', 5000))  # milliseconds
+
+# Occupancy Index
+OCCUPANCY_INDEX = os.environ.get('OCCUPANCY_INDEX', '1') == '1'
+OCCUPANCY_SYNC_INTERVAL = float(os.environ.get('OCCUPANCY_SYNC_INTERVAL', 1.0))  # seconds
+
+# Dashboard Statistics
+STATS_RECONCILE_INTERVAL = int(os.environ.get('STATS_RECONCILE_INTERVAL', 3600))  # seconds
+
+# Query Profiling
+DB_PROFILING = os.environ.get('DB_PROFILING', '1') == '1'
+DB_QUERY_HEADERS = os.environ.get('DB_QUERY_HEADERS', '1' if DEBUG else '0') == '1'  # X-DB-Queries / X-DB-Time
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', 100))
+SLOW_QUERY_LOG = os.environ.get('SLOW_QUERY_LOG', 'slow_queries.log')
+
+# Metrics
+METRICS_DIR = os.environ.get('METRICS_DIR')  # shared directory for multi-worker /metrics; unset = single process
+METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', 1.0))  # seconds
+
+# Result Cache
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'memory')  # memory, file (shared by workers) or none
+CACHE_DIR = os.environ.get('CACHE_DIR', 'cache')
+CACHE_TTL = int(os.environ.get('CACHE_TTL', 300))  # seconds
+CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', 1000))
+SEARCH_CACHE_TTL = int(os.environ.get('SEARCH_CACHE_TTL', 30))  # searches with dates depend on bookings
+
+# Conditional Responses
+ETAG_SALT = os.environ.get('ETAG_SALT', '2.0')  # change to invalidate every ETag (e.g. template changes)
+
+# Dynamic Pricing
+RATE_CALENDAR_DAYS = int(os.environ.get('RATE_CALENDAR_DAYS', 365))  # nights precomputed per room; `flask reprice` daily
+
+# Checkout Holds
+HOLD_TTL = int(os.environ.get('HOLD_TTL', 600))  # seconds a room is held while the booking form is open
+
+# Room-Type Allocation
+ROOM_TYPE_ALLOCATION = os.environ.get('ROOM_TYPE_ALLOCATION', '1').lower() in ('1', 'true', 'yes')  # book any free room of the type
+
+# Batch Bookings
+BATCH_BOOKING_MAX_ITEMS = int(os.environ.get('BATCH_BOOKING_MAX_ITEMS', 500))  # stays per all-or-nothing request
+
+# Report Replica
+REPLICA_PATH = os.environ.get('REPLICA_PATH', '')  # snapshot file for admin reports; unset = reports read the primary
+REPLICA_REFRESH_INTERVAL = float(os.environ.get('REPLICA_REFRESH_INTERVAL', 60))  # seconds, `flask replica-refresh`
+REPLICA_MAX_STALENESS = os.environ.get(
+    'REPLICA_MAX_STALENESS',
+    'admin_dashboard=120,admin_bookings=300,admin_bookings_api=300,export_bookings=900,'
+    'admin_analytics=900,admin_analytics_pace=900'
+)  # endpoint=seconds; older snapshots fall back to the primary
+
+# Hotel Shards
+SHARD_COUNT = int(os.environ.get('SHARD_COUNT', 1))  # >1 splits rooms/bookings/reviews by hotel; `flask shard-split` once
+
+# Booking Lifecycle
+PENDING_BOOKING_TTL_HOURS = int(os.environ.get('PENDING_BOOKING_TTL_HOURS', 24))  # unconfirmed bookings then cancelled
+BOOKING_ARCHIVE_DAYS = int(os.environ.get('BOOKING_ARCHIVE_DAYS', 365))  # finished stays then moved to bookings_archive
+LIFECYCLE_INTERVAL = float(os.environ.get('LIFECYCLE_INTERVAL', 300))  # seconds between `flask lifecycle` passes
+
+# Revenue Analytics
+ANALYTICS_CACHE_TTL = int(os.environ.get('ANALYTICS_CACHE_TTL', 300))  # seconds per (hotel, date range) report
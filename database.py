@@ -0,0 +1,166 @@
+"""
+Database Connection Layer
+Per-request SQLite connections backed by a per-worker connection pool
+"""
+
+import os
+import sqlite3
+import threading
+from urllib.parse import quote
+
+from flask import current_app, g
+
+# Pragmas applied to every new connection, in order
+DEFAULT_PRAGMAS = {
+    'synchronous': 'NORMAL',
+    'cache_size': -16000,        # negative = KiB, so ~16MB page cache
+    'mmap_size': 134217728,      # 128MB memory-mapped I/O
+    'busy_timeout': 5000,        # ms to wait on a locked database
+    'temp_store': 'MEMORY',
+}
+
+
+def connect(database, pragmas=None, factory=sqlite3.Connection, on_connect=None, readonly=False):
+    """Open a new SQLite connection with row factory and pragmas applied.
+
+    on_connect(conn) runs last, e.g. to register SQL functions. A readonly
+    connection cannot write, or create the file when it is missing.
+    """
+    if readonly:
+        uri = f'file:{quote(os.path.abspath(database))}?mode=ro'
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False, factory=factory)
+    else:
+        conn = sqlite3.connect(database, check_same_thread=False, factory=factory)
+    conn.row_factory = sqlite3.Row
+    for name, value in (pragmas or DEFAULT_PRAGMAS).items():
+        conn.execute(f'PRAGMA {name} = {value}')
+    if on_connect:
+        on_connect(conn)
+    return conn
+
+
+def database_path(url):
+    """SQLite file path from a DATABASE_URL such as sqlite:///hotel_booking.db.
+
+    The schema depends on SQLite triggers, FTS5 and SQL functions, so other
+    engines are rejected rather than silently falling back to a local file.
+    """
+    scheme, separator, rest = url.partition('://')
+    if not separator or scheme != 'sqlite':
+        raise ValueError(f'Unsupported DATABASE_URL scheme {scheme!r}; only sqlite:/// URLs are supported')
+    if not rest.startswith('/') or rest == '/':
+        raise ValueError('DATABASE_URL must look like sqlite:///relative.db or sqlite:////absolute/path.db')
+    return rest[1:]
+
+
+def enable_wal(conn):
+    """Switch the database to write-ahead logging (persists in the file)"""
+    return conn.execute('PRAGMA journal_mode = WAL').fetchone()[0]
+
+
+class ConnectionPool:
+    """Thread-safe pool of SQLite connections for one worker process.
+
+    Connections are handed to one request at a time and returned at
+    teardown. The pool resets itself after a fork so gunicorn workers
+    never share a connection inherited from the master.
+    """
+
+    def __init__(self, database, max_size=8, pragmas=None, wal=True, factory=sqlite3.Connection,
+                 on_connect=None):
+        self.database = database
+        self.max_size = max_size
+        self.pragmas = dict(DEFAULT_PRAGMAS, **(pragmas or {}))
+        self.wal = wal
+        self.factory = factory
+        self.on_connect = on_connect
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._idle = []
+        self._wal_checked = False
+        self.hits = 0
+        self.misses = 0
+        self.discarded = 0
+
+    def _check_fork(self):
+        if self._pid != os.getpid():
+            self._reset()
+
+    def acquire(self):
+        """Take an idle connection, or open a new one when none is idle"""
+        with self._lock:
+            self._check_fork()
+            if self._idle:
+                self.hits += 1
+                return self._idle.pop()
+            self.misses += 1
+
+        conn = connect(self.database, self.pragmas, self.factory, self.on_connect)
+        if self.wal and not self._wal_checked:
+            enable_wal(conn)
+            self._wal_checked = True
+        return conn
+
+    def release(self, conn):
+        """Return a connection to the pool, closing it if the pool is full"""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            conn.close()
+            with self._lock:
+                self.discarded += 1
+            return
+
+        with self._lock:
+            self._check_fork()
+            if len(self._idle) < self.max_size:
+                self._idle.append(conn)
+                return
+            self.discarded += 1
+        conn.close()
+
+    def close_all(self):
+        """Close every idle connection"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+    def stats(self):
+        """Pool counters for tuning max_size"""
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                'pid': self._pid,
+                'max_size': self.max_size,
+                'idle': len(self._idle),
+                'hits': self.hits,
+                'misses': self.misses,
+                'discarded': self.discarded,
+                'hit_ratio': round(self.hits / requests, 4) if requests else 0.0,
+                'pragmas': self.pragmas,
+            }
+
+
+def get_db():
+    """Connection for the current request, taken from the pool on first use"""
+    if 'db' not in g:
+        g.db = current_app.extensions['db_pool'].acquire()
+    return g.db
+
+
+def close_db(error=None):
+    """Return the request's connection to the pool"""
+    conn = g.pop('db', None)
+    if conn is not None:
+        current_app.extensions['db_pool'].release(conn)
+
+
+def init_app(app, pool):
+    """Register the pool and per-request teardown on a Flask app"""
+    app.extensions['db_pool'] = pool
+    app.teardown_appcontext(close_db)
@@ -0,0 +1,131 @@
+"""
+Synthetic Data Generator
+Seeds a database with hotels, rooms, users, bookings and reviews at benchmark scale
+"""
+
+import random
+from datetime import date, datetime, timedelta
+from itertools import islice
+
+from werkzeug.security import generate_password_hash
+
+from bulk_import import import_records
+
+CITIES = ['New York', 'Miami', 'Denver', 'Los Angeles', 'Boston', 'Chicago', 'Seattle',
+          'Austin', 'San Francisco', 'Orlando', 'Las Vegas', 'Nashville']
+ROOM_TYPES = [('Single', 1, 80), ('Double', 2, 140), ('Suite', 4, 280), ('Penthouse', 6, 420)]
+AMENITIES = ['WiFi', 'AC', 'TV', 'Mini-bar', 'Balcony', 'Jacuzzi', 'City View',
+             'Ocean View', 'Fireplace', 'Work Desk', 'Bathrobe', 'Kitchenette']
+
+
+def _hotels(rng, count):
+    for i in range(count):
+        city = rng.choice(CITIES)
+        yield {
+            'name': f'Synthetic Hotel {i + 1}',
+            'description': f'Benchmark property {i + 1} in {city}',
+            'city': city,
+            'address': f'{rng.randint(1, 9999)} Test Ave, {city}',
+            'rating': round(rng.uniform(3.5, 5.0), 1),
+        }
+
+
+def _rooms(rng, hotel_ids, rooms_per_hotel):
+    for hotel_id in hotel_ids:
+        for n in range(rooms_per_hotel):
+            room_type, capacity, base_price = rng.choice(ROOM_TYPES)
+            yield {
+                'hotel_id': hotel_id,
+                'room_number': str(100 * (n // 20 + 1) + n % 20 + 1),
+                'room_type': room_type,
+                'capacity': capacity,
+                'price_per_night': round(base_price * rng.uniform(0.8, 1.5), 2),
+                'description': f'{room_type} room',
+                'amenities': ', '.join(rng.sample(AMENITIES, rng.randint(3, 6))),
+            }
+
+
+def _bookings(rng, rooms, user_ids, per_room, start, horizon_days):
+    """Non-overlapping stays per room, walking forward from `start`"""
+    today = date.today()
+    for room_id, price in rooms:
+        day = start
+        end = start + timedelta(days=horizon_days)
+        for _ in range(per_room):
+            day += timedelta(days=rng.randint(0, 6))
+            nights = rng.randint(1, 7)
+            check_out = day + timedelta(days=nights)
+            if check_out > end:
+                break
+
+            roll = rng.random()
+            if roll < 0.05:
+                status = 'cancelled'
+            elif check_out <= today:
+                status = 'completed' if roll < 0.5 else 'confirmed'
+            else:
+                status = 'pending' if roll < 0.08 else 'confirmed'
+
+            created = datetime.combine(day, datetime.min.time()) - timedelta(
+                days=rng.randint(1, 90), seconds=rng.randint(0, 86399))
+            yield {
+                'user_id': rng.choice(user_ids),
+                'room_id': room_id,
+                'check_in_date': day.isoformat(),
+                'check_out_date': check_out.isoformat(),
+                'number_of_guests': rng.randint(1, 2),
+                'total_price': round(nights * price, 2),
+                'status': status,
+                'created_at': created.strftime('%Y-%m-%d %H:%M:%S'),
+            }
+            day = check_out
+
+
+def generate(conn, hotels=50, rooms_per_hotel=40, users=1000, bookings=100000,
+             reviews=10000, history_days=365, horizon_days=730, seed=42,
+             batch_size=10000, defer_indexes=True):
+    """Populate conn with synthetic data; returns per-entity import reports"""
+    rng = random.Random(seed)
+    reports = {}
+
+    # Hashing is deliberately slow, so every synthetic user shares one hash
+    password = generate_password_hash('password123')
+    first_user = (conn.execute('SELECT COALESCE(MAX(id), 0) FROM users').fetchone()[0]) + 1
+    conn.executemany(
+        'INSERT INTO users (name, email, password, role) VALUES (?, ?, ?, ?)',
+        ((f'Guest {first_user + i}', f'guest{first_user + i}.{seed}@example.com', password, 'guest')
+         for i in range(users))
+    )
+    conn.commit()
+    user_ids = [row[0] for row in conn.execute('SELECT id FROM users WHERE id >= ?', (first_user,))]
+
+    first_hotel = (conn.execute('SELECT COALESCE(MAX(id), 0) FROM hotels').fetchone()[0]) + 1
+    reports['hotels'] = import_records(conn, 'hotels', _hotels(rng, hotels), batch_size)
+    hotel_ids = [row[0] for row in conn.execute('SELECT id FROM hotels WHERE id >= ?', (first_hotel,))]
+
+    reports['rooms'] = import_records(
+        conn, 'rooms', _rooms(rng, hotel_ids, rooms_per_hotel), batch_size, defer_indexes)
+    rooms = conn.execute(
+        'SELECT id, price_per_night FROM rooms WHERE hotel_id >= ?', (first_hotel,)
+    ).fetchall()
+
+    per_room = -(-bookings // max(len(rooms), 1))
+    start = date.today() - timedelta(days=history_days)
+    reports['bookings'] = import_records(
+        conn, 'bookings',
+        islice(_bookings(rng, [tuple(room) for room in rooms], user_ids, per_room, start, horizon_days),
+               bookings),
+        batch_size, defer_indexes)
+
+    room_hotels = conn.execute(
+        'SELECT id, hotel_id FROM rooms WHERE hotel_id >= ?', (first_hotel,)
+    ).fetchall()
+    conn.executemany(
+        'INSERT INTO reviews (user_id, room_id, hotel_id, rating, comment, title) VALUES (?, ?, ?, ?, ?, ?)',
+        ((rng.choice(user_ids), room['id'], room['hotel_id'], rng.randint(1, 5),
+          'Synthetic review text', 'Synthetic review')
+         for room in (rng.choice(room_hotels) for _ in range(reviews)))
+    )
+    conn.commit()
+
+    return reports
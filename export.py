@@ -0,0 +1,129 @@
+"""
+Bookings Export
+Streams bookings as CSV or NDJSON in fixed-size chunks, optionally gzipped
+"""
+
+import csv
+import io
+import itertools
+import json
+import zlib
+
+EXPORT_FORMATS = ('csv', 'ndjson')
+CHUNK_SIZE = 1000
+
+BOOKING_FIELDS = [
+    'booking_id', 'user_id', 'room_id', 'hotel_id', 'check_in_date', 'check_out_date',
+    'number_of_guests', 'total_price', 'status', 'special_requests', 'created_at', 'updated_at',
+]
+NAME_FIELDS = ['user_name', 'user_email', 'hotel_name', 'room_number', 'room_type']
+
+
+def export_columns(with_names=True):
+    """Column names in export order"""
+    return BOOKING_FIELDS + (NAME_FIELDS if with_names else [])
+
+
+def build_query(filters, with_names=True, archived=False):
+    """SQL and params for the export of bookings (or bookings_archive), in primary-key order"""
+    table = 'bookings_archive' if archived else 'bookings'
+    columns = ', '.join(f'b.{field}' for field in BOOKING_FIELDS)
+    query = f'SELECT {columns}'
+    if with_names:
+        query += f''', u.name as user_name, u.email as user_email,
+                     h.name as hotel_name, r.room_number, r.room_type
+            FROM {table} b
+            JOIN users u ON b.user_id = u.id
+            JOIN hotels h ON b.hotel_id = h.id
+            JOIN rooms r ON b.room_id = r.id'''
+    else:
+        query += f' FROM {table} b'
+
+    conditions, params = ['b.hold_expires_at IS NULL'], []  # checkout holds are not bookings yet
+    if filters.get('status'):
+        statuses = [s for s in str(filters['status']).split(',') if s]
+        conditions.append(f"b.status IN ({', '.join('?' for _ in statuses)})")
+        params.extend(statuses)
+    if filters.get('date_from'):
+        conditions.append('b.check_in_date >= ?')
+        params.append(filters['date_from'])
+    if filters.get('date_to'):
+        conditions.append('b.check_in_date <= ?')
+        params.append(filters['date_to'])
+
+    query += ' WHERE ' + ' AND '.join(conditions)
+    query += ' ORDER BY b.id'
+    return query, params
+
+
+def iter_chunks(conn, filters, with_names=True, chunk_size=CHUNK_SIZE):
+    """Yield lists of at most chunk_size rows straight off one cursor per table.
+
+    With filters['include_archived'], bookings moved to bookings_archive
+    (see lifecycle.py) follow the live ones.
+    """
+    for archived in (False, True) if filters.get('include_archived') else (False,):
+        query, params = build_query(filters, with_names, archived)
+        cursor = conn.execute(query, params)
+        try:
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            cursor.close()
+
+
+def csv_stream(chunks, columns):
+    """Encode row chunks as CSV text, header first"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for rows in chunks:
+        writer.writerows(tuple(row) for row in rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def ndjson_stream(chunks, columns):
+    """Encode row chunks as newline-delimited JSON objects"""
+    for rows in chunks:
+        yield ''.join(json.dumps(dict(zip(columns, row))) + '\n' for row in rows)
+
+
+def gzip_stream(text_chunks):
+    """Gzip a stream of text chunks on the fly"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for text in text_chunks:
+        data = compressor.compress(text.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_stream(conn, filters, fmt='csv', with_names=True, gzip=False, chunk_size=CHUNK_SIZE):
+    """Full export pipeline: cursor chunks -> CSV/NDJSON text -> optional gzip bytes.
+
+    conn may be a list of hotel shard connections, exported one after another.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f'Unsupported export format: {fmt}')
+
+    columns = export_columns(with_names)
+    conns = conn if isinstance(conn, list) else [conn]
+    chunks = itertools.chain.from_iterable(
+        iter_chunks(shard, filters, with_names, chunk_size) for shard in conns
+    )
+    encoded = csv_stream(chunks, columns) if fmt == 'csv' else ndjson_stream(chunks, columns)
+    if gzip:
+        return gzip_stream(encoded)
+    return (text.encode('utf-8') for text in encoded)
+
+
+def content_type(fmt):
+    """MIME type for an export format"""
+    return 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
@@ -7,28 +7,220 @@ Made by Muskan
 import os
 import sqlite3
 from datetime import datetime, timedelta
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for, flash
+from flask import (
+    Flask, Response, render_template, request, jsonify, session, redirect, url_for, flash,
+    stream_template, stream_with_context
+)
 from werkzeug.security import generate_password_hash, check_password_hash
 import secrets
+import sys
 from functools import wraps
 
-app = Flask(__name__)
+import click
+
+from analytics import (
+    DEFAULT_PACE_HORIZON, MAX_RANGE_DAYS, merge_pace, merge_performance, pace, performance
+)
+from cache import create_cache, make_key
+from conditional import init_app as init_conditional, precondition
+from bulk_import import ENTITIES as IMPORT_ENTITIES, import_records, read_records, records_from_upload
+from datagen import generate
+from export import EXPORT_FORMATS, content_type, export_stream
+from occupancy import OccupancyIndex
+from outbox import (
+    create_sender, outbox_stats, purge_sent, requeue_dead, run_worker
+)
+from inventory import hotel_inventory, rebuild as rebuild_inventory
+from lifecycle import job_summary, run_scheduler
+from metrics import MetricsRegistry, init_app as init_metrics, pool_collector, replica_collector
+from migrations import SCHEMA_VERSION, current_version, migrate, pending as pending_migrations
+from profiling import ProfilingConnection, init_app as init_profiling
+import repository
+from repository import DuplicateEmailError
+from replica import Replica, get_report_db, init_app as init_replica, parse_staleness, run_refresher
+from pricing import (
+    add_rule, calendar_stats, delete_rule, list_rules, merge_calendar_stats, quote,
+    refresh as refresh_calendars, register_functions as register_pricing_functions
+)
+from pagination import (
+    decode_cursor, fetch_page, filters_from_args, merge_pages, page_rows, page_size,
+    stream_page_json
+)
+from search_index import (
+    filters_from_args as search_filters_from_args, merge_results as merge_search_results, search as search_rooms
+)
+from shards import (
+    ShardSet, booking_db, fan_out, get_shards, hotel_db, init_app as init_shards, mirror,
+    new_room_id, pull_hotel_rating, room_db, shard_db, shard_dbs, shard_paths, split as split_shards
+)
+from stats import merge_stats
+from versions import BOOKINGS, CATALOG, global_versions, hotel_version, room_version
+from database import ConnectionPool, connect, database_path, get_db, init_app as init_db_pool
+from reviews import (
+    HOTEL, ROOM, add_review, review_page, summary as review_summary,
+    DuplicateReviewError, ReviewNotAllowedError
+)
+from reservations import (
+    confirm_hold, release_hold, reserve_batch, reserve_room, sweep_expired_holds,
+    BatchUnavailableError, HoldExpiredError, RoomNotFoundError, RoomUnavailableError, ReservationBusyError
+)
+
+app = Flask(__name__, template_folder=os.environ.get('TEMPLATE_FOLDER', 'templates'))
 app.secret_key = os.environ.get('SECRET_KEY', secrets.token_hex(16))
 app.config['SESSION_COOKIE_SECURE'] = False
 app.config['SESSION_COOKIE_HTTPONLY'] = True
 
 # Database configuration
-DATABASE = os.environ.get('DATABASE_PATH', 'hotel_booking.db')
+DATABASE = (database_path(os.environ['DATABASE_URL']) if os.environ.get('DATABASE_URL')
+            else os.environ.get('DATABASE_PATH', 'hotel_booking.db'))
+app.config['DB_POOL_SIZE'] = int(os.environ.get('DB_POOL_SIZE', 8))
+app.config['DB_PRAGMAS'] = {
+    'synchronous': os.environ.get('DB_SYNCHRONOUS', 'NORMAL'),
+    'cache_size': int(os.environ.get('DB_CACHE_SIZE', -16000)),
+    'mmap_size': int(os.environ.get('DB_MMAP_SIZE', 134217728)),
+    'busy_timeout': int(os.environ.get('DB_BUSY_TIMEOUT', 5000)),
+}
+
+# Query profiling: per-request statement log, slow-query log, per-route stats
+app.config['DB_PROFILING'] = os.environ.get('DB_PROFILING', '1') == '1'
+app.config['DB_QUERY_HEADERS'] = os.environ.get('DB_QUERY_HEADERS', '1' if app.debug else '0') == '1'
+app.config['SLOW_QUERY_MS'] = float(os.environ.get('SLOW_QUERY_MS', 100))
+app.config['SLOW_QUERY_LOG'] = os.environ.get('SLOW_QUERY_LOG', 'slow_queries.log')
+
+db_pool = ConnectionPool(
+    DATABASE,
+    max_size=app.config['DB_POOL_SIZE'],
+    pragmas=app.config['DB_PRAGMAS'],
+    factory=ProfilingConnection if app.config['DB_PROFILING'] else sqlite3.Connection,
+    on_connect=register_pricing_functions
+)
+init_db_pool(app, db_pool)
+if app.config['DB_PROFILING']:
+    init_profiling(app)
+
+# Metrics: each worker flushes a snapshot into METRICS_DIR, /metrics merges them
+app.config['METRICS_DIR'] = os.environ.get('METRICS_DIR')
+app.config['METRICS_FLUSH_INTERVAL'] = float(os.environ.get('METRICS_FLUSH_INTERVAL', 1.0))
+metrics = MetricsRegistry(app.config['METRICS_DIR'], app.config['METRICS_FLUSH_INTERVAL'])
+metrics.collector(pool_collector(db_pool))
+init_metrics(app, metrics)
+
+# In-memory occupancy index (per worker, synced with other workers' writes)
+app.config['OCCUPANCY_INDEX'] = os.environ.get('OCCUPANCY_INDEX', '1') == '1'
+app.config['OCCUPANCY_SYNC_INTERVAL'] = float(os.environ.get('OCCUPANCY_SYNC_INTERVAL', 1.0))
+occupancy = OccupancyIndex(sync_interval=app.config['OCCUPANCY_SYNC_INTERVAL'])
+
+# Result cache for catalog pages and searches ('memory', 'file' or 'none').
+# The memory backend invalidates only within one worker, so with several
+# gunicorn workers use 'file' (CACHE_DIR) or rely on CACHE_TTL.
+app.config['CACHE_BACKEND'] = os.environ.get('CACHE_BACKEND', 'memory')
+app.config['CACHE_DIR'] = os.environ.get('CACHE_DIR', 'cache')
+app.config['CACHE_TTL'] = int(os.environ.get('CACHE_TTL', 300))
+app.config['CACHE_MAX_ENTRIES'] = int(os.environ.get('CACHE_MAX_ENTRIES', 1000))
+app.config['SEARCH_CACHE_TTL'] = int(os.environ.get('SEARCH_CACHE_TTL', 30))
+cache = create_cache(
+    app.config['CACHE_BACKEND'],
+    name='pages',
+    ttl=app.config['CACHE_TTL'],
+    max_entries=app.config['CACHE_MAX_ENTRIES'],
+    directory=app.config['CACHE_DIR'],
+    on_lookup=lambda name, result: metrics.inc('smartstay_cache_requests_total', cache=name, result=result)
+)
+
+# Outbox worker mail delivery ('smtp', or 'file' to write .eml files)
+app.config['MAIL_SERVER'] = os.environ.get('MAIL_SERVER', 'smtp.gmail.com')
+app.config['MAIL_PORT'] = int(os.environ.get('MAIL_PORT', 587))
+app.config['MAIL_USE_TLS'] = os.environ.get('MAIL_USE_TLS', '1').lower() in ('1', 'true', 'yes')
+app.config['MAIL_USERNAME'] = os.environ.get('MAIL_USERNAME', '')
+app.config['MAIL_PASSWORD'] = os.environ.get('MAIL_PASSWORD', '')
+app.config['MAIL_DEFAULT_SENDER'] = os.environ.get('MAIL_DEFAULT_SENDER', 'SmartStay <bookings@smartstay.com>')
+app.config['MAIL_BACKEND'] = os.environ.get('MAIL_BACKEND', 'smtp' if app.config['MAIL_USERNAME'] else 'file')
+app.config['MAIL_FILE_DIR'] = os.environ.get('MAIL_FILE_DIR', 'outbox_mail')
+
+# ETags come from change versions; bump ETAG_SALT to invalidate them on deploy
+app.config['ETAG_SALT'] = os.environ.get('ETAG_SALT', '2.0')
+init_conditional(app)
+
+# Nightly rate calendars: nights precomputed per room (rebuild daily with `flask reprice`)
+app.config['RATE_CALENDAR_DAYS'] = int(os.environ.get('RATE_CALENDAR_DAYS', 365))
+
+# Checkout holds: seconds a room stays held while the booking form is open
+app.config['HOLD_TTL'] = int(os.environ.get('HOLD_TTL', 600))
+
+# Room-type allocation: bookings take any free room of the chosen type, picked to minimize gaps
+app.config['ROOM_TYPE_ALLOCATION'] = os.environ.get('ROOM_TYPE_ALLOCATION', '1').lower() in ('1', 'true', 'yes')
+
+# Batch bookings: most stays one all-or-nothing request may book
+app.config['BATCH_BOOKING_MAX_ITEMS'] = int(os.environ.get('BATCH_BOOKING_MAX_ITEMS', 500))
+
+# Booking lifecycle (`flask lifecycle`): pending bookings (not checkout holds) left unconfirmed
+# this many hours are cancelled, and finished stays this many days past check-out are archived
+app.config['PENDING_BOOKING_TTL_HOURS'] = int(os.environ.get('PENDING_BOOKING_TTL_HOURS', 24))
+app.config['BOOKING_ARCHIVE_DAYS'] = int(os.environ.get('BOOKING_ARCHIVE_DAYS', 365))
+app.config['LIFECYCLE_INTERVAL'] = float(os.environ.get('LIFECYCLE_INTERVAL', 300))
+
+# Revenue analytics (/admin/analytics): seconds a report is cached per hotel and date range
+app.config['ANALYTICS_CACHE_TTL'] = int(os.environ.get('ANALYTICS_CACHE_TTL', 300))
+
+# Dashboard counters are fully recomputed at most this often (seconds)
+app.config['STATS_RECONCILE_INTERVAL'] = int(os.environ.get('STATS_RECONCILE_INTERVAL', 3600))
+
+# Hotel shards: SHARD_COUNT > 1 keeps users and hotels in DATABASE (the catalog)
+# and each hotel's rooms, bookings and reviews in DATABASE's shard file number
+# hotel_id % SHARD_COUNT; `flask shard-split` partitions an existing database
+app.config['SHARD_COUNT'] = max(1, int(os.environ.get('SHARD_COUNT', 1)))
+SHARD_PATHS = shard_paths(DATABASE, app.config['SHARD_COUNT']) if app.config['SHARD_COUNT'] > 1 else []
+shards = None
+if SHARD_PATHS:
+    shards = ShardSet([
+        ConnectionPool(
+            path,
+            max_size=app.config['DB_POOL_SIZE'],
+            pragmas=app.config['DB_PRAGMAS'],
+            factory=ProfilingConnection if app.config['DB_PROFILING'] else sqlite3.Connection,
+            on_connect=register_pricing_functions
+        )
+        for path in SHARD_PATHS
+    ])
+init_shards(app, shards)
+
+# Report replica: admin reports read a snapshot refreshed by `flask replica-refresh`
+# when it is no older than the route's bound; unset REPLICA_PATH keeps them on the primary
+# (reports read the shards directly when SHARD_COUNT > 1)
+app.config['REPLICA_PATH'] = os.environ.get('REPLICA_PATH', '')
+app.config['REPLICA_REFRESH_INTERVAL'] = float(os.environ.get('REPLICA_REFRESH_INTERVAL', 60))
+app.config['REPLICA_MAX_STALENESS'] = parse_staleness(os.environ.get(
+    'REPLICA_MAX_STALENESS',
+    'admin_dashboard=120,admin_bookings=300,admin_bookings_api=300,export_bookings=900,'
+    'admin_analytics=900,admin_analytics_pace=900'
+))
+replica = None
+if app.config['REPLICA_PATH'] and not SHARD_PATHS:
+    replica = Replica(
+        DATABASE, app.config['REPLICA_PATH'],
+        pragmas=app.config['DB_PRAGMAS'],
+        factory=ProfilingConnection if app.config['DB_PROFILING'] else sqlite3.Connection,
+        on_connect=register_pricing_functions
+    )
+    metrics.collector(replica_collector(replica))
+init_replica(app, replica)
 
 def get_db_connection():
-    """Get database connection with row factory"""
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Get a standalone database connection (outside of a request)"""
+    return connect(DATABASE, db_pool.pragmas, on_connect=register_pricing_functions)
 
-def init_db():
+def get_booking_connections():
+    """Standalone connections to every database holding bookings: the shards, or DATABASE"""
+    if not SHARD_PATHS:
+        return [get_db_connection()]
+    return [connect(path, db_pool.pragmas, on_connect=register_pricing_functions) for path in SHARD_PATHS]
+
+def init_db(database=None):
     """Initialize database with complete schema"""
-    conn = get_db_connection()
+    if database:
+        conn = connect(database, db_pool.pragmas, on_connect=register_pricing_functions)
+    else:
+        conn = get_db_connection()
     conn.executescript('''
         CREATE TABLE IF NOT EXISTS users (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -112,6 +304,7 @@ def init_db():
         CREATE INDEX IF NOT EXISTS idx_reviews_room ON reviews(room_id);
     ''')
     conn.commit()
+    migrate(conn)
     conn.close()
 
 # Helper functions
@@ -145,42 +338,116 @@ def calculate_nights(check_in, check_out):
     check_out_dt = datetime.strptime(check_out, '%Y-%m-%d')
     return (check_out_dt - check_in_dt).days
 
-def check_room_availability(room_id, check_in, check_out, exclude_booking_id=None):
-    """Check if room is available for given dates"""
-    conn = get_db_connection()
+def stay_error(check_in, check_out):
+    """Validation message for a requested stay, or None when it is bookable"""
+    try:
+        check_in_dt = datetime.strptime(check_in, '%Y-%m-%d')
+        check_out_dt = datetime.strptime(check_out, '%Y-%m-%d')
+    except (TypeError, ValueError):
+        return 'Invalid date format'
+    # strptime also takes unpadded dates (2026-11-5); stored dates must be ISO
+    if check_in_dt.strftime('%Y-%m-%d') != check_in or check_out_dt.strftime('%Y-%m-%d') != check_out:
+        return 'Invalid date format'
     
-    query = '''
-        SELECT COUNT(*) as count FROM bookings 
-        WHERE room_id = ? 
-        AND status IN ('confirmed', 'pending')
-        AND (
-            (check_in_date < ? AND check_out_date > ?)
-        )
-    '''
-    params = [room_id, check_out, check_in]
+    if check_in_dt >= check_out_dt:
+        return 'Check-out must be after check-in'
     
-    if exclude_booking_id:
-        query += ' AND booking_id != ?'
-        params.append(exclude_booking_id)
+    if check_in_dt < datetime.now().replace(hour=0, minute=0, second=0, microsecond=0):
+        return 'Check-in date cannot be in the past'
+    return None
+
+def booking_page_args(include_archived=False):
+    """Filters, decoded cursor and page size for a bookings listing request"""
+    filters = filters_from_args(request.args)
+    if include_archived:
+        filters['include_archived'] = 1
+    limit = page_size(request.args.get('per_page'))
+    token = request.args.get('cursor')
+    cursor = decode_cursor(token) if token else None
+    return filters, cursor, limit
+
+def next_page_url(endpoint, filters, next_cursor, limit):
+    """URL of the following page, keeping the active filters"""
+    if not next_cursor:
+        return None
+    active = {key: value for key, value in filters.items() if value}
+    return url_for(endpoint, cursor=next_cursor, per_page=limit, **active)
+
+def get_occupancy():
+    """Occupancy index caught up with other workers, or None when disabled (always with shards)"""
+    if not app.config['OCCUPANCY_INDEX'] or get_shards():
+        return None
+    occupancy.sync(get_db())
+    return occupancy
+
+def change_versions(*names):
+    """Global change versions, summed over the catalog and any hotel shards"""
+    found = [global_versions(get_db(), *names)]
+    if get_shards():
+        found += fan_out(lambda conn: global_versions(conn, *names))
+    return {name: sum(versions.get(name, 0) for versions in found) for name in names}
+
+def search_precondition(filters, limit, per_user=True):
+    """304 for a search whose catalog (and, when dated, bookings) version is unchanged"""
+    dated = bool(filters['check_in'] and filters['check_out'])
+    versions = change_versions(CATALOG, BOOKINGS) if dated else change_versions(CATALOG)
+    return precondition('search', make_key('search', dict(filters, limit=limit)),
+                        *sorted(versions.items()), per_user=per_user)
+
+def cached_search(filters, limit):
+    """Search results, cached by normalized filters; dated searches expire sooner"""
+    dated = bool(filters['check_in'] and filters['check_out'])
+    return cache.get_or_set(
+        make_key('search', dict(filters, limit=limit)),
+        lambda: search_all(filters, limit),
+        tags=['catalog', 'availability'] if dated else ['catalog'],
+        ttl=app.config['SEARCH_CACHE_TTL'] if dated else None
+    )
+
+def search_all(filters, limit):
+    """search() on the database, or on every hotel shard in parallel, merged"""
+    if not get_shards():
+        return search_rooms(get_db(), filters, limit)
+    return merge_search_results(fan_out(lambda conn: search_rooms(conn, filters, limit)), limit)
+
+def booking_page(conn, filters, cursor, limit, user_id=None):
+    """fetch_page() on conn, or merged from the hotel shards (just one for a hotel filter)"""
+    if not get_shards():
+        return fetch_page(conn, filters, cursor, limit, user_id)
+    if filters.get('hotel_id'):
+        return fetch_page(hotel_db(filters['hotel_id']), filters, cursor, limit, user_id)
+    return merge_pages(fan_out(lambda shard: page_rows(shard, filters, cursor, limit, user_id)), limit)
+
+def refresh_rates(conn, full=False):
+    """Recompute queued rate calendar changes; a busy database leaves them queued"""
+    try:
+        changed = refresh_calendars(conn, app.config['RATE_CALENDAR_DAYS'], full=full)
+    except sqlite3.OperationalError:
+        return 0
+    if changed:
+        cache.invalidate('catalog')
+    return changed
+
+def check_room_availability(room_id, check_in, check_out, exclude_booking_id=None):
+    """Check if room is available for given dates"""
+    index = get_occupancy()
+    if index and not exclude_booking_id:
+        return index.is_free(room_id, check_in, check_out)
     
-    result = conn.execute(query, params).fetchone()
-    conn.close()
+    conn = room_db(room_id)
+    available = repository.free_rooms(conn, [room_id], check_in, check_out, exclude_booking_id)
     
-    return result['count'] == 0
+    return bool(available)
 
 # Routes
 @app.route('/')
 def index():
     """Home page with featured hotels"""
-    conn = get_db_connection()
-    featured_rooms = conn.execute('''
-        SELECT r.*, h.name as hotel_name, h.city, h.rating
-        FROM rooms r
-        JOIN hotels h ON r.hotel_id = h.id
-        WHERE r.status = 'available'
-        LIMIT 6
-    ''').fetchall()
-    conn.close()
+    featured_rooms = cache.get_or_set(
+        'index',
+        lambda: [room for rooms in fan_out(repository.featured_rooms) for room in rooms][:6],
+        tags=['catalog']
+    )
     
     return render_template('index.html', featured_rooms=featured_rooms)
 
@@ -205,15 +472,10 @@ def register():
             return jsonify({'success': False, 'message': 'Invalid email address'}), 400
         
         try:
-            conn = get_db_connection()
-            conn.execute(
-                'INSERT INTO users (name, email, password, phone, role) VALUES (?, ?, ?, ?, ?)',
-                (name, email, generate_password_hash(password), phone, 'guest')
-            )
-            conn.commit()
-            conn.close()
+            user_id = repository.create_user(get_db(), name, email, generate_password_hash(password), phone)
+            mirror('users', user_id)
             return jsonify({'success': True, 'message': 'Registration successful! Please login.'})
-        except sqlite3.IntegrityError:
+        except DuplicateEmailError:
             return jsonify({'success': False, 'message': 'Email already registered'}), 400
         except Exception as e:
             return jsonify({'success': False, 'message': f'Error: {str(e)}'}), 400
@@ -228,9 +490,7 @@ def login():
         email = data.get('email', '').strip()
         password = data.get('password', '')
         
-        conn = get_db_connection()
-        user = conn.execute('SELECT * FROM users WHERE email = ?', (email,)).fetchone()
-        conn.close()
+        user = repository.user_by_email(get_db(), email)
         
         if user and check_password_hash(user['password'], password):
             session['user_id'] = user['id']
@@ -259,113 +519,137 @@ def logout():
 @login_required
 def profile():
     """User profile page"""
-    conn = get_db_connection()
-    user = conn.execute('SELECT * FROM users WHERE id = ?', (session['user_id'],)).fetchone()
-    bookings_count = conn.execute('SELECT COUNT(*) as count FROM bookings WHERE user_id = ?', (session['user_id'],)).fetchone()
-    conn.close()
+    user = repository.user_by_id(get_db(), session['user_id'])
+    bookings_count = sum(fan_out(lambda conn: repository.booking_count(conn, session['user_id'])))
     
-    return render_template('profile.html', user=user, bookings_count=bookings_count['count'])
+    return render_template('profile.html', user=user, bookings_count=bookings_count)
 
 @app.route('/search')
 def search():
-    """Search hotels and rooms"""
-    check_in = request.args.get('check_in', '')
-    check_out = request.args.get('check_out', '')
-    city = request.args.get('city', '').strip()
-    room_type = request.args.get('room_type', '')
-    min_price = request.args.get('min_price', 0, type=float)
-    max_price = request.args.get('max_price', 10000, type=float)
-    guests = request.args.get('guests', 1, type=int)
+    """Search hotels and rooms: ranked full-text matches with facet counts"""
+    filters = search_filters_from_args(request.args)
+    limit = request.args.get('limit', 60, type=int)
+    not_modified = search_precondition(filters, limit)
+    if not_modified:
+        return not_modified
     
-    conn = get_db_connection()
-    
-    query = '''
-        SELECT r.*, h.name as hotel_name, h.city, h.rating, h.id as hotel_id
-        FROM rooms r
-        JOIN hotels h ON r.hotel_id = h.id
-        WHERE r.status = 'available'
-        AND r.price_per_night BETWEEN ? AND ?
-        AND r.capacity >= ?
-    '''
-    params = [min_price, max_price, guests]
-    
-    if city:
-        query += ' AND h.city LIKE ?'
-        params.append(f'%{city}%')
-    
-    if room_type:
-        query += ' AND r.room_type = ?'
-        params.append(room_type)
-    
-    rooms = conn.execute(query, params).fetchall()
-    
-    # Filter by date availability if provided
-    if check_in and check_out:
-        available_rooms = []
-        for room in rooms:
-            if check_room_availability(room['id'], check_in, check_out):
-                available_rooms.append(room)
-        rooms = available_rooms
-    
-    conn.close()
+    found = cached_search(filters, limit)
     
     return render_template('search_results.html', 
-                         rooms=rooms,
-                         check_in=check_in,
-                         check_out=check_out,
-                         city=city,
-                         room_type=room_type)
+                         rooms=found['results'],
+                         total=found['total'],
+                         facets=found['facets'],
+                         q=filters['q'],
+                         amenities=filters['amenities'],
+                         check_in=filters['check_in'],
+                         check_out=filters['check_out'],
+                         city=filters['city'],
+                         room_type=filters['room_type'])
+
+@app.route('/api/search')
+def api_search():
+    """Search API: ranked results plus room_type, amenity, price and city facets"""
+    filters = search_filters_from_args(request.args)
+    limit = request.args.get('limit', 60, type=int)
+    return search_precondition(filters, limit, per_user=False) or jsonify(cached_search(filters, limit))
 
 @app.route('/hotel/<int:hotel_id>')
 def hotel_detail(hotel_id):
     """Hotel detail page"""
-    conn = get_db_connection()
-    hotel = conn.execute('SELECT * FROM hotels WHERE id = ?', (hotel_id,)).fetchone()
+    version = hotel_version(hotel_db(hotel_id), hotel_id)
+    if version:
+        not_modified = precondition('catalog', version[0], last_modified=version[1])
+        if not_modified:
+            return not_modified
     
-    if not hotel:
-        conn.close()
+    page = cache.get_or_set(f'hotel:{hotel_id}', lambda: repository.hotel_page(hotel_db(hotel_id), hotel_id),
+                            tags=['catalog', f'hotel:{hotel_id}'])
+    if not page:
         return render_template('404.html'), 404
     
-    rooms = conn.execute('SELECT * FROM rooms WHERE hotel_id = ? AND status = "available"', (hotel_id,)).fetchall()
-    reviews = conn.execute('''
-        SELECT r.*, u.name as user_name
-        FROM reviews r
-        JOIN users u ON r.user_id = u.id
-        WHERE r.hotel_id = ?
-        ORDER BY r.created_at DESC
-        LIMIT 10
-    ''', (hotel_id,)).fetchall()
-    
-    conn.close()
-    
-    return render_template('hotel_detail.html', hotel=hotel, rooms=rooms, reviews=reviews)
+    return render_template('hotel_detail.html', **page)
 
 @app.route('/room/<int:room_id>')
 def room_detail(room_id):
     """Room detail page"""
-    conn = get_db_connection()
-    room = conn.execute('''
-        SELECT r.*, h.name as hotel_name, h.city, h.rating, h.id as hotel_id
-        FROM rooms r
-        JOIN hotels h ON r.hotel_id = h.id
-        WHERE r.id = ?
-    ''', (room_id,)).fetchone()
+    version = room_version(room_db(room_id), room_id)
+    if version:
+        not_modified = precondition('catalog', version[0], version[1], last_modified=version[2])
+        if not_modified:
+            return not_modified
     
-    if not room:
-        conn.close()
+    page = cache.get_or_set(f'room:{room_id}', lambda: repository.room_page(room_db(room_id), room_id),
+                            tags=['catalog', f'room:{room_id}'])
+    if not page:
         return render_template('404.html'), 404
     
-    reviews = conn.execute('''
-        SELECT r.*, u.name as user_name
-        FROM reviews r
-        JOIN users u ON r.user_id = u.id
-        WHERE r.room_id = ?
-        ORDER BY r.created_at DESC
-    ''', (room_id,)).fetchall()
+    return render_template('room_detail.html', **page)
+
+@app.route('/room/<int:room_id>/reviews', methods=['POST'])
+@login_required
+def submit_review(room_id):
+    """Review a room the guest has booked; updates room and hotel ratings"""
+    data = request.get_json() or {}
     
-    conn.close()
+    try:
+        review = add_review(room_db(room_id), session['user_id'], room_id, data.get('rating'),
+                            data.get('title', '').strip(), data.get('comment', '').strip())
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except RoomNotFoundError:
+        return jsonify({'success': False, 'message': 'Room not found'}), 404
+    except ReviewNotAllowedError as e:
+        return jsonify({'success': False, 'message': str(e)}), 403
+    except DuplicateReviewError as e:
+        return jsonify({'success': False, 'message': str(e)}), 409
+    except sqlite3.OperationalError:
+        return jsonify({'success': False, 'message': 'Database busy, please retry'}), 503
+    
+    pull_hotel_rating(review['hotel_id'])
+    cache.invalidate('catalog', f"hotel:{review['hotel_id']}", f'room:{room_id}')
     
-    return render_template('room_detail.html', room=room, reviews=reviews)
+    return jsonify({
+        'success': True,
+        'message': 'Thank you for your review!',
+        'review': review,
+        'summary': review_summary(room_db(room_id), ROOM, room_id)
+    })
+
+def review_listing(scope, scope_id, conn, version):
+    """Reviews API response for a room or hotel: summary plus one keyset page"""
+    if not version:
+        return jsonify({'success': False, 'message': f'{scope.capitalize()} not found'}), 404
+    
+    token = request.args.get('cursor')
+    limit = page_size(request.args.get('per_page'))
+    try:
+        cursor = decode_cursor(token) if token else None
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    
+    not_modified = precondition('catalog', *version[:-1], token, limit, last_modified=version[-1],
+                                per_user=False)
+    if not_modified:
+        return not_modified
+    
+    reviews, next_cursor = review_page(conn, scope, scope_id, cursor, limit)
+    return jsonify({
+        'summary': review_summary(conn, scope, scope_id),
+        'reviews': reviews,
+        'next_cursor': next_cursor
+    })
+
+@app.route('/api/rooms/<int:room_id>/reviews')
+def room_reviews_api(room_id):
+    """API listing a room's reviews newest first, with its rating summary"""
+    conn = room_db(room_id)
+    return review_listing(ROOM, room_id, conn, room_version(conn, room_id))
+
+@app.route('/api/hotels/<int:hotel_id>/reviews')
+def hotel_reviews_api(hotel_id):
+    """API listing a hotel's reviews newest first, with its rating summary"""
+    conn = hotel_db(hotel_id)
+    return review_listing(HOTEL, hotel_id, conn, hotel_version(conn, hotel_id))
 
 @app.route('/booking/<int:room_id>', methods=['GET', 'POST'])
 @login_required
@@ -377,158 +661,279 @@ def create_booking(room_id):
         check_out = data.get('check_out_date')
         guests = data.get('number_of_guests', 1)
         special_requests = data.get('special_requests', '')
+        hold_id = data.get('hold_id')
         
         # Validate dates
-        try:
-            check_in_dt = datetime.strptime(check_in, '%Y-%m-%d')
-            check_out_dt = datetime.strptime(check_out, '%Y-%m-%d')
-            
-            if check_in_dt >= check_out_dt:
-                return jsonify({'success': False, 'message': 'Check-out must be after check-in'}), 400
-            
-            if check_in_dt < datetime.now().replace(hour=0, minute=0, second=0, microsecond=0):
-                return jsonify({'success': False, 'message': 'Check-in date cannot be in the past'}), 400
-        except ValueError:
-            return jsonify({'success': False, 'message': 'Invalid date format'}), 400
-        
-        # Check room availability
-        if not check_room_availability(room_id, check_in, check_out):
-            return jsonify({'success': False, 'message': 'Room not available for selected dates'}), 400
-        
-        conn = get_db_connection()
-        room = conn.execute('SELECT * FROM rooms WHERE id = ?', (room_id,)).fetchone()
-        
-        if not room:
-            conn.close()
-            return jsonify({'success': False, 'message': 'Room not found'}), 404
-        
-        nights = calculate_nights(check_in, check_out)
-        total_price = nights * room['price_per_night']
-        booking_id = generate_booking_id()
+        error = stay_error(check_in, check_out)
+        if error:
+            return jsonify({'success': False, 'message': error}), 400
         
+        # Availability check and insert happen in one write transaction;
+        # a live hold from the booking form is confirmed at its held price
+        conn = room_db(room_id)
         try:
-            conn.execute('''
-                INSERT INTO bookings 
-                (booking_id, user_id, room_id, hotel_id, check_in_date, check_out_date, 
-                 number_of_guests, total_price, status, special_requests)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (booking_id, session['user_id'], room_id, room['hotel_id'], check_in, check_out,
-                  guests, total_price, 'confirmed', special_requests))
-            
-            conn.commit()
-            conn.close()
-            
-            return jsonify({
-                'success': True,
-                'message': 'Booking confirmed!',
-                'booking_id': booking_id,
-                'total_price': total_price
-            })
+            booking = None
+            if hold_id:
+                try:
+                    booking = confirm_hold(conn, hold_id, session['user_id'], room_id,
+                                           check_in, check_out, guests, special_requests)
+                except HoldExpiredError:
+                    pass
+            if booking is None:
+                booking = reserve_room(
+                    conn, generate_booking_id(), session['user_id'], room_id,
+                    check_in, check_out, guests, special_requests,
+                    allocate=app.config['ROOM_TYPE_ALLOCATION']
+                )
+        except RoomNotFoundError:
+            metrics.inc('smartstay_bookings_total', outcome='not_found')
+            return jsonify({'success': False, 'message': 'Room not found'}), 404
+        except RoomUnavailableError as e:
+            metrics.inc('smartstay_bookings_total', outcome='conflict')
+            return jsonify({'success': False, 'message': str(e)}), 400
+        except ReservationBusyError as e:
+            metrics.inc('smartstay_bookings_total', outcome='busy')
+            return jsonify({'success': False, 'message': str(e)}), 503
         except Exception as e:
-            conn.close()
+            metrics.inc('smartstay_bookings_total', outcome='error')
             return jsonify({'success': False, 'message': f'Booking error: {str(e)}'}), 400
+        
+        metrics.inc('smartstay_bookings_total', outcome='created')
+        occupancy.add(booking['booking_id'], booking['room_id'], check_in, check_out)
+        cache.invalidate('availability')
+        refresh_rates(conn)
+        
+        return jsonify({
+            'success': True,
+            'message': 'Booking confirmed!',
+            'booking_id': booking['booking_id'],
+            'room_id': booking['room_id'],
+            'total_price': booking['total_price']
+        })
     
-    conn = get_db_connection()
-    room = conn.execute('''
-        SELECT r.*, h.name as hotel_name, h.city
-        FROM rooms r
-        JOIN hotels h ON r.hotel_id = h.id
-        WHERE r.id = ?
-    ''', (room_id,)).fetchone()
-    conn.close()
+    room = repository.room_with_hotel(room_db(room_id), room_id)
     
     if not room:
         return render_template('404.html'), 404
     
-    return render_template('booking.html', room=room)
+    return render_template('booking.html', room=room, hold_ttl=app.config['HOLD_TTL'])
+
+@app.route('/booking/batch', methods=['POST'])
+@login_required
+def create_batch_booking():
+    """Book a block of rooms or room types all-or-nothing"""
+    data = request.get_json() or {}
+    raw_items = data.get('items')
+    
+    if not isinstance(raw_items, list) or not raw_items:
+        return jsonify({'success': False, 'message': 'items must be a non-empty list'}), 400
+    if len(raw_items) > app.config['BATCH_BOOKING_MAX_ITEMS']:
+        return jsonify({
+            'success': False,
+            'message': f"At most {app.config['BATCH_BOOKING_MAX_ITEMS']} items per batch"
+        }), 400
+    
+    items, failures = [], []
+    for index, raw in enumerate(raw_items):
+        if not isinstance(raw, dict):
+            failures.append({'index': index, 'message': 'Item must be an object'})
+            continue
+        error = stay_error(raw.get('check_in_date'), raw.get('check_out_date'))
+        if not error and not raw.get('room_id') and not (raw.get('hotel_id') and raw.get('room_type')):
+            error = 'room_id or hotel_id and room_type required'
+        if error:
+            failures.append({'index': index, 'message': error})
+            continue
+        items.append({
+            'room_id': raw.get('room_id'),
+            'hotel_id': raw.get('hotel_id'),
+            'room_type': raw.get('room_type'),
+            'check_in': raw['check_in_date'],
+            'check_out': raw['check_out_date'],
+            'guests': raw.get('number_of_guests', 1),
+            'special_requests': raw.get('special_requests', ''),
+        })
+    if failures:
+        return jsonify({'success': False, 'message': 'Invalid items', 'failures': failures}), 400
+    
+    # A batch is one transaction, so with shards all its hotels must share one
+    conn = get_db()
+    shards = get_shards()
+    if shards:
+        hotel_ids = {item['hotel_id'] or shards.hotel_for_room(conn, item['room_id']) for item in items} - {None}
+        if len({shards.index_for_hotel(hotel_id) for hotel_id in hotel_ids}) > 1:
+            return jsonify({
+                'success': False,
+                'message': 'All items of a batch must be for hotels stored on the same shard'
+            }), 400
+        conn = hotel_db(next(iter(hotel_ids), None))
+    
+    booking_ids = set()
+    while len(booking_ids) < len(items):
+        booking_ids.add(generate_booking_id())
+    
+    try:
+        bookings = reserve_batch(
+            conn, sorted(booking_ids), session['user_id'], items,
+            allocate=app.config['ROOM_TYPE_ALLOCATION']
+        )
+    except BatchUnavailableError as e:
+        metrics.inc('smartstay_bookings_total', outcome='conflict')
+        return jsonify({'success': False, 'message': str(e), 'failures': e.failures}), 409
+    except ReservationBusyError as e:
+        metrics.inc('smartstay_bookings_total', outcome='busy')
+        return jsonify({'success': False, 'message': str(e)}), 503
+    
+    metrics.inc('smartstay_bookings_total', len(bookings), outcome='created')
+    for booking in bookings:
+        occupancy.add(booking['booking_id'], booking['room_id'], booking['check_in'], booking['check_out'])
+    cache.invalidate('availability')
+    refresh_rates(conn)
+    
+    return jsonify({
+        'success': True,
+        'message': f'{len(bookings)} bookings confirmed!',
+        'bookings': bookings,
+        'total_price': round(sum(booking['total_price'] for booking in bookings), 2)
+    })
+
+@app.route('/booking/<int:room_id>/hold', methods=['POST'])
+@login_required
+def hold_room(room_id):
+    """Hold a room for the stay chosen on the booking form until HOLD_TTL runs out"""
+    data = request.get_json() or {}
+    check_in = data.get('check_in_date')
+    check_out = data.get('check_out_date')
+    
+    error = stay_error(check_in, check_out)
+    if error:
+        return jsonify({'success': False, 'message': error}), 400
+    
+    try:
+        hold = reserve_room(
+            room_db(room_id), generate_booking_id(), session['user_id'], room_id, check_in, check_out,
+            data.get('number_of_guests', 1), hold_seconds=app.config['HOLD_TTL'],
+            allocate=app.config['ROOM_TYPE_ALLOCATION']
+        )
+    except RoomNotFoundError:
+        return jsonify({'success': False, 'message': 'Room not found'}), 404
+    except RoomUnavailableError as e:
+        return jsonify({'success': False, 'message': str(e)}), 409
+    except ReservationBusyError as e:
+        return jsonify({'success': False, 'message': str(e)}), 503
+    
+    for replaced in hold['replaced_holds']:
+        occupancy.remove(replaced)
+    occupancy.add_hold(hold['booking_id'], hold['room_id'], check_in, check_out, hold['hold_expires_at'])
+    cache.invalidate('availability')
+    
+    return jsonify({
+        'success': True,
+        'hold_id': hold['booking_id'],
+        'room_id': hold['room_id'],
+        'expires_at': hold['hold_expires_at'],
+        'total_price': hold['total_price']
+    })
+
+@app.route('/booking/hold/<booking_id>/release', methods=['POST'])
+@login_required
+def release_room_hold(booking_id):
+    """Give up a hold before it expires (the booking form calls this on leave)"""
+    if not release_hold(booking_db(booking_id), booking_id, session['user_id']):
+        return jsonify({'success': False, 'message': 'Hold not found'}), 404
+    
+    occupancy.remove(booking_id)
+    cache.invalidate('availability')
+    return jsonify({'success': True})
 
 @app.route('/my-bookings')
 @login_required
 def my_bookings():
-    """View user bookings"""
-    conn = get_db_connection()
-    bookings = conn.execute('''
-        SELECT b.*, r.room_number, r.room_type, r.price_per_night, h.name as hotel_name
-        FROM bookings b
-        JOIN rooms r ON b.room_id = r.id
-        JOIN hotels h ON b.hotel_id = h.id
-        WHERE b.user_id = ?
-        ORDER BY b.created_at DESC
-    ''', (session['user_id'],)).fetchall()
+    """View user bookings, one keyset page at a time"""
+    try:
+        filters, cursor, limit = booking_page_args(include_archived=True)
+    except ValueError:
+        return redirect(url_for('my_bookings'))
     
-    conn.close()
+    bookings, next_cursor = booking_page(get_db(), filters, cursor, limit, user_id=session['user_id'])
+    
+    return Response(stream_with_context(stream_template(
+        'my_bookings.html',
+        bookings=bookings,
+        filters=filters,
+        next_url=next_page_url('my_bookings', filters, next_cursor, limit)
+    )))
+
+@app.route('/api/my-bookings')
+@login_required
+def my_bookings_api():
+    """API listing the current user's bookings, archived stays included (keyset paginated, streamed)"""
+    try:
+        filters, cursor, limit = booking_page_args(include_archived=True)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    
+    if get_shards():
+        bookings, next_cursor = booking_page(get_db(), filters, cursor, limit, user_id=session['user_id'])
+        return jsonify({'bookings': [dict(row) for row in bookings], 'next_cursor': next_cursor})
     
-    return render_template('my_bookings.html', bookings=bookings)
+    rows = stream_page_json(get_db(), filters, cursor, limit, user_id=session['user_id'])
+    return Response(stream_with_context(rows), mimetype='application/json')
 
 @app.route('/booking/<booking_id>/cancel', methods=['POST'])
 @login_required
 def cancel_booking(booking_id):
     """Cancel booking"""
-    conn = get_db_connection()
-    booking = conn.execute(
-        'SELECT * FROM bookings WHERE booking_id = ? AND user_id = ?',
-        (booking_id, session['user_id'])
-    ).fetchone()
+    conn = booking_db(booking_id)
+    booking = repository.user_booking(conn, booking_id, session['user_id'])
     
     if not booking:
-        conn.close()
         return jsonify({'success': False, 'message': 'Booking not found'}), 404
     
     if booking['status'] == 'cancelled':
-        conn.close()
         return jsonify({'success': False, 'message': 'Booking already cancelled'}), 400
     
     try:
-        conn.execute(
-            'UPDATE bookings SET status = ? WHERE booking_id = ?',
-            ('cancelled', booking_id)
-        )
-        conn.commit()
-        conn.close()
+        repository.cancel_booking(conn, booking_id)
+        occupancy.remove(booking_id)
+        cache.invalidate('availability')
+        refresh_rates(conn)
         
         return jsonify({'success': True, 'message': 'Booking cancelled successfully'})
     except Exception as e:
-        conn.close()
         return jsonify({'success': False, 'message': str(e)}), 400
 
 @app.route('/admin')
 @admin_required
 def admin_dashboard():
     """Admin dashboard"""
-    conn = get_db_connection()
+    # Counters are a primary-key read that may reconcile, so they stay on the primary
+    interval = app.config['STATS_RECONCILE_INTERVAL']
+    stats = repository.dashboard_stats(get_db(), interval)
     
-    stats = {
-        'total_hotels': conn.execute('SELECT COUNT(*) as count FROM hotels').fetchone()['count'],
-        'total_rooms': conn.execute('SELECT COUNT(*) as count FROM rooms').fetchone()['count'],
-        'total_bookings': conn.execute('SELECT COUNT(*) as count FROM bookings').fetchone()['count'],
-        'total_users': conn.execute('SELECT COUNT(*) as count FROM users WHERE role = "guest"').fetchone()['count'],
-        'total_revenue': conn.execute('SELECT SUM(total_price) as sum FROM bookings WHERE status = "confirmed"').fetchone()['sum'] or 0,
-        'pending_bookings': conn.execute('SELECT COUNT(*) as count FROM bookings WHERE status = "pending"').fetchone()['count'],
-    }
-    
-    recent_bookings = conn.execute('''
-        SELECT b.*, r.room_number, h.name as hotel_name, u.name as user_name
-        FROM bookings b
-        JOIN rooms r ON b.room_id = r.id
-        JOIN hotels h ON b.hotel_id = h.id
-        JOIN users u ON b.user_id = u.id
-        ORDER BY b.created_at DESC
-        LIMIT 10
-    ''').fetchall()
-    
-    conn.close()
+    if get_shards():
+        stats = merge_stats(stats, fan_out(lambda conn: repository.dashboard_stats(conn, interval)))
+        recent = [row for rows in fan_out(repository.recent_bookings) for row in rows]
+        recent_bookings = sorted(recent, key=lambda row: row['created_at'], reverse=True)[:10]
+    else:
+        recent_bookings = repository.recent_bookings(get_report_db())
     
     return render_template('admin_dashboard.html', stats=stats, recent_bookings=recent_bookings)
 
+@app.route('/admin/stats/reconcile', methods=['POST'])
+@admin_required
+def admin_reconcile_stats():
+    """Recompute dashboard counters from the source tables"""
+    values = repository.reconcile_dashboard(get_db())
+    if get_shards():
+        values = merge_stats(values, fan_out(repository.reconcile_dashboard))
+    return jsonify({'success': True, 'stats': values})
+
 @app.route('/admin/hotels')
 @admin_required
 def admin_hotels():
     """Manage hotels"""
-    conn = get_db_connection()
-    hotels = conn.execute('SELECT * FROM hotels').fetchall()
-    conn.close()
-    
-    return render_template('admin_hotels.html', hotels=hotels)
+    return render_template('admin_hotels.html', hotels=repository.list_hotels(get_db()))
 
 @app.route('/admin/hotels/add', methods=['POST'])
 @admin_required
@@ -537,15 +942,9 @@ def add_hotel():
     data = request.get_json()
     
     try:
-        conn = get_db_connection()
-        conn.execute('''
-            INSERT INTO hotels (name, description, city, address, phone, email, rating)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (data['name'], data.get('description', ''), data['city'], data['address'],
-              data.get('phone', ''), data.get('email', ''), data.get('rating', 4.5)))
-        
-        conn.commit()
-        conn.close()
+        hotel_id = repository.add_hotel(get_db(), data)
+        mirror('hotels', hotel_id)
+        cache.invalidate('catalog', f'hotel:{hotel_id}')
         
         return jsonify({'success': True, 'message': 'Hotel added successfully'})
     except Exception as e:
@@ -555,17 +954,8 @@ def add_hotel():
 @admin_required
 def admin_rooms():
     """Manage rooms"""
-    conn = get_db_connection()
-    rooms = conn.execute('''
-        SELECT r.*, h.name as hotel_name
-        FROM rooms r
-        JOIN hotels h ON r.hotel_id = h.id
-    ''').fetchall()
-    
-    hotels = conn.execute('SELECT * FROM hotels').fetchall()
-    conn.close()
-    
-    return render_template('admin_rooms.html', rooms=rooms, hotels=hotels)
+    rooms = [room for rooms in fan_out(repository.list_rooms) for room in rooms]
+    return render_template('admin_rooms.html', rooms=rooms, hotels=repository.list_hotels(get_db()))
 
 @app.route('/admin/rooms/add', methods=['POST'])
 @admin_required
@@ -574,16 +964,11 @@ def add_room():
     data = request.get_json()
     
     try:
-        conn = get_db_connection()
-        conn.execute('''
-            INSERT INTO rooms 
-            (hotel_id, room_number, room_type, capacity, price_per_night, description, amenities, status)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (data['hotel_id'], data['room_number'], data['room_type'], data['capacity'],
-              data['price_per_night'], data.get('description', ''), data.get('amenities', ''), 'available'))
-        
-        conn.commit()
-        conn.close()
+        conn = hotel_db(data['hotel_id'])
+        room_id = repository.add_room(conn, data, new_room_id(get_db(), data['hotel_id']) if get_shards() else None)
+        occupancy.add_room(room_id, data['hotel_id'])
+        cache.invalidate('catalog', f"hotel:{data['hotel_id']}", f'room:{room_id}')
+        refresh_rates(conn)
         
         return jsonify({'success': True, 'message': 'Room added successfully'})
     except Exception as e:
@@ -592,41 +977,595 @@ def add_room():
 @app.route('/admin/bookings')
 @admin_required
 def admin_bookings():
-    """Manage bookings"""
-    conn = get_db_connection()
-    bookings = conn.execute('''
-        SELECT b.*, r.room_number, h.name as hotel_name, u.name as user_name
-        FROM bookings b
-        JOIN rooms r ON b.room_id = r.id
-        JOIN hotels h ON b.hotel_id = h.id
-        JOIN users u ON b.user_id = u.id
-        ORDER BY b.created_at DESC
-    ''').fetchall()
+    """Manage bookings, one keyset page at a time"""
+    try:
+        filters, cursor, limit = booking_page_args()
+    except ValueError:
+        return redirect(url_for('admin_bookings'))
     
-    conn.close()
+    conn = get_report_db()
+    bookings, next_cursor = booking_page(conn, filters, cursor, limit)
+    hotels = repository.hotel_names(conn)
     
-    return render_template('admin_bookings.html', bookings=bookings)
+    return Response(stream_with_context(stream_template(
+        'admin_bookings.html',
+        bookings=bookings,
+        hotels=hotels,
+        filters=filters,
+        next_url=next_page_url('admin_bookings', filters, next_cursor, limit)
+    )))
+
+@app.route('/admin/import/<entity>', methods=['POST'])
+@admin_required
+def bulk_import(entity):
+    """Bulk-load hotels, rooms or bookings from an uploaded CSV/JSON file or a JSON list"""
+    if entity not in IMPORT_ENTITIES:
+        return jsonify({'success': False, 'message': f'Unknown entity: {entity}'}), 404
+    if get_shards():
+        return jsonify({
+            'success': False,
+            'message': 'Bulk import loads an unsharded database; import, then run flask shard-split'
+        }), 400
+    
+    upload = request.files.get('file')
+    try:
+        if upload:
+            fmt = request.form.get('format') or upload.filename.rsplit('.', 1)[-1].lower()
+            records = records_from_upload(upload.read(), fmt)
+        else:
+            records = request.get_json()
+            if not isinstance(records, list):
+                return jsonify({'success': False, 'message': 'Expected a JSON list of records'}), 400
+        
+        report = import_records(get_db(), entity, records,
+                                defer_indexes=request.args.get('defer_indexes') == '1')
+    except (ValueError, UnicodeDecodeError) as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    
+    if report.inserted:
+        cache.invalidate('catalog', 'availability')
+        refresh_rates(get_db())
+    
+    return jsonify({'success': report.failed == 0, **report.to_dict()})
+
+@app.route('/admin/bookings/export')
+@admin_required
+def export_bookings():
+    """Stream bookings as CSV or NDJSON (optionally gzipped) for finance"""
+    fmt = request.args.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'success': False, 'message': f'Format must be one of {EXPORT_FORMATS}'}), 400
+    
+    filters = {
+        'status': request.args.get('status'),
+        'date_from': request.args.get('date_from'),
+        'date_to': request.args.get('date_to'),
+        'include_archived': request.args.get('include_archived') == '1',
+    }
+    with_names = request.args.get('names', '1') != '0'
+    gzip = request.args.get('gzip') == '1'
+    
+    conn = shard_dbs() if get_shards() else get_report_db()
+    stream = export_stream(conn, filters, fmt, with_names, gzip)
+    filename = f'bookings.{fmt}' + ('.gz' if gzip else '')
+    return Response(
+        stream_with_context(stream),
+        mimetype='application/gzip' if gzip else content_type(fmt),
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
+@app.route('/api/admin/bookings')
+@admin_required
+def admin_bookings_api():
+    """API listing all bookings (keyset paginated, streamed)"""
+    try:
+        filters, cursor, limit = booking_page_args()
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    
+    if get_shards():
+        bookings, next_cursor = booking_page(get_db(), filters, cursor, limit)
+        return jsonify({'bookings': [dict(row) for row in bookings], 'next_cursor': next_cursor})
+    
+    rows = stream_page_json(get_report_db(), filters, cursor, limit)
+    return Response(stream_with_context(rows), mimetype='application/json')
+
+@app.route('/admin/db/pool')
+@admin_required
+def admin_db_pool():
+    """Connection pool counters for this worker"""
+    return jsonify(db_pool.stats())
+
+@app.route('/admin/replica')
+@admin_required
+def admin_replica():
+    """Report replica snapshot age and how many changes it is behind the primary"""
+    if replica is None:
+        return jsonify({'enabled': False})
+    return jsonify(dict(replica.status(get_db()), enabled=True,
+                        max_staleness=app.config['REPLICA_MAX_STALENESS']))
+
+@app.route('/admin/replica/refresh', methods=['POST'])
+@admin_required
+def admin_refresh_replica():
+    """Take a new report snapshot now"""
+    if replica is None:
+        return jsonify({'success': False, 'message': 'REPLICA_PATH is not set'}), 400
+    return jsonify({'success': True, 'seconds': replica.refresh()})
+
+@app.route('/admin/db/profile', methods=['GET', 'DELETE'])
+@admin_required
+def admin_db_profile():
+    """Per-route SQL statistics for this worker (DELETE resets them)"""
+    query_stats = app.extensions.get('query_stats')
+    if query_stats is None:
+        return jsonify({'success': False, 'message': 'Query profiling is disabled'}), 404
+    
+    if request.method == 'DELETE':
+        query_stats.reset()
+        return jsonify({'success': True})
+    
+    return jsonify(query_stats.snapshot())
+
+@app.route('/admin/cache', methods=['GET', 'DELETE'])
+@admin_required
+def admin_cache():
+    """Page cache statistics (DELETE empties the cache)"""
+    if request.method == 'DELETE':
+        cache.clear()
+        return jsonify({'success': True})
+    
+    return jsonify(cache.stats())
+
+@app.route('/admin/outbox')
+@admin_required
+def admin_outbox():
+    """Outbox backlog: pending, sent and dead-lettered booking events"""
+    if not get_shards():
+        return jsonify(outbox_stats(get_db()))
+    
+    parts = fan_out(outbox_stats)
+    merged = {status: sum(part[status] for part in parts) for status in ('pending', 'sent', 'dead')}
+    merged['oldest_pending_seconds'] = max(part['oldest_pending_seconds'] for part in parts)
+    return jsonify(dict(merged, shards=parts))
+
+@app.route('/admin/jobs')
+@admin_required
+def admin_jobs():
+    """Booking lifecycle job runs: totals and throughput per job, plus recent runs"""
+    if not get_shards():
+        return jsonify(job_summary(get_db()))
+    return jsonify({'shards': fan_out(job_summary)})
+
+def analytics_range(args):
+    """(start, end, hotel_id) from ?start=&end=&hotel_id=; the last 30 nights by default"""
+    try:
+        start = datetime.strptime(args['start'], '%Y-%m-%d').date() if args.get('start') else None
+        end = datetime.strptime(args['end'], '%Y-%m-%d').date() if args.get('end') else None
+    except ValueError:
+        raise ValueError('Dates must be YYYY-MM-DD')
+    start = start or datetime.now().date() - timedelta(days=30)
+    end = end or start + timedelta(days=30)
+    if not 0 < (end - start).days <= MAX_RANGE_DAYS:
+        raise ValueError(f'end must be 1 to {MAX_RANGE_DAYS} days after start')
+    return start, end, args.get('hotel_id', type=int)
+
+def analytics_parts(work, hotel_id):
+    """[work(conn)] on the database holding hotel_id, or on every shard for all hotels"""
+    if get_shards():
+        return [work(hotel_db(hotel_id))] if hotel_id else fan_out(work)
+    return [work(get_report_db())]
+
+@app.route('/admin/analytics')
+@admin_required
+def admin_analytics():
+    """Occupancy, ADR and RevPAR per hotel and room type, with nightly occupancy"""
+    try:
+        start, end, hotel_id = analytics_range(request.args)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    
+    key = make_key('analytics', {'start': start.isoformat(), 'end': end.isoformat(), 'hotel_id': hotel_id})
+    return jsonify(cache.get_or_set(
+        key,
+        lambda: merge_performance(
+            analytics_parts(lambda conn: performance(conn, start, end, hotel_id), hotel_id), start, end
+        ),
+        tags=['catalog', 'availability'],
+        ttl=app.config['ANALYTICS_CACHE_TTL']
+    ))
+
+@app.route('/admin/analytics/pace')
+@admin_required
+def admin_analytics_pace():
+    """Booking pace: room nights and revenue of a date range on the books each day before it"""
+    try:
+        start, end, hotel_id = analytics_range(request.args)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    horizon = min(max(request.args.get('horizon', DEFAULT_PACE_HORIZON, type=int), 0), 365)
+    
+    key = make_key('analytics-pace', {'start': start.isoformat(), 'end': end.isoformat(),
+                                      'hotel_id': hotel_id, 'horizon': horizon})
+    return jsonify(cache.get_or_set(
+        key,
+        lambda: merge_pace(
+            analytics_parts(lambda conn: pace(conn, start, end, hotel_id, horizon), hotel_id), start, end, horizon
+        ),
+        tags=['catalog', 'availability'],
+        ttl=app.config['ANALYTICS_CACHE_TTL']
+    ))
+
+@app.route('/admin/outbox/requeue', methods=['POST'])
+@admin_required
+def admin_outbox_requeue():
+    """Retry dead-lettered events (all, or the given event ids of one shard)"""
+    data = request.get_json(silent=True) or {}
+    event_ids = data.get('ids')
+    if get_shards() and 'shard' in data:
+        requeued = requeue_dead(shard_db(int(data['shard'])), event_ids)
+    else:
+        requeued = sum(fan_out(lambda conn: requeue_dead(conn, event_ids)))
+    return jsonify({'success': True, 'requeued': requeued})
+
+@app.route('/admin/rates', methods=['GET', 'POST'])
+@admin_required
+def admin_rates():
+    """List rate rules and calendar coverage, or add a rule (POST)"""
+    # Every shard keeps the same rule list, written to all of them in order
+    conns = shard_dbs()
+    if request.method == 'POST':
+        try:
+            rule_ids = [add_rule(conn, request.get_json() or {}) for conn in conns]
+        except (ValueError, sqlite3.IntegrityError) as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+        return jsonify({'success': True, 'rule_id': rule_ids[0],
+                        'calendars_updated': sum(refresh_rates(conn) for conn in conns)})
+    
+    return jsonify({'rules': list_rules(conns[0]),
+                    'calendar': merge_calendar_stats(fan_out(calendar_stats))})
+
+@app.route('/admin/rates/<int:rule_id>', methods=['DELETE'])
+@admin_required
+def admin_delete_rate(rule_id):
+    """Remove a rate rule"""
+    conns = shard_dbs()
+    if not all([delete_rule(conn, rule_id) for conn in conns]):
+        return jsonify({'success': False, 'message': 'Rule not found'}), 404
+    return jsonify({'success': True, 'calendars_updated': sum(refresh_rates(conn) for conn in conns)})
+
+@app.route('/admin/rates/rebuild', methods=['POST'])
+@admin_required
+def admin_rebuild_rates():
+    """Rebuild every room's rate calendar from today"""
+    updated = sum(refresh_rates(conn, full=True) for conn in shard_dbs())
+    return jsonify({'success': True, 'calendars_updated': updated})
+
+@app.route('/admin/inventory/rebuild', methods=['POST'])
+@admin_required
+def admin_rebuild_inventory():
+    """Recount room-type inventory from rooms and bookings"""
+    fan_out(rebuild_inventory)
+    cache.invalidate('availability')
+    return jsonify({'success': True})
+
+@app.route('/admin/occupancy/verify')
+@admin_required
+def admin_occupancy_verify():
+    """Compare this worker's occupancy index with the database"""
+    if get_shards():
+        return jsonify({'success': False, 'message': 'The occupancy index is not used with hotel shards'}), 400
+    
+    conn = get_db()
+    occupancy.sync(conn, force=True)
+    return jsonify(occupancy.verify(conn))
 
 @app.route('/api/check-availability', methods=['POST'])
 def check_availability_api():
-    """API to check room availability"""
+    """API to check room availability for one room or many rooms at once"""
     data = request.get_json()
-    room_id = data.get('room_id')
     check_in = data.get('check_in_date')
     check_out = data.get('check_out_date')
     
+    if not check_in or not check_out:
+        return jsonify({'success': False, 'message': 'Check-in and check-out dates required'}), 400
+    
+    room_ids = data.get('room_ids')
+    if room_ids is not None:
+        if not isinstance(room_ids, list):
+            return jsonify({'success': False, 'message': 'room_ids must be a list'}), 400
+        try:
+            room_ids = [int(room_id) for room_id in room_ids]
+        except (TypeError, ValueError):
+            return jsonify({'success': False, 'message': 'room_ids must be integers'}), 400
+        
+        if get_shards():
+            by_shard = {}
+            for room_id in room_ids:
+                by_shard.setdefault(room_db(room_id), []).append(room_id)
+            availability = {}
+            for conn, ids in by_shard.items():
+                availability.update(repository.room_availability(conn, ids, check_in, check_out))
+        else:
+            availability = repository.room_availability(get_db(), room_ids, check_in, check_out)
+        
+        # Unknown rooms are reported unavailable
+        return jsonify({
+            'availability': {str(room_id): free for room_id, free in availability.items()},
+            'available_room_ids': [room_id for room_id, free in availability.items() if free]
+        })
+    
+    try:
+        room_id = int(data.get('room_id'))
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'message': 'room_id or room_ids required'}), 400
+    if not repository.known_rooms(room_db(room_id), [room_id]):
+        return jsonify({'success': False, 'message': 'Room not found'}), 404
+    
     available = check_room_availability(room_id, check_in, check_out)
     
     return jsonify({'available': available})
 
+@app.route('/api/hotels/<int:hotel_id>/availability')
+def hotel_availability_api(hotel_id):
+    """API listing the rooms of a hotel that are free for a stay, and rooms left per type"""
+    check_in = request.args.get('check_in', '')
+    check_out = request.args.get('check_out', '')
+    
+    if not check_in or not check_out:
+        return jsonify({'success': False, 'message': 'Check-in and check-out dates required'}), 400
+    
+    version = hotel_version(hotel_db(hotel_id), hotel_id)
+    not_modified = precondition(
+        'availability', version and version[0], check_in, check_out,
+        global_versions(hotel_db(hotel_id), BOOKINGS)[BOOKINGS], per_user=False
+    )
+    if not_modified:
+        return not_modified
+    
+    index = get_occupancy()
+    if index:
+        room_ids = index.free_rooms_in_hotel(hotel_id, check_in, check_out)
+    else:
+        room_ids = repository.free_hotel_rooms(hotel_db(hotel_id), hotel_id, check_in, check_out)
+    
+    return jsonify({
+        'hotel_id': hotel_id,
+        'available_room_ids': room_ids,
+        'room_types': hotel_inventory(hotel_db(hotel_id), hotel_id, check_in, check_out)
+    })
+
+@app.route('/api/rooms/<int:room_id>/quote')
+def room_quote_api(room_id):
+    """API pricing a stay: nightly rates, length-of-stay adjustment and total"""
+    check_in = request.args.get('check_in', '')
+    check_out = request.args.get('check_out', '')
+    try:
+        nights = calculate_nights(check_in, check_out)
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Check-in and check-out dates required'}), 400
+    if nights <= 0:
+        return jsonify({'success': False, 'message': 'Check-out must be after check-in'}), 400
+    
+    conn = room_db(room_id)
+    room = repository.room_rate(conn, room_id)
+    if not room:
+        return jsonify({'success': False, 'message': 'Room not found'}), 404
+    
+    return jsonify(dict(quote(conn, room, check_in, check_out), room_id=room_id))
+
 @app.route('/api/health')
 def health():
-    """Health check endpoint"""
+    """Readiness check: database reachable and schema fully migrated"""
+    checks = {}
+    try:
+        conn = get_db()
+        repository.ping(conn)
+        checks['database'] = 'ok'
+        checks['schema_version'] = current_version(conn)
+        checks['pending_migrations'] = [
+            f'{number}: {description}' for number, description in pending_migrations(conn)
+        ]
+        if get_shards():
+            checks['pending_migrations'] += [
+                f'shard {index} {number}: {description}'
+                for index, pending in enumerate(fan_out(pending_migrations))
+                for number, description in pending
+            ]
+    except sqlite3.Error as e:
+        checks['database'] = f'error: {e}'
+    
+    ready = checks['database'] == 'ok' and not checks['pending_migrations']
     return jsonify({
-        'status': 'healthy',
+        'status': 'healthy' if ready else 'unavailable',
         'timestamp': datetime.now().isoformat(),
-        'version': '2.0'
-    })
+        'version': '2.0',
+        'expected_schema_version': SCHEMA_VERSION,
+        'checks': checks
+    }), 200 if ready else 503
+
+@app.cli.command('migrate')
+def migrate_command():
+    """Apply pending schema migrations (to the catalog and every hotel shard)"""
+    conn = get_db_connection()
+    applied = migrate(conn)
+    click.echo(f'Applied migrations: {applied}' if applied else 'Schema is up to date')
+    click.echo(f'Schema version: {current_version(conn)}')
+    conn.close()
+    
+    for path in SHARD_PATHS:
+        init_db(path)
+        click.echo(f'{path}: schema version {SCHEMA_VERSION}')
+
+@app.cli.command('export-bookings')
+@click.option('--format', 'fmt', type=click.Choice(EXPORT_FORMATS), default='csv')
+@click.option('--status', help='Comma-separated statuses to include')
+@click.option('--from', 'date_from', help='Earliest check-in date (YYYY-MM-DD)')
+@click.option('--to', 'date_to', help='Latest check-in date (YYYY-MM-DD)')
+@click.option('--no-names', is_flag=True, help='Skip user, hotel and room names')
+@click.option('--include-archived', is_flag=True, help='Also export bookings moved to the archive')
+@click.option('--gzip', is_flag=True, help='Gzip the output')
+@click.option('--output', '-o', type=click.Path(dir_okay=False), help='Output file (default: stdout)')
+def export_bookings_command(fmt, status, date_from, date_to, no_names, include_archived, gzip, output):
+    """Stream bookings to a CSV/NDJSON file in constant memory"""
+    filters = {'status': status, 'date_from': date_from, 'date_to': date_to, 'include_archived': include_archived}
+    conns = get_booking_connections()
+    out = open(output, 'wb') if output else sys.stdout.buffer
+    try:
+        for chunk in export_stream(conns, filters, fmt, not no_names, gzip):
+            out.write(chunk)
+    finally:
+        if output:
+            out.close()
+        for conn in conns:
+            conn.close()
+
+@app.cli.command('import-data')
+@click.argument('entity', type=click.Choice(sorted(IMPORT_ENTITIES)))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'json', 'ndjson']), help='Default: file extension')
+@click.option('--batch-size', type=int, default=5000, show_default=True)
+@click.option('--defer-indexes', is_flag=True, help='Drop secondary indexes during the load')
+def import_data_command(entity, path, fmt, batch_size, defer_indexes):
+    """Bulk-load hotels, rooms or bookings from a CSV/JSON/NDJSON file"""
+    if SHARD_PATHS:
+        raise click.ClickException('Import into an unsharded database, then run flask shard-split')
+    conn = get_db_connection()
+    report = import_records(conn, entity, read_records(path, fmt), batch_size, defer_indexes)
+    refresh_calendars(conn, app.config['RATE_CALENDAR_DAYS'])
+    conn.close()
+    
+    click.echo(f'{report.inserted} inserted, {report.failed} failed '
+               f'in {report.elapsed:.2f}s ({report.rows_per_second} rows/s)')
+    for error in report.errors[:20]:
+        click.echo(f"  row {error['row']}: {error['message']}", err=True)
+
+@app.cli.command('generate-data')
+@click.option('--hotels', type=int, default=50, show_default=True)
+@click.option('--rooms-per-hotel', type=int, default=40, show_default=True)
+@click.option('--users', type=int, default=1000, show_default=True)
+@click.option('--bookings', type=int, default=100000, show_default=True)
+@click.option('--reviews', type=int, default=10000, show_default=True)
+@click.option('--seed', type=int, default=42, show_default=True)
+def generate_data_command(hotels, rooms_per_hotel, users, bookings, reviews, seed):
+    """Seed the database with synthetic data for benchmarking"""
+    if SHARD_PATHS:
+        raise click.ClickException('Generate an unsharded database, then run flask shard-split')
+    init_db()
+    conn = get_db_connection()
+    reports = generate(conn, hotels, rooms_per_hotel, users, bookings, reviews, seed=seed)
+    repository.reconcile_dashboard(conn)
+    refresh_calendars(conn, app.config['RATE_CALENDAR_DAYS'])
+    conn.close()
+    
+    for entity, report in reports.items():
+        click.echo(f'{entity:>8}: {report.inserted} rows in {report.elapsed:.2f}s '
+                   f'({report.rows_per_second} rows/s)')
+
+@app.cli.command('reprice')
+@click.option('--queued', is_flag=True, help='Only recompute queued changes')
+def reprice_command(queued):
+    """Rebuild nightly rate calendars from today (run daily)"""
+    changed = 0
+    for conn in get_booking_connections():
+        changed += refresh_calendars(conn, app.config['RATE_CALENDAR_DAYS'], full=not queued)
+        conn.close()
+    click.echo(f'{changed} rate calendars updated')
+
+@app.cli.command('sweep-holds')
+@click.option('--batch-size', default=1000, show_default=True)
+def sweep_holds_command(batch_size):
+    """Delete expired checkout holds (run every few minutes)"""
+    swept = 0
+    for conn in get_booking_connections():
+        swept += sweep_expired_holds(conn, batch_size)
+        refresh_calendars(conn, app.config['RATE_CALENDAR_DAYS'])
+        conn.close()
+    click.echo(f'Swept {swept} expired holds')
+
+@app.cli.command('lifecycle')
+@click.option('--once', is_flag=True, help='Run one pass and exit')
+@click.option('--interval', type=float, default=None, help='Seconds between passes (default LIFECYCLE_INTERVAL)')
+@click.option('--batch-size', default=1000, show_default=True, help='Rows per transaction')
+def lifecycle_command(once, interval, batch_size):
+    """Complete past stays, expire stale pending bookings and archive old ones"""
+    reprice = ('reprice_queued', lambda conn: refresh_calendars(conn, app.config['RATE_CALENDAR_DAYS']))
+    try:
+        runs = run_scheduler(
+            get_booking_connections, interval or app.config['LIFECYCLE_INTERVAL'], once=once,
+            log=lambda line: click.echo(line, err=True),
+            pending_ttl_hours=app.config['PENDING_BOOKING_TTL_HOURS'],
+            archive_after_days=app.config['BOOKING_ARCHIVE_DAYS'],
+            batch_size=batch_size, extra_jobs=[reprice]
+        )
+    except KeyboardInterrupt:
+        return
+    for run in runs:
+        error = f" ({run['error']})" if run['error'] else ''
+        click.echo(f"{run['job']}: {run['rows']} rows in {run['seconds']}s{error}")
+
+@app.cli.command('outbox-worker')
+@click.option('--once', is_flag=True, help='Deliver one batch and exit')
+@click.option('--interval', default=2.0, show_default=True, help='Seconds between polls when idle')
+@click.option('--batch-size', default=50, show_default=True)
+@click.option('--max-attempts', default=8, show_default=True, help='Attempts before dead-lettering')
+def outbox_worker_command(once, interval, batch_size, max_attempts):
+    """Deliver booking emails queued in the outbox"""
+    click.echo(f"Outbox worker delivering via {app.config['MAIL_BACKEND']}", err=True)
+    try:
+        run_worker(get_booking_connections, create_sender(app.config), app.config['MAIL_DEFAULT_SENDER'],
+                   interval=interval, batch_size=batch_size, max_attempts=max_attempts, once=once,
+                   log=lambda line: click.echo(line, err=True))
+    except KeyboardInterrupt:
+        pass
+
+@app.cli.command('replica-refresh')
+@click.option('--once', is_flag=True, help='Take one snapshot and exit')
+@click.option('--interval', type=float, default=None, help='Seconds between snapshots (default REPLICA_REFRESH_INTERVAL)')
+def replica_refresh_command(once, interval):
+    """Keep the report replica snapshot fresh"""
+    if replica is None:
+        raise click.ClickException('REPLICA_PATH is not set')
+    try:
+        run_refresher(replica, interval or app.config['REPLICA_REFRESH_INTERVAL'], once=once,
+                      log=lambda line: click.echo(line, err=True))
+    except KeyboardInterrupt:
+        pass
+
+@app.cli.command('outbox-purge')
+@click.option('--days', default=30, show_default=True, help='Keep delivered events this long')
+def outbox_purge_command(days):
+    """Delete delivered outbox events past the retention window"""
+    purged = 0
+    for conn in get_booking_connections():
+        purged += purge_sent(conn, days)
+        conn.close()
+    click.echo(f'Purged {purged} delivered events')
+
+@app.cli.command('shard-split')
+def shard_split_command():
+    """Move rooms, bookings and reviews from DATABASE into its SHARD_COUNT hotel shards"""
+    if not SHARD_PATHS:
+        raise click.ClickException('Set SHARD_COUNT to 2 or more')
+    existing = [path for path in SHARD_PATHS if os.path.exists(path)]
+    if existing:
+        raise click.ClickException(f'Shard files already exist: {", ".join(existing)}')
+    
+    init_db()
+    for path in SHARD_PATHS:
+        init_db(path)
+    catalog = get_db_connection()
+    conns = [connect(path, db_pool.pragmas, on_connect=register_pricing_functions) for path in SHARD_PATHS]
+    try:
+        moved = split_shards(catalog, conns)
+        for path, conn, rows in zip(SHARD_PATHS, conns, moved):
+            refresh_calendars(conn, app.config['RATE_CALENDAR_DAYS'], full=True)
+            click.echo(f'{path}: {rows} rows')
+        repository.reconcile_dashboard(catalog)
+    finally:
+        catalog.close()
+        for conn in conns:
+            conn.close()
 
 @app.errorhandler(404)
 def not_found(error):
@@ -641,6 +1580,7 @@ def server_error(error):
 if __name__ == '__main__':
     # Initialize database
     init_db()
+    occupancy.load(get_db_connection())
     
     # Run app
     port = int(os.environ.get('PORT', 5000))
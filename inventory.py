@@ -0,0 +1,228 @@
+"""
+Room-Type Inventory
+Booked-room counts per hotel, room type and night, with a gap-minimizing room allocator
+"""
+
+from datetime import date
+
+from availability import OCCUPYING_STATUSES, free_room_clause, occupying_clause
+
+# Nights a stay can be counted on; bookings outside this range are not counted
+FIRST_NIGHT = '2000-01-01'
+LAST_NIGHT = '2099-12-31'
+
+# Allocator costs, in nights of unsellable gap next to the new stay
+OPEN_GAP_COST = 28        # no booking on that side of the stay
+ORPHAN_GAP_COST = 100     # a gap shorter than MIN_SELLABLE_GAP nights
+MIN_SELLABLE_GAP = 2
+
+_OCCUPYING = ', '.join(f"'{status}'" for status in OCCUPYING_STATUSES)
+
+# Rooms count towards room_type_inventory.total while 'available'. Each
+# occupying booking adds one to room_type_nights.booked for every night of
+# its stay, so a type's remaining rooms for a stay is total minus the
+# busiest night's count. Holds count until they are swept.
+SCHEMA = f'''
+    CREATE TABLE IF NOT EXISTS inventory_nights (
+        night DATE PRIMARY KEY
+    ) WITHOUT ROWID;
+
+    CREATE TABLE IF NOT EXISTS room_type_inventory (
+        hotel_id INTEGER NOT NULL,
+        room_type TEXT NOT NULL,
+        total INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (hotel_id, room_type)
+    ) WITHOUT ROWID;
+
+    CREATE TABLE IF NOT EXISTS room_type_nights (
+        hotel_id INTEGER NOT NULL,
+        room_type TEXT NOT NULL,
+        night DATE NOT NULL,
+        booked INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (hotel_id, room_type, night)
+    ) WITHOUT ROWID;
+
+    CREATE INDEX IF NOT EXISTS idx_rooms_hotel_type ON rooms(hotel_id, room_type);
+
+    CREATE TRIGGER IF NOT EXISTS inventory_rooms_insert AFTER INSERT ON rooms
+    WHEN NEW.status = 'available' BEGIN
+        INSERT INTO room_type_inventory (hotel_id, room_type, total) VALUES (NEW.hotel_id, NEW.room_type, 1)
+        ON CONFLICT(hotel_id, room_type) DO UPDATE SET total = total + 1;
+    END;
+    CREATE TRIGGER IF NOT EXISTS inventory_rooms_delete AFTER DELETE ON rooms
+    WHEN OLD.status = 'available' BEGIN
+        UPDATE room_type_inventory SET total = total - 1
+        WHERE hotel_id = OLD.hotel_id AND room_type = OLD.room_type;
+    END;
+    CREATE TRIGGER IF NOT EXISTS inventory_rooms_update AFTER UPDATE OF hotel_id, room_type, status ON rooms BEGIN
+        UPDATE room_type_inventory SET total = total - 1
+        WHERE OLD.status = 'available' AND hotel_id = OLD.hotel_id AND room_type = OLD.room_type;
+        INSERT INTO room_type_inventory (hotel_id, room_type, total)
+        SELECT NEW.hotel_id, NEW.room_type, 1 WHERE NEW.status = 'available'
+        ON CONFLICT(hotel_id, room_type) DO UPDATE SET total = total + 1;
+    END;
+    CREATE TRIGGER IF NOT EXISTS inventory_rooms_retype AFTER UPDATE OF hotel_id, room_type ON rooms
+    WHEN OLD.hotel_id != NEW.hotel_id OR OLD.room_type != NEW.room_type BEGIN
+        UPDATE room_type_nights SET booked = booked - (
+            SELECT COUNT(*) FROM bookings b
+            WHERE b.room_id = NEW.id AND b.status IN ({_OCCUPYING})
+            AND b.check_in_date <= room_type_nights.night AND b.check_out_date > room_type_nights.night
+        )
+        WHERE hotel_id = OLD.hotel_id AND room_type = OLD.room_type;
+        INSERT INTO room_type_nights (hotel_id, room_type, night, booked)
+        SELECT NEW.hotel_id, NEW.room_type, n.night, COUNT(*)
+        FROM bookings b JOIN inventory_nights n ON n.night >= b.check_in_date AND n.night < b.check_out_date
+        WHERE b.room_id = NEW.id AND b.status IN ({_OCCUPYING})
+        GROUP BY n.night
+        ON CONFLICT(hotel_id, room_type, night) DO UPDATE SET booked = booked + excluded.booked;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS inventory_bookings_insert AFTER INSERT ON bookings
+    WHEN NEW.status IN ({_OCCUPYING}) BEGIN
+        INSERT INTO room_type_nights (hotel_id, room_type, night, booked)
+        SELECT r.hotel_id, r.room_type, n.night, 1 FROM rooms r, inventory_nights n
+        WHERE r.id = NEW.room_id AND n.night >= NEW.check_in_date AND n.night < NEW.check_out_date
+        ON CONFLICT(hotel_id, room_type, night) DO UPDATE SET booked = booked + 1;
+    END;
+    CREATE TRIGGER IF NOT EXISTS inventory_bookings_update
+    AFTER UPDATE OF status, room_id, check_in_date, check_out_date ON bookings
+    WHEN (OLD.status IN ({_OCCUPYING})) != (NEW.status IN ({_OCCUPYING}))
+      OR OLD.room_id != NEW.room_id
+      OR OLD.check_in_date != NEW.check_in_date OR OLD.check_out_date != NEW.check_out_date BEGIN
+        UPDATE room_type_nights SET booked = booked - 1
+        WHERE OLD.status IN ({_OCCUPYING})
+        AND (hotel_id, room_type) = (SELECT hotel_id, room_type FROM rooms WHERE id = OLD.room_id)
+        AND night >= OLD.check_in_date AND night < OLD.check_out_date;
+        INSERT INTO room_type_nights (hotel_id, room_type, night, booked)
+        SELECT r.hotel_id, r.room_type, n.night, 1 FROM rooms r, inventory_nights n
+        WHERE NEW.status IN ({_OCCUPYING})
+        AND r.id = NEW.room_id AND n.night >= NEW.check_in_date AND n.night < NEW.check_out_date
+        ON CONFLICT(hotel_id, room_type, night) DO UPDATE SET booked = booked + 1;
+    END;
+    CREATE TRIGGER IF NOT EXISTS inventory_bookings_delete AFTER DELETE ON bookings
+    WHEN OLD.status IN ({_OCCUPYING}) BEGIN
+        UPDATE room_type_nights SET booked = booked - 1
+        WHERE (hotel_id, room_type) = (SELECT hotel_id, room_type FROM rooms WHERE id = OLD.room_id)
+        AND night >= OLD.check_in_date AND night < OLD.check_out_date;
+    END;
+'''
+
+
+def init_inventory(conn):
+    """Create the inventory tables and triggers, then count existing rooms and bookings"""
+    conn.executescript(SCHEMA)
+    conn.execute(f'''
+        INSERT OR IGNORE INTO inventory_nights (night)
+        WITH RECURSIVE nights(night) AS (
+            SELECT date('{FIRST_NIGHT}')
+            UNION ALL
+            SELECT date(night, '+1 day') FROM nights WHERE night < '{LAST_NIGHT}'
+        )
+        SELECT night FROM nights
+    ''')
+    conn.commit()
+    rebuild(conn)
+
+
+def rebuild(conn):
+    """Recount room_type_inventory and room_type_nights from rooms and bookings"""
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        conn.execute('DELETE FROM room_type_inventory')
+        conn.execute('DELETE FROM room_type_nights')
+        conn.execute('''
+            INSERT INTO room_type_inventory (hotel_id, room_type, total)
+            SELECT hotel_id, room_type, COUNT(*) FROM rooms
+            WHERE status = 'available'
+            GROUP BY hotel_id, room_type
+        ''')
+        conn.execute(f'''
+            INSERT INTO room_type_nights (hotel_id, room_type, night, booked)
+            SELECT r.hotel_id, r.room_type, n.night, COUNT(*)
+            FROM bookings b
+            JOIN rooms r ON r.id = b.room_id
+            JOIN inventory_nights n ON n.night >= b.check_in_date AND n.night < b.check_out_date
+            WHERE b.status IN ({_OCCUPYING})
+            GROUP BY r.hotel_id, r.room_type, n.night
+        ''')
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def remaining_sql(alias='t'):
+    """Rooms of alias's (hotel_id, room_type) free on every night of a stay.
+
+    Expects two parameters in order: check_in, check_out.
+    """
+    return f'''MAX(0,
+        COALESCE((SELECT i.total FROM room_type_inventory i
+                  WHERE i.hotel_id = {alias}.hotel_id AND i.room_type = {alias}.room_type), 0)
+        - COALESCE((SELECT MAX(n.booked) FROM room_type_nights n
+                    WHERE n.hotel_id = {alias}.hotel_id AND n.room_type = {alias}.room_type
+                    AND n.night >= ? AND n.night < ?), 0))'''
+
+
+def remaining(conn, hotel_id, room_type, check_in, check_out):
+    """Counted rooms of a type left for a stay"""
+    return conn.execute(
+        f'SELECT {remaining_sql("t")} FROM (SELECT ? AS hotel_id, ? AS room_type) t',
+        (check_in, check_out, hotel_id, room_type)
+    ).fetchone()[0]
+
+
+def hotel_inventory(conn, hotel_id, check_in, check_out):
+    """[{room_type, total, remaining}] for every room type of a hotel"""
+    return [dict(row) for row in conn.execute(f'''
+        SELECT t.room_type, t.total, {remaining_sql('t')} AS remaining
+        FROM room_type_inventory t
+        WHERE t.hotel_id = ? AND t.total > 0
+        ORDER BY t.room_type
+    ''', (check_in, check_out, hotel_id))]
+
+
+def _gap_cost(nights):
+    if nights is None:
+        return OPEN_GAP_COST
+    if 0 < nights < MIN_SELLABLE_GAP:
+        return ORPHAN_GAP_COST
+    return nights
+
+
+def allocate_room(conn, hotel_id, room_type, check_in, check_out, guests=1, max_price=None):
+    """Concrete free room of a type for a stay, or None.
+
+    Only rooms that sleep guests qualify. With max_price (the rate the
+    guest was quoted) they must also cost no more per night than it, or
+    than the type's cheapest free room once every room at the quoted rate
+    is taken. Among them it picks the room whose calendar the stay fits
+    most tightly: adjacent bookings cost nothing, open calendars a
+    little, and gaps too short to sell again the most, so occupancy stays
+    dense and fragments rare.
+    """
+    occupying = occupying_clause('b')
+    rows = conn.execute(f'''
+        SELECT r.id, r.price_per_night,
+            (SELECT MAX(b.check_out_date) FROM bookings b
+             WHERE b.room_id = r.id AND {occupying} AND b.check_out_date <= ?) AS free_from,
+            (SELECT MIN(b.check_in_date) FROM bookings b
+             WHERE b.room_id = r.id AND {occupying} AND b.check_in_date >= ?) AS free_until
+        FROM rooms r
+        WHERE r.hotel_id = ? AND r.room_type = ? AND r.status = 'available'
+        AND r.capacity >= ? AND {free_room_clause('r')}
+    ''', (check_in, check_out, hotel_id, room_type, int(guests or 1), check_out, check_in)).fetchall()
+    if not rows:
+        return None
+    if max_price is not None:
+        cap = max(max_price, min(row['price_per_night'] for row in rows))
+        rows = [row for row in rows if row['price_per_night'] <= cap]
+
+    start, end = date.fromisoformat(check_in), date.fromisoformat(check_out)
+
+    def cost(row):
+        before = (start - date.fromisoformat(row['free_from'][:10])).days if row['free_from'] else None
+        after = (date.fromisoformat(row['free_until'][:10]) - end).days if row['free_until'] else None
+        return (_gap_cost(before) + _gap_cost(after), row['id'])
+
+    return min(rows, key=cost)['id']
@@ -0,0 +1,262 @@
+"""
+Booking Lifecycle
+Batched jobs that complete past stays, expire stale pending bookings and archive old ones
+"""
+
+import time
+
+from outbox import BOOKING_CANCELLED, enqueue
+from reservations import sweep_expired_holds
+from stats import REVENUE_STATUSES, init_stats
+
+DEFAULT_BATCH_SIZE = 1000
+
+# Bookings in these statuses move to bookings_archive once their stay is old enough
+ARCHIVED_STATUSES = ('completed', 'cancelled')
+
+ARCHIVE_COLUMNS = (
+    'id', 'booking_id', 'user_id', 'room_id', 'hotel_id', 'check_in_date', 'check_out_date',
+    'number_of_guests', 'total_price', 'status', 'special_requests', 'created_at', 'updated_at',
+    'hold_expires_at',
+)
+
+# Finished bookings leave the hot bookings table, so availability, listing
+# and counter queries only scan live stays; job_runs keeps one row per
+# job run for throughput monitoring.
+SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS bookings_archive (
+        id INTEGER PRIMARY KEY,
+        booking_id TEXT UNIQUE NOT NULL,
+        user_id INTEGER NOT NULL,
+        room_id INTEGER NOT NULL,
+        hotel_id INTEGER NOT NULL,
+        check_in_date DATE NOT NULL,
+        check_out_date DATE NOT NULL,
+        number_of_guests INTEGER NOT NULL,
+        total_price REAL NOT NULL,
+        status TEXT NOT NULL,
+        special_requests TEXT,
+        created_at TIMESTAMP,
+        updated_at TIMESTAMP,
+        hold_expires_at TIMESTAMP,
+        archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE INDEX IF NOT EXISTS idx_bookings_archive_user ON bookings_archive(user_id, created_at);
+    CREATE INDEX IF NOT EXISTS idx_bookings_archive_checkout ON bookings_archive(check_out_date);
+
+    CREATE TABLE IF NOT EXISTS job_runs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        job TEXT NOT NULL,
+        started_at TIMESTAMP NOT NULL,
+        seconds REAL NOT NULL,
+        rows INTEGER NOT NULL DEFAULT 0,
+        error TEXT
+    );
+    CREATE INDEX IF NOT EXISTS idx_job_runs_job ON job_runs(job, id);
+
+    CREATE INDEX IF NOT EXISTS idx_bookings_status_checkout ON bookings(status, check_out_date);
+
+    -- Completed stays keep counting as revenue (these counted only 'confirmed')
+    DROP TRIGGER IF EXISTS stats_bookings_insert;
+    DROP TRIGGER IF EXISTS stats_bookings_update;
+    DROP TRIGGER IF EXISTS stats_bookings_delete;
+'''
+
+# Newest-first pages of listings that include archived bookings
+ARCHIVE_INDEXES = '''
+    CREATE INDEX IF NOT EXISTS idx_bookings_archive_created ON bookings_archive(created_at, id);
+    CREATE INDEX IF NOT EXISTS idx_bookings_archive_hotel_created ON bookings_archive(hotel_id, created_at, id);
+'''
+
+
+def init_lifecycle(conn):
+    """Create the archive and job log tables, and recount revenue to include completed stays"""
+    conn.executescript(SCHEMA)
+    init_stats(conn)
+
+
+def _in_batches(conn, statement, params, batch_size):
+    """Run a statement that handles at most batch_size rows until it handles fewer; returns the total"""
+    total = 0
+    while True:
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            count = conn.execute(statement, (*params, batch_size)).rowcount
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        total += count
+        if count < batch_size:
+            return total
+
+
+def complete_stays(conn, batch_size=DEFAULT_BATCH_SIZE):
+    """Mark confirmed bookings that checked out before today as completed"""
+    return _in_batches(conn, '''
+        UPDATE bookings SET status = 'completed', updated_at = CURRENT_TIMESTAMP
+        WHERE id IN (
+            SELECT id FROM bookings
+            WHERE status = 'confirmed' AND check_out_date < date('now')
+            LIMIT ?
+        )
+    ''', (), batch_size)
+
+
+def expire_pending(conn, older_than_hours=24, batch_size=DEFAULT_BATCH_SIZE):
+    """Cancel pending bookings (not checkout holds) left unconfirmed too long or past check-in.
+
+    Each batch queues a cancellation email per booking in the transaction
+    that cancels it, as cancel_booking() does.
+    """
+    batch = '''
+        SELECT booking_id FROM bookings
+        WHERE status = 'pending' AND hold_expires_at IS NULL
+        AND (created_at < datetime('now', ?) OR check_in_date < date('now'))
+        LIMIT ?
+    '''
+    params = (f'-{int(older_than_hours)} hours', batch_size)
+
+    expired = 0
+    while True:
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            booking_ids = [row[0] for row in conn.execute(batch, params)]
+            conn.executemany(
+                "UPDATE bookings SET status = 'cancelled', updated_at = CURRENT_TIMESTAMP WHERE booking_id = ?",
+                [(booking_id,) for booking_id in booking_ids]
+            )
+            for booking_id in booking_ids:
+                enqueue(conn, BOOKING_CANCELLED, {'booking_id': booking_id, 'status': 'cancelled'})
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        expired += len(booking_ids)
+        if len(booking_ids) < batch_size:
+            return expired
+
+
+def archive_bookings(conn, older_than_days=365, batch_size=DEFAULT_BATCH_SIZE):
+    """Move completed and cancelled bookings that checked out long ago into bookings_archive.
+
+    Each batch copies, deletes and corrects the dashboard counters in one
+    transaction: the delete triggers subtract the rows, but archived
+    bookings still count towards total bookings and revenue.
+    """
+    statuses = ', '.join(f"'{status}'" for status in ARCHIVED_STATUSES)
+    revenue = ', '.join(f"'{status}'" for status in REVENUE_STATUSES)
+    columns = ', '.join(ARCHIVE_COLUMNS)
+    batch = f'''
+        SELECT id FROM bookings
+        WHERE status IN ({statuses}) AND check_out_date < date('now', ?) AND hold_expires_at IS NULL
+        ORDER BY status, check_out_date
+        LIMIT ?
+    '''
+    params = (f'-{int(older_than_days)} days', batch_size)
+
+    archived = 0
+    while True:
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute('CREATE TEMP TABLE IF NOT EXISTS archive_batch (id INTEGER PRIMARY KEY)')
+            conn.execute('DELETE FROM archive_batch')
+            count = conn.execute(f'INSERT INTO archive_batch (id) {batch}', params).rowcount
+            if count:
+                revenue_sum = conn.execute(f'''
+                    SELECT COALESCE(SUM(total_price), 0) FROM bookings
+                    WHERE id IN (SELECT id FROM archive_batch) AND status IN ({revenue})
+                ''').fetchone()[0]
+                conn.execute(f'''
+                    INSERT OR REPLACE INTO bookings_archive ({columns})
+                    SELECT {columns} FROM bookings WHERE id IN (SELECT id FROM archive_batch)
+                ''')
+                conn.execute('DELETE FROM bookings WHERE id IN (SELECT id FROM archive_batch)')
+                conn.execute("UPDATE stats_counters SET value = value + ? WHERE name = 'total_bookings'", (count,))
+                conn.execute("UPDATE stats_counters SET value = value + ? WHERE name = 'total_revenue'",
+                             (revenue_sum,))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        archived += count
+        if count < batch_size:
+            return archived
+
+
+def run_job(conn, job, work, log=print):
+    """Run work(conn) -> rows handled, and record it in job_runs; returns the run"""
+    started = time.time()
+    rows, error = 0, None
+    try:
+        rows = work(conn)
+    except Exception as e:
+        if conn.in_transaction:
+            conn.rollback()
+        error = f'{type(e).__name__}: {e}'
+    seconds = round(time.time() - started, 3)
+
+    conn.execute('''
+        INSERT INTO job_runs (job, started_at, seconds, rows, error)
+        VALUES (?, datetime(?, 'unixepoch'), ?, ?, ?)
+    ''', (job, started, seconds, rows, error))
+    conn.commit()
+
+    run = {'job': job, 'rows': rows, 'seconds': seconds,
+           'rows_per_second': round(rows / seconds) if seconds else rows, 'error': error}
+    if rows or error:
+        log(f"lifecycle: {job} rows={rows} seconds={seconds}" + (f' error={error}' if error else ''))
+    return run
+
+
+def run_all(conn, pending_ttl_hours=24, archive_after_days=365, batch_size=DEFAULT_BATCH_SIZE,
+            history_days=30, extra_jobs=(), log=print):
+    """One scheduler pass over a database: every lifecycle job, then extra_jobs ((name, work) pairs).
+
+    Each job is recorded in job_runs; runs older than history_days are pruned.
+    """
+    jobs = [
+        ('complete_stays', lambda conn: complete_stays(conn, batch_size)),
+        ('expire_pending', lambda conn: expire_pending(conn, pending_ttl_hours, batch_size)),
+        ('sweep_holds', lambda conn: sweep_expired_holds(conn, batch_size)),
+        ('archive_bookings', lambda conn: archive_bookings(conn, archive_after_days, batch_size)),
+        *extra_jobs,
+    ]
+    runs = [run_job(conn, job, work, log) for job, work in jobs]
+    conn.execute("DELETE FROM job_runs WHERE started_at < datetime('now', ?)", (f'-{int(history_days)} days',))
+    conn.commit()
+    return runs
+
+
+def run_scheduler(connect, interval=300.0, once=False, log=print, **settings):
+    """Run a lifecycle pass every interval seconds until stopped; settings go to run_all.
+
+    connect may return a list of connections (one per hotel shard); each
+    pass covers every one of them.
+    """
+    conns = connect()
+    conns = conns if isinstance(conns, list) else [conns]
+    try:
+        while True:
+            runs = [run for conn in conns for run in run_all(conn, log=log, **settings)]
+            if once:
+                return runs
+            time.sleep(interval)
+    finally:
+        for conn in conns:
+            conn.close()
+
+
+def job_summary(conn, recent=20):
+    """Latest run and totals per job, plus the most recent runs"""
+    jobs = [dict(row) for row in conn.execute('''
+        SELECT job, COUNT(*) AS runs, SUM(rows) AS rows, ROUND(SUM(seconds), 3) AS seconds,
+               MAX(started_at) AS last_run_at, SUM(error IS NOT NULL) AS errors
+        FROM job_runs GROUP BY job ORDER BY job
+    ''')]
+    for job in jobs:
+        job['rows_per_second'] = round(job['rows'] / job['seconds']) if job['seconds'] else job['rows']
+    runs = [dict(row) for row in conn.execute(
+        'SELECT * FROM job_runs ORDER BY id DESC LIMIT ?', (recent,)
+    )]
+    return {'jobs': jobs, 'recent_runs': runs}
@@ -0,0 +1,126 @@
+"""
+Booking Load Test
+Runs N parallel booking workers against one room and checks for double bookings
+
+Usage:
+    python loadtest_bookings.py --workers 16 --attempts 200
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+
+from database import connect, enable_wal
+from hotel import init_db
+from reservations import reserve_room, RoomUnavailableError, ReservationBusyError
+
+OVERLAP_QUERY = '''
+    SELECT COUNT(*) FROM bookings a
+    JOIN bookings b ON a.room_id = b.room_id AND a.id < b.id
+    WHERE a.status IN ('confirmed', 'pending') AND b.status IN ('confirmed', 'pending')
+    AND a.check_in_date < b.check_out_date AND b.check_in_date < a.check_out_date
+'''
+
+
+def setup_database(path):
+    """Create a database holding a single room to book against"""
+    init_db(path)
+    conn = connect(path)
+    enable_wal(conn)
+    hotel_id = conn.execute(
+        "INSERT INTO hotels (name, city, address) VALUES ('Load Test Hotel', 'Test City', '1 Test St')"
+    ).lastrowid
+    room_id = conn.execute(
+        "INSERT INTO rooms (hotel_id, room_number, room_type, capacity, price_per_night) "
+        "VALUES (?, '101', 'Double', 2, 100.0)",
+        (hotel_id,)
+    ).lastrowid
+    conn.commit()
+    conn.close()
+    return room_id
+
+
+def booking_worker(path, worker, room_id, attempts, horizon, max_nights, seed):
+    """Hammer one room with random stays; returns (booked, conflicts, busy)"""
+    rng = random.Random(seed)
+    conn = connect(path)
+    start = date.today()
+    booked = conflicts = busy = 0
+
+    for i in range(attempts):
+        check_in = start + timedelta(days=rng.randrange(horizon))
+        check_out = check_in + timedelta(days=rng.randint(1, max_nights))
+        try:
+            reserve_room(conn, f'LT{worker:03d}{i:06d}', worker, room_id,
+                         check_in.isoformat(), check_out.isoformat())
+            booked += 1
+        except RoomUnavailableError:
+            conflicts += 1
+        except ReservationBusyError:
+            busy += 1
+
+    conn.close()
+    return booked, conflicts, busy
+
+
+def run(workers, attempts, horizon, max_nights, path=None):
+    """Run the load test and return a results dict"""
+    path = path or os.path.join(tempfile.mkdtemp(), 'loadtest.db')
+    room_id = setup_database(path)
+
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(booking_worker, path, w, room_id, attempts, horizon, max_nights, w)
+            for w in range(workers)
+        ]
+        results = [f.result() for f in futures]
+    elapsed = time.perf_counter() - started
+
+    conn = connect(path)
+    overlaps = conn.execute(OVERLAP_QUERY).fetchone()[0]
+    conn.close()
+
+    booked = sum(r[0] for r in results)
+    total = workers * attempts
+    return {
+        'database': path,
+        'workers': workers,
+        'attempts': total,
+        'booked': booked,
+        'conflicts': sum(r[1] for r in results),
+        'busy': sum(r[2] for r in results),
+        'overlaps': overlaps,
+        'elapsed_seconds': round(elapsed, 3),
+        'bookings_per_second': round(booked / elapsed, 1),
+        'attempts_per_second': round(total / elapsed, 1),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Concurrent booking load test')
+    parser.add_argument('--workers', type=int, default=8, help='parallel booking processes')
+    parser.add_argument('--attempts', type=int, default=200, help='booking attempts per worker')
+    parser.add_argument('--horizon', type=int, default=365, help='days ahead to pick check-in from')
+    parser.add_argument('--max-nights', type=int, default=5, help='longest stay to request')
+    parser.add_argument('--database', help='database file (default: temporary file)')
+    args = parser.parse_args(argv)
+
+    result = run(args.workers, args.attempts, args.horizon, args.max_nights, args.database)
+    for key, value in result.items():
+        print(f'{key:>20}: {value}')
+
+    if result['overlaps']:
+        print(f"❌ {result['overlaps']} overlapping bookings detected")
+        return 1
+    print('✅ No overlapping bookings')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,284 @@
+"""
+Metrics
+Prometheus text-format metrics shared across gunicorn worker processes
+"""
+
+import glob
+import json
+import os
+import threading
+import time
+
+from flask import Response, current_app, g, request
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0)
+
+# name -> (type, help, buckets)
+METRICS = {
+    'smartstay_http_requests_total': ('counter', 'HTTP requests by route and status', None),
+    'smartstay_http_request_duration_seconds': ('histogram', 'HTTP request latency', LATENCY_BUCKETS),
+    'smartstay_db_queries_total': ('counter', 'SQL statements executed, by route', None),
+    'smartstay_db_query_duration_seconds': ('histogram', 'SQL statement execution time', QUERY_BUCKETS),
+    'smartstay_db_pool_acquires_total': ('counter', 'Pool connection requests, by hit or miss', None),
+    'smartstay_db_pool_discarded_total': ('counter', 'Connections closed instead of returned to the pool', None),
+    'smartstay_db_pool_idle_connections': ('gauge', 'Idle pooled connections per worker', None),
+    'smartstay_replica_age_seconds': ('gauge', 'Age of the report replica snapshot, per worker', None),
+    'smartstay_bookings_total': ('counter', 'Booking attempts by outcome', None),
+    'smartstay_cache_requests_total': ('counter', 'Cache lookups by cache and result', None),
+    'smartstay_process_resident_memory_bytes': ('gauge', 'Resident memory per worker process', None),
+    'smartstay_process_start_time_seconds': ('gauge', 'Worker process start time (unix seconds)', None),
+}
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def _key(labels):
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def resident_memory():
+    """Resident set size of this process in bytes"""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class MetricsRegistry:
+    """Per-process metric values, flushed to METRICS_DIR for aggregation.
+
+    Each worker only ever writes its own snapshot file, so no locking is
+    needed between processes. Rendering merges every snapshot: counters and
+    histograms are summed (including exited workers, so totals never go
+    backwards), gauges are reported per live pid.
+    """
+
+    def __init__(self, directory=None, flush_interval=1.0):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.collectors = []
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.pid = os.getpid()
+        self.started = time.time()
+        self._values = {}
+        self._last_flush = 0.0
+
+    def _series(self, name, labels):
+        if self.pid != os.getpid():
+            self._reset()  # forked: start this worker's snapshot from zero
+        key = (name, _key(labels))
+        if key not in self._values:
+            kind, _, buckets = METRICS[name]
+            self._values[key] = [0] * (len(buckets) + 2) if kind == 'histogram' else 0
+        return key
+
+    def inc(self, name, amount=1, **labels):
+        with self._lock:
+            key = self._series(name, labels)
+            self._values[key] += amount
+
+    def set(self, name, value, **labels):
+        with self._lock:
+            key = self._series(name, labels)
+            self._values[key] = value
+
+    def observe(self, name, value, **labels):
+        """Record a histogram sample: per-bucket counts, then sum and count"""
+        buckets = METRICS[name][2]
+        with self._lock:
+            series = self._values[self._series(name, labels)]
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def collector(self, func):
+        """Register func(registry), run before each flush to refresh pulled values"""
+        self.collectors.append(func)
+        return func
+
+    def _collect(self):
+        for func in self.collectors:
+            func(self)
+        self.set('smartstay_process_resident_memory_bytes', resident_memory(), pid=self.pid)
+        self.set('smartstay_process_start_time_seconds', self.started, pid=self.pid)
+
+    def _snapshot(self):
+        with self._lock:
+            return {
+                'pid': self.pid,
+                'values': [[name, list(labels), value] for (name, labels), value in self._values.items()],
+            }
+
+    def flush(self, force=False):
+        """Write this process's snapshot, at most once per flush_interval"""
+        if not self.directory:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_flush < self.flush_interval:
+            return
+        self._last_flush = now
+        self._collect()
+
+        path = os.path.join(self.directory, f'metrics_{os.getpid()}.json')
+        temp = f'{path}.{threading.get_ident()}.tmp'
+        with open(temp, 'w') as handle:
+            json.dump(self._snapshot(), handle)
+        os.replace(temp, path)  # readers never see a partial file
+
+    def _snapshots(self):
+        if not self.directory:
+            self._collect()
+            return [self._snapshot()]
+
+        self.flush(force=True)
+        snapshots = []
+        for path in glob.glob(os.path.join(self.directory, 'metrics_*.json')):
+            try:
+                with open(path) as handle:
+                    snapshots.append(json.load(handle))
+            except (OSError, ValueError):
+                continue  # removed or replaced mid-read
+        return snapshots
+
+    def merged(self):
+        """{(name, labels): value} across every worker snapshot"""
+        merged = {}
+        for snapshot in self._snapshots():
+            alive = snapshot['pid'] == os.getpid() or _pid_alive(snapshot['pid'])
+            for name, labels, value in snapshot['values']:
+                if name not in METRICS:
+                    continue
+                kind = METRICS[name][0]
+                if kind == 'gauge' and not alive:
+                    continue
+                key = (name, tuple(tuple(pair) for pair in labels))
+                if kind == 'histogram':
+                    total = merged.setdefault(key, [0] * len(value))
+                    merged[key] = [a + b for a, b in zip(total, value)]
+                else:
+                    merged[key] = merged.get(key, 0) + value
+        return merged
+
+    def render(self):
+        """Prometheus text exposition format"""
+        by_name = {}
+        for (name, labels), value in self.merged().items():
+            by_name.setdefault(name, []).append((labels, value))
+
+        lines = []
+        for name, (kind, text, buckets) in METRICS.items():
+            if name not in by_name:
+                continue
+            lines.append(f'# HELP {name} {text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for labels, value in sorted(by_name[name]):
+                if kind != 'histogram':
+                    lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+                    continue
+                cumulative = 0
+                for bound, count in zip(buckets, value):
+                    cumulative += count
+                    le = _format_labels(labels + (('le', _format_value(bound)),))
+                    lines.append(f'{name}_bucket{le} {cumulative}')
+                lines.append(f'{name}_bucket{_format_labels(labels + (("le", "+Inf"),))} {value[-1]}')
+                lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(value[-2])}')
+                lines.append(f'{name}_count{_format_labels(labels)} {value[-1]}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        return repr(round(value, 6))
+    return str(value)
+
+
+def _start_request():
+    g.metrics_started = time.perf_counter()
+
+
+def _record_request(response):
+    started = g.pop('metrics_started', None)
+    if started is None:
+        return response
+
+    registry = current_app.extensions['metrics']
+    route = request.url_rule.rule if request.url_rule else '<unmatched>'
+    registry.inc('smartstay_http_requests_total', method=request.method, route=route,
+                 status=response.status_code)
+    registry.observe('smartstay_http_request_duration_seconds', time.perf_counter() - started,
+                     method=request.method, route=route)
+
+    profile = g.get('query_profile')
+    if profile is not None:
+        registry.inc('smartstay_db_queries_total', profile.count, route=route)
+        for record in profile.records:
+            registry.observe('smartstay_db_query_duration_seconds', record.duration)
+
+    registry.flush()
+    return response
+
+
+def metrics_view():
+    """GET /metrics"""
+    return Response(current_app.extensions['metrics'].render(), content_type=CONTENT_TYPE)
+
+
+def pool_collector(pool):
+    """Collector exporting a ConnectionPool's counters"""
+    def collect(registry):
+        stats = pool.stats()
+        registry.set('smartstay_db_pool_acquires_total', stats['hits'], result='hit')
+        registry.set('smartstay_db_pool_acquires_total', stats['misses'], result='miss')
+        registry.set('smartstay_db_pool_discarded_total', stats['discarded'])
+        registry.set('smartstay_db_pool_idle_connections', stats['idle'], pid=registry.pid)
+    return collect
+
+
+def replica_collector(replica):
+    """Collector exporting the age of the report replica's snapshot"""
+    def collect(registry):
+        age = replica.age()
+        if age is not None:
+            registry.set('smartstay_replica_age_seconds', round(age, 1), pid=registry.pid)
+    return collect
+
+
+def init_app(app, registry, endpoint='/metrics'):
+    """Time every request and serve the merged metrics at endpoint"""
+    app.extensions['metrics'] = registry
+    if registry.directory:
+        os.makedirs(registry.directory, exist_ok=True)
+    app.before_request(_start_request)
+    app.after_request(_record_request)
+    app.add_url_rule(endpoint, 'metrics', metrics_view)
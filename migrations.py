@@ -0,0 +1,74 @@
+"""
+Schema Migrations
+Ordered, idempotent schema changes tracked with PRAGMA user_version
+"""
+
+from inventory import init_inventory
+from lifecycle import ARCHIVE_INDEXES, init_lifecycle
+from outbox import init_outbox
+from pagination import INDEXES as PAGINATION_INDEXES
+from pricing import init_pricing
+from reservations import init_holds
+from reviews import init_reviews
+from search_index import init_search
+from shards import init_catalog
+from stats import exclude_holds, init_stats
+from versions import init_versions
+
+
+def _booking_indexes(conn):
+    conn.executescript('''
+        CREATE INDEX IF NOT EXISTS idx_bookings_updated ON bookings(updated_at);
+    ''' + PAGINATION_INDEXES)
+
+
+def _archive_indexes(conn):
+    conn.executescript(ARCHIVE_INDEXES)
+
+
+# (version, description, apply(conn)); append only, never renumber
+MIGRATIONS = [
+    (1, 'Booking sync and keyset pagination indexes', _booking_indexes),
+    (2, 'Dashboard statistics counters', init_stats),
+    (3, 'Full-text room search index and amenity facets', init_search),
+    (4, 'Hotel/room change versions and global catalog/bookings versions', init_versions),
+    (5, 'Booking event outbox', init_outbox),
+    (6, 'Rate rules and precomputed nightly rate calendars', init_pricing),
+    (7, 'Expiring checkout holds on pending bookings', init_holds),
+    (8, 'Room-type inventory counts per night', init_inventory),
+    (9, 'Room to hotel map for hotel shards', init_catalog),
+    (10, 'Review aggregates per room and hotel, review listing indexes', init_reviews),
+    (11, 'Booking archive, lifecycle job log, completed stays counted as revenue', init_lifecycle),
+    (12, 'Checkout holds left out of dashboard booking counters', exclude_holds),
+    (13, 'Archived booking listing indexes', _archive_indexes),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def current_version(conn):
+    """Schema version recorded in the database file"""
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def pending(conn):
+    """(version, description) of migrations not yet applied"""
+    version = current_version(conn)
+    return [(number, description) for number, description, _ in MIGRATIONS if number > version]
+
+
+def migrate(conn):
+    """Apply pending migrations in order; returns the versions applied.
+
+    Every migration is idempotent, so a run interrupted between applying
+    a step and recording its version is safe to repeat.
+    """
+    applied = []
+    for number, description, apply in MIGRATIONS:
+        if number <= current_version(conn):
+            continue
+        apply(conn)
+        conn.execute(f'PRAGMA user_version = {number}')
+        conn.commit()
+        applied.append(number)
+    return applied
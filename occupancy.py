@@ -0,0 +1,292 @@
+"""
+Occupancy Index
+In-process calendar of booked nights per room, answering availability without SQLite
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from calendar import timegm
+from datetime import date
+
+from availability import OCCUPYING_STATUSES
+
+# Re-read rows touched slightly before the last sync, to cover writes that
+# were still uncommitted in another worker when we last looked
+SYNC_OVERLAP_SECONDS = 5
+
+
+def _expiry(value):
+    """Hold expiry ('YYYY-MM-DD HH:MM:SS' UTC) as epoch seconds, or None"""
+    if not value:
+        return None
+    return timegm(time.strptime(str(value)[:19], '%Y-%m-%d %H:%M:%S'))
+
+
+def _ordinal(value):
+    """'YYYY-MM-DD' (or date) to a day ordinal"""
+    if isinstance(value, date):
+        return value.toordinal()
+    return date.fromisoformat(str(value)[:10]).toordinal()
+
+
+class _RoomCalendar:
+    """Sorted, possibly overlapping [start, end) night intervals for one room"""
+
+    __slots__ = ('starts', 'intervals', 'max_end')
+
+    def __init__(self):
+        self.starts = []
+        self.intervals = []   # (start, end, booking_id), sorted like starts
+        self.max_end = []     # running max of end, so legacy overlaps stay correct
+
+    def _rebuild_max(self, start_at=0):
+        running = self.max_end[start_at - 1] if start_at else 0
+        del self.max_end[start_at:]
+        for _, end, _ in self.intervals[start_at:]:
+            running = max(running, end)
+            self.max_end.append(running)
+
+    def add(self, start, end, booking_id):
+        interval = (start, end, booking_id)
+        position = bisect_left(self.intervals, interval)
+        self.intervals.insert(position, interval)
+        self.starts.insert(position, start)
+        self._rebuild_max(position)
+
+    def remove(self, booking_id):
+        for position, interval in enumerate(self.intervals):
+            if interval[2] == booking_id:
+                del self.intervals[position]
+                del self.starts[position]
+                self._rebuild_max(position)
+                return True
+        return False
+
+    def is_free(self, start, end):
+        # Intervals starting before `end` are the only candidates; the stay
+        # overlaps one of them iff the furthest of their ends passes `start`
+        position = bisect_left(self.starts, end)
+        return position == 0 or self.max_end[position - 1] <= start
+
+
+class OccupancyIndex:
+    """Per-room interval calendars for every occupying booking.
+
+    Built from the bookings table on first use, updated in-process by the
+    booking and cancellation routes, and caught up with writes from other
+    workers by sync(), which reads only rows changed since the last sync.
+
+    Checkout holds are kept apart from the calendars with their expiry,
+    so they stop blocking a room on time even if the row is deleted by
+    another process that sync() cannot observe.
+    """
+
+    def __init__(self, sync_interval=1.0):
+        self.sync_interval = sync_interval
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self._rooms = {}          # room_id -> _RoomCalendar
+        self._room_hotel = {}     # room_id -> hotel_id
+        self._hotel_rooms = {}    # hotel_id -> [room_id]
+        self._bookings = {}       # booking_id -> room_id
+        self._holds = {}          # room_id -> {booking_id: (start, end, expires_at)}
+        self._hold_rooms = {}     # booking_id -> room_id
+        self._last_room_id = 0
+        self._last_booking_id = 0
+        self._since = None
+        self._synced_at = 0.0
+        self.loaded = False
+
+    # Building and syncing
+
+    def load(self, conn):
+        """(Re)build the whole index from the database"""
+        with self._lock:
+            self._reset()
+            self._since = self._db_now(conn)
+            for room in conn.execute('SELECT id, hotel_id FROM rooms'):
+                self._add_room(room['id'], room['hotel_id'])
+            for booking in conn.execute(self._bookings_query()):
+                self._apply(booking)
+            self._synced_at = time.monotonic()
+            self.loaded = True
+
+    def sync(self, conn, force=False):
+        """Pick up rooms and bookings written by other processes"""
+        with self._lock:
+            if not self.loaded:
+                self.load(conn)
+                return
+            if not force and time.monotonic() - self._synced_at < self.sync_interval:
+                return
+
+            since, self._since = self._since, self._db_now(conn)
+            for room in conn.execute(
+                'SELECT id, hotel_id FROM rooms WHERE id > ?', (self._last_room_id,)
+            ):
+                self._add_room(room['id'], room['hotel_id'])
+            for booking in conn.execute(
+                self._bookings_query(all_statuses=True) + ' WHERE id > ? OR updated_at >= ?',
+                (self._last_booking_id, since)
+            ):
+                self._apply(booking)
+            self._synced_at = time.monotonic()
+
+    @staticmethod
+    def _db_now(conn):
+        return conn.execute(
+            'SELECT datetime(\'now\', ?)', (f'-{SYNC_OVERLAP_SECONDS} seconds',)
+        ).fetchone()[0]
+
+    @staticmethod
+    def _bookings_query(all_statuses=False):
+        query = ('SELECT id, booking_id, room_id, check_in_date, check_out_date, status, hold_expires_at '
+                 'FROM bookings')
+        if not all_statuses:
+            statuses = ', '.join(f"'{status}'" for status in OCCUPYING_STATUSES)
+            query += f' WHERE status IN ({statuses})'
+        return query
+
+    def _apply(self, booking):
+        """Make the index reflect one bookings row (idempotent)"""
+        self._last_booking_id = max(self._last_booking_id, booking['id'])
+        self._remove(booking['booking_id'])
+        if booking['status'] not in OCCUPYING_STATUSES:
+            return
+        if booking['hold_expires_at']:
+            self._add_hold(booking['booking_id'], booking['room_id'], booking['check_in_date'],
+                           booking['check_out_date'], booking['hold_expires_at'])
+        else:
+            self._add(booking['booking_id'], booking['room_id'],
+                      booking['check_in_date'], booking['check_out_date'])
+
+    # Mutations
+
+    def _add_room(self, room_id, hotel_id):
+        if room_id not in self._room_hotel:
+            self._room_hotel[room_id] = hotel_id
+            self._hotel_rooms.setdefault(hotel_id, []).append(room_id)
+        self._last_room_id = max(self._last_room_id, room_id)
+
+    def _add(self, booking_id, room_id, check_in, check_out):
+        calendar = self._rooms.setdefault(room_id, _RoomCalendar())
+        calendar.add(_ordinal(check_in), _ordinal(check_out), booking_id)
+        self._bookings[booking_id] = room_id
+
+    def _add_hold(self, booking_id, room_id, check_in, check_out, expires_at):
+        holds = self._holds.setdefault(room_id, {})
+        holds[booking_id] = (_ordinal(check_in), _ordinal(check_out), _expiry(expires_at))
+        self._hold_rooms[booking_id] = room_id
+
+    def _remove(self, booking_id):
+        room_id = self._bookings.pop(booking_id, None)
+        if room_id is not None:
+            self._rooms[room_id].remove(booking_id)
+        room_id = self._hold_rooms.pop(booking_id, None)
+        if room_id is not None:
+            del self._holds[room_id][booking_id]
+
+    def _held(self, room_id, start, end, now):
+        """True when a live hold overlaps the stay; expired holds are dropped on the way"""
+        holds = self._holds.get(room_id)
+        if not holds:
+            return False
+        held = False
+        for booking_id, (hold_start, hold_end, expires_at) in list(holds.items()):
+            if expires_at <= now:
+                del holds[booking_id]
+                del self._hold_rooms[booking_id]
+            elif hold_start < end and hold_end > start:
+                held = True
+        return held
+
+    def add_room(self, room_id, hotel_id):
+        """Register a newly created room"""
+        with self._lock:
+            self._add_room(room_id, hotel_id)
+
+    def add(self, booking_id, room_id, check_in, check_out):
+        """Record a new occupying booking"""
+        with self._lock:
+            self._remove(booking_id)
+            self._add(booking_id, room_id, check_in, check_out)
+
+    def add_hold(self, booking_id, room_id, check_in, check_out, expires_at):
+        """Record a checkout hold until expires_at"""
+        with self._lock:
+            self._remove(booking_id)
+            self._add_hold(booking_id, room_id, check_in, check_out, expires_at)
+
+    def remove(self, booking_id):
+        """Forget a cancelled booking or released hold"""
+        with self._lock:
+            self._remove(booking_id)
+
+    # Queries
+
+    def is_free(self, room_id, check_in, check_out):
+        """True when the room has no occupying booking overlapping the stay"""
+        start, end = _ordinal(check_in), _ordinal(check_out)
+        room_id = int(room_id)
+        with self._lock:
+            calendar = self._rooms.get(room_id)
+            return ((calendar is None or calendar.is_free(start, end))
+                    and not self._held(room_id, start, end, time.time()))
+
+    def free_rooms(self, room_ids, check_in, check_out):
+        """Subset of room_ids free for the whole stay, preserving order"""
+        start, end = _ordinal(check_in), _ordinal(check_out)
+        now = time.time()
+        with self._lock:
+            rooms = self._rooms
+            return [
+                room_id for room_id in room_ids
+                if (room_id not in rooms or rooms[room_id].is_free(start, end))
+                and not self._held(room_id, start, end, now)
+            ]
+
+    def free_rooms_in_hotel(self, hotel_id, check_in, check_out):
+        """Rooms of a hotel free for the whole stay"""
+        with self._lock:
+            room_ids = list(self._hotel_rooms.get(hotel_id, []))
+        return self.free_rooms(room_ids, check_in, check_out)
+
+    # Consistency
+
+    def snapshot(self):
+        """{booking_id: (room_id, start, end)} for everything indexed, live holds included"""
+        now = time.time()
+        with self._lock:
+            indexed = {
+                booking_id: (room_id, start, end)
+                for room_id, calendar in self._rooms.items()
+                for start, end, booking_id in calendar.intervals
+            }
+            indexed.update(
+                (booking_id, (room_id, start, end))
+                for room_id, holds in self._holds.items()
+                for booking_id, (start, end, expires_at) in holds.items()
+                if expires_at > now
+            )
+            return indexed
+
+    def verify(self, conn):
+        """Compare the index against a fresh read of the database"""
+        expected = OccupancyIndex()
+        expected.load(conn)
+        want, have = expected.snapshot(), self.snapshot()
+
+        missing = sorted(set(want) - set(have))
+        extra = sorted(set(have) - set(want))
+        mismatched = sorted(b for b in set(want) & set(have) if want[b] != have[b])
+        return {
+            'consistent': not (missing or extra or mismatched),
+            'indexed_bookings': len(have),
+            'database_bookings': len(want),
+            'missing': missing,
+            'extra': extra,
+            'mismatched': mismatched,
+        }
@@ -0,0 +1,328 @@
+"""
+Booking Outbox
+Durable booking events written with the booking, delivered later by a worker process
+"""
+
+import json
+import os
+import random
+import smtplib
+import socket
+import sqlite3
+import time
+from email.message import EmailMessage
+
+BOOKING_CONFIRMED = 'booking.confirmed'
+BOOKING_CANCELLED = 'booking.cancelled'
+
+DEFAULT_BATCH_SIZE = 50
+MAX_ATTEMPTS = 8
+BACKOFF_BASE = 30      # seconds before the first retry, doubled per attempt
+BACKOFF_MAX = 3600
+LEASE_SECONDS = 300    # a claimed event is retried if its worker dies mid-batch
+
+SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS outbox (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        event TEXT NOT NULL,
+        payload TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'pending' CHECK(status IN ('pending', 'sent', 'dead')),
+        attempts INTEGER NOT NULL DEFAULT 0,
+        available_at REAL NOT NULL,
+        locked_until REAL,
+        last_error TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        sent_at TIMESTAMP
+    );
+    CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox(status, available_at);
+'''
+
+
+class PermanentSendError(Exception):
+    """Delivery can never succeed (bad address, missing booking); dead-letter at once"""
+
+
+def init_outbox(conn):
+    conn.executescript(SCHEMA)
+
+
+def enqueue(conn, event, payload):
+    """Record an event in the caller's open transaction; never commits"""
+    conn.execute(
+        'INSERT INTO outbox (event, payload, available_at) VALUES (?, ?, ?)',
+        (event, json.dumps(payload), time.time())
+    )
+
+
+# Messages
+
+SUBJECTS = {
+    BOOKING_CONFIRMED: 'Your SmartStay booking {booking_id} is confirmed',
+    BOOKING_CANCELLED: 'Your SmartStay booking {booking_id} has been cancelled',
+}
+
+BODIES = {
+    BOOKING_CONFIRMED: '''Hello {user_name},
+
+Your stay at {hotel_name} ({city}) is confirmed.
+
+Booking ID: {booking_id}
+Room: {room_number} ({room_type})
+Check-in: {check_in_date}
+Check-out: {check_out_date}
+Guests: {number_of_guests}
+Total: ${total_price:.2f}
+
+Thank you for booking with SmartStay.
+''',
+    BOOKING_CANCELLED: '''Hello {user_name},
+
+Your booking {booking_id} at {hotel_name} ({city}) for {check_in_date} to
+{check_out_date} has been cancelled.
+
+We hope to welcome you another time.
+''',
+}
+
+
+def build_message(conn, event, payload, sender):
+    """EmailMessage for an event, using the booking as it is now"""
+    if event not in SUBJECTS:
+        raise PermanentSendError(f'Unknown event {event}')
+    booking = conn.execute('''
+        SELECT b.*, u.name as user_name, u.email as user_email,
+               h.name as hotel_name, h.city, r.room_number, r.room_type
+        FROM bookings b
+        JOIN users u ON b.user_id = u.id
+        JOIN hotels h ON b.hotel_id = h.id
+        JOIN rooms r ON b.room_id = r.id
+        WHERE b.booking_id = ?
+    ''', (payload['booking_id'],)).fetchone()
+    if not booking:
+        raise PermanentSendError(f"Booking {payload['booking_id']} not found")
+
+    fields = dict(booking)
+    message = EmailMessage()
+    message['From'] = sender
+    message['To'] = booking['user_email']
+    message['Subject'] = SUBJECTS[event].format(**fields)
+    message.set_content(BODIES[event].format(**fields))
+    return message
+
+
+# Senders
+
+class FileSender:
+    """Writes each message to an .eml file; for development and tests"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def send(self, event_id, message):
+        path = os.path.join(self.directory, f'{event_id:08d}.eml')
+        with open(path, 'wb') as handle:
+            handle.write(bytes(message))
+
+
+class SMTPSender:
+    """Sends through one SMTP connection per batch"""
+
+    def __init__(self, host, port, use_tls=True, username='', password='', timeout=30):
+        self.host = host
+        self.port = port
+        self.use_tls = use_tls
+        self.username = username
+        self.password = password
+        self.timeout = timeout
+        self._smtp = None
+
+    def __enter__(self):
+        self._smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.use_tls:
+            self._smtp.starttls()
+        if self.username:
+            self._smtp.login(self.username, self.password)
+        return self
+
+    def __exit__(self, *exc):
+        try:
+            self._smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            pass
+        self._smtp = None
+        return False
+
+    def send(self, event_id, message):
+        try:
+            self._smtp.send_message(message)
+        except smtplib.SMTPRecipientsRefused as e:
+            raise PermanentSendError(str(e)) from e
+        except smtplib.SMTPResponseException as e:
+            if 500 <= e.smtp_code < 600:
+                raise PermanentSendError(f'{e.smtp_code} {e.smtp_error!r}') from e
+            raise
+
+
+def create_sender(config):
+    """Sender for MAIL_BACKEND: 'smtp' or 'file'"""
+    if config['MAIL_BACKEND'] == 'smtp':
+        return SMTPSender(config['MAIL_SERVER'], config['MAIL_PORT'], config['MAIL_USE_TLS'],
+                          config['MAIL_USERNAME'], config['MAIL_PASSWORD'])
+    if config['MAIL_BACKEND'] == 'file':
+        return FileSender(config['MAIL_FILE_DIR'])
+    raise ValueError(f"Unknown MAIL_BACKEND: {config['MAIL_BACKEND']}")
+
+
+# Worker
+
+def _backoff(attempts):
+    delay = min(BACKOFF_MAX, BACKOFF_BASE * (2 ** (attempts - 1)))
+    return delay * random.uniform(0.8, 1.2)
+
+
+def claim(conn, batch_size=DEFAULT_BATCH_SIZE, lease=LEASE_SECONDS):
+    """Lease a batch of due events so concurrent workers never take the same one"""
+    now = time.time()
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        rows = conn.execute('''
+            SELECT id, event, payload, attempts FROM outbox
+            WHERE status = 'pending' AND available_at <= ?
+              AND (locked_until IS NULL OR locked_until < ?)
+            ORDER BY available_at, id
+            LIMIT ?
+        ''', (now, now, batch_size)).fetchall()
+        conn.executemany('UPDATE outbox SET locked_until = ? WHERE id = ?',
+                         [(now + lease, row['id']) for row in rows])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return rows
+
+
+def _record(conn, sql, params):
+    conn.execute(sql, params)
+    conn.commit()
+
+
+def deliver(conn, sender, sender_address, batch_size=DEFAULT_BATCH_SIZE, max_attempts=MAX_ATTEMPTS):
+    """Claim and send one batch; returns {'sent', 'retried', 'dead'} counts"""
+    counts = {'sent': 0, 'retried': 0, 'dead': 0}
+    rows = claim(conn, batch_size)
+    if not rows:
+        return counts
+
+    try:
+        session = sender.__enter__()
+    except (smtplib.SMTPException, OSError) as e:
+        # Could not even connect: every claimed event waits for its next attempt
+        for row in rows:
+            counts[_fail(conn, row, f'connect: {e}', max_attempts)] += 1
+        return counts
+
+    try:
+        for row in rows:
+            try:
+                message = build_message(conn, row['event'], json.loads(row['payload']), sender_address)
+                session.send(row['id'], message)
+            except PermanentSendError as e:
+                counts[_fail(conn, row, str(e), max_attempts, permanent=True)] += 1
+            except (smtplib.SMTPException, OSError, socket.timeout, sqlite3.Error) as e:
+                counts[_fail(conn, row, f'{type(e).__name__}: {e}', max_attempts)] += 1
+            else:
+                _record(conn, '''
+                    UPDATE outbox SET status = 'sent', sent_at = CURRENT_TIMESTAMP,
+                        attempts = attempts + 1, locked_until = NULL, last_error = NULL
+                    WHERE id = ?
+                ''', (row['id'],))
+                counts['sent'] += 1
+    finally:
+        sender.__exit__(None, None, None)
+    return counts
+
+
+def _fail(conn, row, error, max_attempts, permanent=False):
+    attempts = row['attempts'] + 1
+    if permanent or attempts >= max_attempts:
+        _record(conn, '''
+            UPDATE outbox SET status = 'dead', attempts = ?, locked_until = NULL, last_error = ?
+            WHERE id = ?
+        ''', (attempts, error, row['id']))
+        return 'dead'
+    _record(conn, '''
+        UPDATE outbox SET attempts = ?, available_at = ?, locked_until = NULL, last_error = ?
+        WHERE id = ?
+    ''', (attempts, time.time() + _backoff(attempts), error, row['id']))
+    return 'retried'
+
+
+def run_worker(connect, sender, sender_address, interval=2.0, batch_size=DEFAULT_BATCH_SIZE,
+               max_attempts=MAX_ATTEMPTS, once=False, log=print):
+    """Drain the outbox until stopped; full batches are followed immediately by the next.
+
+    connect may return a list of connections (one per hotel shard); each
+    pass delivers a batch from every one of them.
+    """
+    conns = connect()
+    conns = conns if isinstance(conns, list) else [conns]
+    try:
+        while True:
+            counts, full = {'sent': 0, 'retried': 0, 'dead': 0}, False
+            for conn in conns:
+                delivered = deliver(conn, sender, sender_address, batch_size, max_attempts)
+                for outcome, count in delivered.items():
+                    counts[outcome] = counts.get(outcome, 0) + count
+                full = full or sum(delivered.values()) >= batch_size
+            if any(counts.values()):
+                log(f"outbox: sent={counts['sent']} retried={counts['retried']} dead={counts['dead']}")
+            if once:
+                return counts
+            if not full:
+                time.sleep(interval)
+    finally:
+        for conn in conns:
+            conn.close()
+
+
+def requeue_dead(conn, event_ids=None):
+    """Give dead-lettered events a fresh set of attempts; returns how many"""
+    query = "UPDATE outbox SET status = 'pending', attempts = 0, available_at = ? WHERE status = 'dead'"
+    params = [time.time()]
+    if event_ids:
+        query += f" AND id IN ({', '.join('?' for _ in event_ids)})"
+        params.extend(event_ids)
+    count = conn.execute(query, params).rowcount
+    conn.commit()
+    return count
+
+
+def purge_sent(conn, older_than_days=30):
+    """Delete delivered events older than the retention window"""
+    count = conn.execute(
+        "DELETE FROM outbox WHERE status = 'sent' AND sent_at < datetime('now', ?)",
+        (f'-{int(older_than_days)} days',)
+    ).rowcount
+    conn.commit()
+    return count
+
+
+def outbox_stats(conn):
+    """Event counts per status and the age of the oldest undelivered event"""
+    counts = dict(conn.execute('SELECT status, COUNT(*) FROM outbox GROUP BY status').fetchall())
+    oldest = conn.execute(
+        "SELECT (julianday('now') - julianday(MIN(created_at))) * 86400 FROM outbox WHERE status = 'pending'"
+    ).fetchone()[0]
+    return {
+        'pending': counts.get('pending', 0),
+        'sent': counts.get('sent', 0),
+        'dead': counts.get('dead', 0),
+        'oldest_pending_seconds': round(oldest, 1) if oldest is not None else 0.0,
+    }
@@ -0,0 +1,156 @@
+"""
+Booking Pagination
+Keyset (created_at, id) pagination and streamed JSON for booking listings
+"""
+
+import base64
+import heapq
+import itertools
+import json
+
+from lifecycle import ARCHIVE_COLUMNS
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+_LIST_QUERY = '''
+    SELECT {columns}, r.room_number, r.room_type, r.price_per_night,
+           h.name as hotel_name, u.name as user_name
+    FROM {table} b
+    JOIN rooms r ON b.room_id = r.id
+    JOIN hotels h ON b.hotel_id = h.id
+    JOIN users u ON b.user_id = u.id
+'''
+BOOKING_LIST_QUERY = _LIST_QUERY.format(columns='b.*', table='bookings')
+
+# Live and archived bookings side by side (the archive adds archived_at)
+_BOTH_COLUMNS = ', '.join(f'b.{column}' for column in ARCHIVE_COLUMNS)
+
+# Composite indexes that let every filter combination walk the newest-first
+# order directly and stop after one page
+INDEXES = '''
+    CREATE INDEX IF NOT EXISTS idx_bookings_created ON bookings(created_at, id);
+    CREATE INDEX IF NOT EXISTS idx_bookings_user_created ON bookings(user_id, created_at, id);
+    CREATE INDEX IF NOT EXISTS idx_bookings_hotel_created ON bookings(hotel_id, created_at, id);
+'''
+
+
+def encode_cursor(row):
+    """Opaque cursor pointing just after the given booking row"""
+    raw = json.dumps([row['created_at'], row['id']]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """(created_at, id) from a cursor; raises ValueError if malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        created_at, booking_pk = json.loads(raw)
+        return str(created_at), int(booking_pk)
+    except (TypeError, ValueError, json.JSONDecodeError) as e:
+        raise ValueError('Invalid cursor') from e
+
+
+def page_size(value):
+    """Clamp a requested page size to [1, MAX_PAGE_SIZE]"""
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def filters_from_args(args):
+    """Listing filters from request args (status, hotel_id, check-in date range)"""
+    return {
+        'status': args.get('status') or None,
+        'hotel_id': args.get('hotel_id', type=int),
+        'date_from': args.get('date_from') or None,
+        'date_to': args.get('date_to') or None,
+        'include_archived': args.get('include_archived', type=int),
+    }
+
+
+def build_query(filters, cursor=None, limit=DEFAULT_PAGE_SIZE, user_id=None):
+    """SQL and params for one newest-first page (fetches limit + 1 rows).
+
+    With filters['include_archived'] the page also covers bookings moved
+    to bookings_archive: a page from each table, merged in the query.
+    """
+    # Checkout holds are form state, not bookings, until confirmed
+    conditions, params = ['b.hold_expires_at IS NULL'], []
+
+    if user_id is not None:
+        conditions.append('b.user_id = ?')
+        params.append(user_id)
+    if filters.get('status'):
+        conditions.append('b.status = ?')
+        params.append(filters['status'])
+    if filters.get('hotel_id'):
+        conditions.append('b.hotel_id = ?')
+        params.append(filters['hotel_id'])
+    if filters.get('date_from'):
+        conditions.append('b.check_in_date >= ?')
+        params.append(filters['date_from'])
+    if filters.get('date_to'):
+        conditions.append('b.check_in_date <= ?')
+        params.append(filters['date_to'])
+    if cursor:
+        conditions.append('(b.created_at, b.id) < (?, ?)')
+        params.extend(cursor)
+
+    where = ' WHERE ' + ' AND '.join(conditions) + ' ORDER BY b.created_at DESC, b.id DESC LIMIT ?'
+    if not filters.get('include_archived'):
+        return BOOKING_LIST_QUERY + where, params + [limit + 1]
+
+    live = _LIST_QUERY.format(columns=_BOTH_COLUMNS, table='bookings') + where
+    archived = _LIST_QUERY.format(columns=_BOTH_COLUMNS, table='bookings_archive') + where
+    query = f'''
+        SELECT * FROM ({live}) UNION ALL SELECT * FROM ({archived})
+        ORDER BY created_at DESC, id DESC LIMIT ?
+    '''
+    return query, [*params, limit + 1, *params, limit + 1, limit + 1]
+
+
+def page_rows(conn, filters, cursor=None, limit=DEFAULT_PAGE_SIZE, user_id=None):
+    """The page's rows plus one more when another page follows, for merge_pages()"""
+    query, params = build_query(filters, cursor, limit, user_id)
+    return conn.execute(query, params).fetchall()
+
+
+def fetch_page(conn, filters, cursor=None, limit=DEFAULT_PAGE_SIZE, user_id=None):
+    """One page of bookings plus the cursor for the next page (or None)"""
+    rows = page_rows(conn, filters, cursor, limit, user_id)
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+
+def stream_page_json(conn, filters, cursor=None, limit=DEFAULT_PAGE_SIZE, user_id=None):
+    """Yield one page as a JSON document, row by row straight off the cursor"""
+    query, params = build_query(filters, cursor, limit, user_id)
+    rows = conn.execute(query, params)
+
+    yield '{"bookings": ['
+    last, has_more = None, False
+    for count, row in enumerate(rows):
+        if count == limit:
+            has_more = True
+            break
+        yield (',' if last else '') + json.dumps(dict(row))
+        last = row
+    rows.close()
+
+    next_cursor = encode_cursor(last) if has_more else None
+    yield '], "next_cursor": ' + json.dumps(next_cursor) + '}'
+
+
+def merge_pages(pages, limit=DEFAULT_PAGE_SIZE):
+    """One page from several shards' pages of the same query (limit + 1 rows each).
+
+    Rows on different shards that share both created_at and id compare
+    equal, so a page boundary falling between them can skip one.
+    """
+    merged = heapq.merge(*pages, key=lambda row: (row['created_at'], row['id']), reverse=True)
+    rows = list(itertools.islice(merged, limit + 1))
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
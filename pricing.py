@@ -0,0 +1,513 @@
+"""
+Dynamic Pricing
+Rate rules compiled into precomputed per-room nightly rate calendars
+"""
+
+from array import array
+from datetime import date, timedelta
+
+from availability import MAX_IDS_PER_QUERY, occupying_clause
+
+RULE_KINDS = ('season', 'weekday', 'occupancy', 'length_of_stay')
+NIGHTLY_KINDS = ('season', 'weekday', 'occupancy')
+ADJUSTMENT_TYPES = ('percent', 'amount')
+
+# Nights precomputed per room, starting today
+CALENDAR_DAYS = 365
+
+# Calendar rates are whole cents, one unsigned 32-bit value per night
+_TYPECODE = 'I'
+
+# Nightly rules (season, weekday, occupancy) are applied to the base price in
+# priority order and precomputed into rate_calendar; length-of-stay rules
+# depend on the whole stay and are applied when quoting.
+#
+# Every write that can change a nightly rate queues its scope in rate_dirty
+# (the room, a hotel/room type, and the affected dates); refresh() drains the
+# queue and recomputes only those nights. Bookings queue their dates only
+# while an occupancy rule covers the hotel.
+SCHEMA = f'''
+    CREATE TABLE IF NOT EXISTS rate_rules (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        kind TEXT NOT NULL CHECK(kind IN {RULE_KINDS}),
+        hotel_id INTEGER,
+        room_type TEXT,
+        start_date DATE,
+        end_date DATE,
+        weekdays TEXT,
+        min_occupancy REAL CHECK(min_occupancy IS NULL OR (min_occupancy > 0 AND min_occupancy <= 1)),
+        min_nights INTEGER CHECK(min_nights IS NULL OR min_nights >= 1),
+        adjustment_type TEXT NOT NULL DEFAULT 'percent' CHECK(adjustment_type IN {ADJUSTMENT_TYPES}),
+        adjustment REAL NOT NULL,
+        priority INTEGER NOT NULL DEFAULT 0,
+        active INTEGER NOT NULL DEFAULT 1,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (hotel_id) REFERENCES hotels(id)
+    );
+    CREATE INDEX IF NOT EXISTS idx_rate_rules_kind ON rate_rules(kind, active);
+
+    CREATE TABLE IF NOT EXISTS rate_calendar (
+        room_id INTEGER PRIMARY KEY,
+        start_date DATE NOT NULL,
+        base_price REAL NOT NULL,
+        rates BLOB NOT NULL,
+        computed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (room_id) REFERENCES rooms(id)
+    );
+
+    CREATE TABLE IF NOT EXISTS rate_dirty (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        room_id INTEGER,
+        hotel_id INTEGER,
+        room_type TEXT,
+        start_date DATE,
+        end_date DATE
+    );
+
+    CREATE TRIGGER IF NOT EXISTS pricing_rules_insert AFTER INSERT ON rate_rules
+    WHEN NEW.kind != 'length_of_stay' BEGIN
+        INSERT INTO rate_dirty (hotel_id, room_type, start_date, end_date)
+        VALUES (NEW.hotel_id, NEW.room_type, NEW.start_date, NEW.end_date);
+    END;
+    CREATE TRIGGER IF NOT EXISTS pricing_rules_update AFTER UPDATE ON rate_rules
+    WHEN NEW.kind != 'length_of_stay' OR OLD.kind != 'length_of_stay' BEGIN
+        INSERT INTO rate_dirty (hotel_id, room_type, start_date, end_date)
+        VALUES (OLD.hotel_id, OLD.room_type, OLD.start_date, OLD.end_date),
+               (NEW.hotel_id, NEW.room_type, NEW.start_date, NEW.end_date);
+    END;
+    CREATE TRIGGER IF NOT EXISTS pricing_rules_delete AFTER DELETE ON rate_rules
+    WHEN OLD.kind != 'length_of_stay' BEGIN
+        INSERT INTO rate_dirty (hotel_id, room_type, start_date, end_date)
+        VALUES (OLD.hotel_id, OLD.room_type, OLD.start_date, OLD.end_date);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS pricing_rooms_insert AFTER INSERT ON rooms BEGIN
+        INSERT INTO rate_dirty (room_id) VALUES (NEW.id);
+    END;
+    CREATE TRIGGER IF NOT EXISTS pricing_rooms_update
+    AFTER UPDATE OF hotel_id, room_type, price_per_night ON rooms BEGIN
+        INSERT INTO rate_dirty (room_id) VALUES (NEW.id);
+    END;
+    CREATE TRIGGER IF NOT EXISTS pricing_rooms_delete AFTER DELETE ON rooms BEGIN
+        DELETE FROM rate_calendar WHERE room_id = OLD.id;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS pricing_bookings_insert AFTER INSERT ON bookings
+    WHEN EXISTS (SELECT 1 FROM rate_rules WHERE kind = 'occupancy' AND active = 1
+                 AND (hotel_id IS NULL OR hotel_id = NEW.hotel_id)) BEGIN
+        INSERT INTO rate_dirty (hotel_id, start_date, end_date)
+        VALUES (NEW.hotel_id, NEW.check_in_date, NEW.check_out_date);
+    END;
+    CREATE TRIGGER IF NOT EXISTS pricing_bookings_update
+    AFTER UPDATE OF status, hotel_id, check_in_date, check_out_date ON bookings
+    WHEN EXISTS (SELECT 1 FROM rate_rules WHERE kind = 'occupancy' AND active = 1
+                 AND (hotel_id IS NULL OR hotel_id IN (OLD.hotel_id, NEW.hotel_id))) BEGIN
+        INSERT INTO rate_dirty (hotel_id, start_date, end_date)
+        VALUES (OLD.hotel_id, OLD.check_in_date, OLD.check_out_date),
+               (NEW.hotel_id, NEW.check_in_date, NEW.check_out_date);
+    END;
+    CREATE TRIGGER IF NOT EXISTS pricing_bookings_delete AFTER DELETE ON bookings
+    WHEN EXISTS (SELECT 1 FROM rate_rules WHERE kind = 'occupancy' AND active = 1
+                 AND (hotel_id IS NULL OR hotel_id = OLD.hotel_id)) BEGIN
+        INSERT INTO rate_dirty (hotel_id, start_date, end_date)
+        VALUES (OLD.hotel_id, OLD.check_in_date, OLD.check_out_date);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS pricing_calendar_insert AFTER INSERT ON rate_calendar BEGIN
+        UPDATE change_versions SET value = value + 1 WHERE name = 'catalog';
+    END;
+    CREATE TRIGGER IF NOT EXISTS pricing_calendar_update AFTER UPDATE ON rate_calendar BEGIN
+        UPDATE change_versions SET value = value + 1 WHERE name = 'catalog';
+    END;
+'''
+
+
+def _date(value):
+    if value is None or isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+class Rule:
+    """An active rate rule, parsed once per refresh or quote"""
+
+    def __init__(self, row):
+        self.id = row['id']
+        self.kind = row['kind']
+        self.hotel_id = row['hotel_id']
+        self.room_type = row['room_type']
+        self.start = _date(row['start_date'])
+        self.end = _date(row['end_date'])
+        self.weekdays = {int(day) for day in (row['weekdays'] or '').split(',') if day.strip()}
+        self.min_occupancy = row['min_occupancy']
+        self.min_nights = row['min_nights']
+        self.adjustment_type = row['adjustment_type']
+        self.adjustment = row['adjustment']
+        self.priority = row['priority']
+
+    def covers(self, room):
+        return ((self.hotel_id is None or self.hotel_id == room['hotel_id'])
+                and (self.room_type is None or self.room_type == room['room_type']))
+
+    def in_range(self, night):
+        return (self.start is None or night >= self.start) and (self.end is None or night < self.end)
+
+    def applies(self, night, occupancy):
+        if not self.in_range(night):
+            return False
+        if self.kind == 'weekday':
+            return night.weekday() in self.weekdays
+        if self.kind == 'occupancy':
+            return occupancy >= self.min_occupancy
+        return True
+
+    def adjust(self, price, nights=1):
+        """Price after this rule; amounts are per night"""
+        if self.adjustment_type == 'percent':
+            return price * (1 + self.adjustment / 100)
+        return price + self.adjustment * nights
+
+
+def load_rules(conn):
+    """Active rules in the order they apply"""
+    return [Rule(row) for row in conn.execute(
+        'SELECT * FROM rate_rules WHERE active = 1 ORDER BY priority, id'
+    )]
+
+
+def _needs_occupancy(rules, room):
+    return any(rule.kind == 'occupancy' and rule.covers(room) for rule in rules)
+
+
+def hotel_occupancy(conn, hotel_id, start, days):
+    """Fraction of a hotel's rooms occupied on each of `days` nights from start"""
+    rooms = conn.execute('SELECT COUNT(*) FROM rooms WHERE hotel_id = ?', (hotel_id,)).fetchone()[0]
+    if not rooms:
+        return [0.0] * days
+
+    # Difference array over the window: +1 on arrival, -1 on departure
+    changes = [0] * (days + 1)
+    for check_in, check_out in conn.execute(f'''
+        SELECT check_in_date, check_out_date FROM bookings b
+        WHERE b.hotel_id = ? AND {occupying_clause('b')}
+        AND b.check_in_date < ? AND b.check_out_date > ?
+    ''', (hotel_id, (start + timedelta(days=days)).isoformat(), start.isoformat())):
+        changes[max(0, (_date(check_in) - start).days)] += 1
+        changes[min(days, (_date(check_out) - start).days)] -= 1
+
+    occupancy, occupied = [], 0
+    for change in changes[:days]:
+        occupied += change
+        occupancy.append(occupied / rooms)
+    return occupancy
+
+
+def nightly_rates(room, start, days, rules, occupancy=None):
+    """Calendar array of rates in cents for `days` nights from start.
+
+    occupancy is the hotel's per-night occupancy over the same nights,
+    needed only when an occupancy rule covers the room.
+    """
+    rules = [rule for rule in rules if rule.kind in NIGHTLY_KINDS and rule.covers(room)]
+    base = room['price_per_night']
+    if not rules:
+        return array(_TYPECODE, [round(base * 100)]) * days
+
+    rates = array(_TYPECODE)
+    for offset in range(days):
+        night = start + timedelta(days=offset)
+        price = base
+        for rule in rules:
+            if rule.applies(night, occupancy[offset] if occupancy else 0.0):
+                price = rule.adjust(price)
+        rates.append(max(0, round(price * 100)))
+    return rates
+
+
+def _rooms(conn, room_ids=None):
+    query = 'SELECT id, hotel_id, room_type, price_per_night FROM rooms'
+    if room_ids is None:
+        return conn.execute(query).fetchall()
+    room_ids = list(room_ids)
+    rows = []
+    for start in range(0, len(room_ids), MAX_IDS_PER_QUERY):
+        chunk = room_ids[start:start + MAX_IDS_PER_QUERY]
+        rows.extend(conn.execute(f"{query} WHERE id IN ({', '.join('?' for _ in chunk)})", chunk))
+    return rows
+
+
+def _dirty_ranges(conn, last_id, today, horizon):
+    """{room_id: (first, last)} night offsets to recompute for queued changes up to last_id"""
+    scopes = {}
+    for row in conn.execute(
+        'SELECT room_id, hotel_id, room_type, start_date, end_date FROM rate_dirty WHERE id <= ?', (last_id,)
+    ):
+        first = max(today, _date(row['start_date']) or today)
+        last = min(horizon, _date(row['end_date']) or horizon)
+        if last <= first:
+            continue  # only past nights changed
+        scope = (row['room_id'], row['hotel_id'], row['room_type'])
+        known = scopes.get(scope)
+        scopes[scope] = (min(known[0], first), max(known[1], last)) if known else (first, last)
+
+    ranges = {}
+    for (room_id, hotel_id, room_type), (first, last) in scopes.items():
+        for (matched,) in conn.execute('''
+            SELECT id FROM rooms
+            WHERE (?1 IS NULL OR id = ?1) AND (?2 IS NULL OR hotel_id = ?2) AND (?3 IS NULL OR room_type = ?3)
+        ''', (room_id, hotel_id, room_type)):
+            known = ranges.get(matched)
+            span = ((first - today).days, (last - today).days)
+            ranges[matched] = (min(known[0], span[0]), max(known[1], span[1])) if known else span
+    return ranges
+
+
+def refresh(conn, days=CALENDAR_DAYS, full=False, today=None):
+    """Recompute the calendar nights touched by queued changes; returns rooms rewritten.
+
+    With full, every room is rebuilt from today, which also rolls the
+    calendars forward a day at a time; run it daily. Rates are computed
+    before taking the write lock, and only calendars that changed are
+    written, so an unchanged recompute does not bump the catalog version.
+    """
+    today = today or date.today()
+    horizon = today + timedelta(days=days)
+    last_id = conn.execute('SELECT MAX(id) FROM rate_dirty').fetchone()[0]
+    if last_id is None and not full:
+        return 0
+
+    if full:
+        rooms = _rooms(conn)
+        ranges = {room['id']: (0, days) for room in rooms}
+    else:
+        ranges = _dirty_ranges(conn, last_id, today, horizon)
+        rooms = _rooms(conn, ranges)
+
+    rules = load_rules(conn)
+    existing = {}
+    for room_ids in (list(ranges)[i:i + MAX_IDS_PER_QUERY] for i in range(0, len(ranges), MAX_IDS_PER_QUERY)):
+        existing.update((row['room_id'], row) for row in conn.execute(
+            f"SELECT * FROM rate_calendar WHERE room_id IN ({', '.join('?' for _ in room_ids)})", room_ids
+        ))
+
+    occupancy = {}
+    writes = []
+    for room in rooms:
+        if _needs_occupancy(rules, room) and room['hotel_id'] not in occupancy:
+            occupancy[room['hotel_id']] = hotel_occupancy(conn, room['hotel_id'], today, days)
+        hotel_occupancy_days = occupancy.get(room['hotel_id'])
+
+        current = existing.get(room['id'])
+        if (current and _date(current['start_date']) == today and current['base_price'] == room['price_per_night']
+                and len(current['rates']) == days * array(_TYPECODE).itemsize):
+            first, last = ranges[room['id']]
+            rates = array(_TYPECODE, current['rates'])
+            rates[first:last] = nightly_rates(
+                room, today + timedelta(days=first), last - first, rules,
+                hotel_occupancy_days[first:last] if hotel_occupancy_days else None
+            )
+        else:
+            rates = nightly_rates(room, today, days, rules, hotel_occupancy_days)
+
+        blob = rates.tobytes()
+        if not current or blob != current['rates'] or _date(current['start_date']) != today:
+            writes.append((room['id'], today.isoformat(), room['price_per_night'], blob))
+
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        conn.executemany('''
+            INSERT INTO rate_calendar (room_id, start_date, base_price, rates, computed_at)
+            VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT(room_id) DO UPDATE SET
+                start_date = excluded.start_date, base_price = excluded.base_price,
+                rates = excluded.rates, computed_at = excluded.computed_at
+        ''', writes)
+        if last_id is not None:
+            conn.execute('DELETE FROM rate_dirty WHERE id <= ?', (last_id,))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return len(writes)
+
+
+def init_pricing(conn):
+    """Create the rule, calendar and queue tables, then build every calendar"""
+    conn.executescript(SCHEMA)
+    refresh(conn, full=True)
+
+
+# Quotes
+
+def quote(conn, room, check_in, check_out, rules=None):
+    """Price of a stay: calendar nights plus the best length-of-stay rule.
+
+    room needs id, hotel_id, room_type and price_per_night. Nights beyond
+    the calendar, or a calendar built from an old base price, are priced
+    from the rules directly, so a quote is never wrong, only slower.
+    """
+    check_in, check_out = _date(check_in), _date(check_out)
+    nights = (check_out - check_in).days
+    rates = [None] * nights
+
+    calendar = conn.execute(
+        'SELECT start_date, base_price, rates FROM rate_calendar WHERE room_id = ?', (room['id'],)
+    ).fetchone()
+    if calendar and calendar['base_price'] == room['price_per_night']:
+        values = array(_TYPECODE, calendar['rates'])
+        offset = (check_in - _date(calendar['start_date'])).days
+        for night in range(max(0, -offset), min(nights, len(values) - offset)):
+            rates[night] = values[offset + night]
+
+    if rules is None:
+        rules = load_rules(conn)
+    missing = [night for night, rate in enumerate(rates) if rate is None]
+    if missing:
+        first, last = missing[0], missing[-1] + 1
+        start = check_in + timedelta(days=first)
+        occupancy = (hotel_occupancy(conn, room['hotel_id'], start, last - first)
+                     if _needs_occupancy(rules, room) else None)
+        computed = nightly_rates(room, start, last - first, rules, occupancy)
+        for night in missing:
+            rates[night] = computed[night - first]
+
+    subtotal = sum(rates) / 100
+    stay_rules = [
+        rule for rule in rules
+        if rule.kind == 'length_of_stay' and rule.covers(room)
+        and rule.in_range(check_in) and nights >= rule.min_nights
+    ]
+    best = max(stay_rules, key=lambda rule: (rule.min_nights, rule.priority), default=None)
+    total = best.adjust(subtotal, nights) if best else subtotal
+
+    return {
+        'nights': nights,
+        'nightly_rates': [rate / 100 for rate in rates],
+        'subtotal': round(subtotal, 2),
+        'length_of_stay_rule': best.id if best else None,
+        'total': round(max(total, 0), 2),
+    }
+
+
+def stay_rate(rates, calendar_start, base_price, check_in, check_out):
+    """SQL function: average nightly rate of a stay from a calendar blob.
+
+    Nights outside the calendar fall back to the base price.
+    """
+    check_in, check_out = _date(check_in), _date(check_out)
+    nights = (check_out - check_in).days
+    if nights <= 0 or rates is None:
+        return base_price
+    values = memoryview(rates).cast(_TYPECODE)
+    offset = (check_in - _date(calendar_start)).days
+    total = 0.0
+    for index in range(offset, offset + nights):
+        total += values[index] / 100 if 0 <= index < len(values) else base_price
+    return round(total / nights, 2)
+
+
+def rate_sql(room_alias='r', calendar_alias='rc'):
+    """Expression for a room's average nightly rate; expects check_in, check_out params.
+
+    The query must LEFT JOIN rate_calendar as calendar_alias.
+    """
+    return (f'stay_rate({calendar_alias}.rates, {calendar_alias}.start_date, '
+            f'{room_alias}.price_per_night, ?, ?)')
+
+
+def register_functions(conn):
+    """Add the pricing SQL functions to a connection"""
+    conn.create_function('stay_rate', 5, stay_rate, deterministic=True)
+
+
+# Rule management
+
+def _validate(data):
+    kind = data.get('kind')
+    if kind not in RULE_KINDS:
+        raise ValueError(f'kind must be one of {RULE_KINDS}')
+    adjustment_type = data.get('adjustment_type', 'percent')
+    if adjustment_type not in ADJUSTMENT_TYPES:
+        raise ValueError(f'adjustment_type must be one of {ADJUSTMENT_TYPES}')
+    try:
+        adjustment = float(data['adjustment'])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError('adjustment must be a number')
+
+    start, end = _date(data.get('start_date') or None), _date(data.get('end_date') or None)
+    if kind == 'season' and not (start and end):
+        raise ValueError('season rules need start_date and end_date')
+    if start and end and start >= end:
+        raise ValueError('end_date must be after start_date')
+
+    weekdays = data.get('weekdays')
+    if isinstance(weekdays, (list, tuple)):
+        weekdays = ','.join(str(day) for day in weekdays)
+    if kind == 'weekday':
+        days = [day.strip() for day in str(weekdays or '').split(',') if day.strip()]
+        if not days or any(not day.isdigit() or int(day) > 6 for day in days):
+            raise ValueError('weekday rules need weekdays as 0-6 (Monday is 0)')
+        weekdays = ','.join(days)
+
+    min_occupancy = data.get('min_occupancy')
+    if kind == 'occupancy' and not (min_occupancy and 0 < float(min_occupancy) <= 1):
+        raise ValueError('occupancy rules need min_occupancy between 0 and 1')
+    min_nights = data.get('min_nights')
+    if kind == 'length_of_stay' and not (min_nights and int(min_nights) >= 1):
+        raise ValueError('length_of_stay rules need min_nights')
+
+    return (data.get('name') or kind, kind, data.get('hotel_id'), data.get('room_type') or None,
+            start and start.isoformat(), end and end.isoformat(), weekdays,
+            min_occupancy, min_nights, adjustment_type, adjustment, int(data.get('priority', 0)))
+
+
+def add_rule(conn, data):
+    """Validate and store a rule; raises ValueError on bad input. Returns its id"""
+    cursor = conn.execute('''
+        INSERT INTO rate_rules
+        (name, kind, hotel_id, room_type, start_date, end_date, weekdays,
+         min_occupancy, min_nights, adjustment_type, adjustment, priority)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', _validate(data))
+    conn.commit()
+    return cursor.lastrowid
+
+
+def delete_rule(conn, rule_id):
+    """Remove a rule; returns whether it existed"""
+    deleted = conn.execute('DELETE FROM rate_rules WHERE id = ?', (rule_id,)).rowcount
+    conn.commit()
+    return bool(deleted)
+
+
+def list_rules(conn):
+    return [dict(row) for row in conn.execute('SELECT * FROM rate_rules ORDER BY priority, id')]
+
+
+def calendar_stats(conn):
+    """Calendar coverage and the size of the recompute queue"""
+    row = conn.execute('''
+        SELECT COUNT(*), MIN(start_date), MAX(computed_at), COALESCE(SUM(length(rates)), 0)
+        FROM rate_calendar
+    ''').fetchone()
+    return {
+        'rooms': row[0],
+        'oldest_start_date': row[1],
+        'last_computed_at': row[2],
+        'bytes': row[3],
+        'queued_changes': conn.execute('SELECT COUNT(*) FROM rate_dirty').fetchone()[0],
+    }
+
+
+def merge_calendar_stats(parts):
+    """Totals of calendar_stats() taken on every shard"""
+    starts = [part['oldest_start_date'] for part in parts if part['oldest_start_date']]
+    computed = [part['last_computed_at'] for part in parts if part['last_computed_at']]
+    return {
+        'rooms': sum(part['rooms'] for part in parts),
+        'oldest_start_date': min(starts, default=None),
+        'last_computed_at': max(computed, default=None),
+        'bytes': sum(part['bytes'] for part in parts),
+        'queued_changes': sum(part['queued_changes'] for part in parts),
+    }
@@ -0,0 +1,257 @@
+"""
+Query Profiling
+Records every SQL statement a request issues, with a slow-query log and per-route stats
+"""
+
+import logging
+import re
+import sqlite3
+import threading
+import time
+from contextvars import ContextVar
+from logging.handlers import RotatingFileHandler
+
+from flask import current_app, g, request
+
+_current = ContextVar('query_profile', default=None)
+
+slow_query_logger = logging.getLogger('smartstay.slow_queries')
+
+# Statements EXPLAIN QUERY PLAN can describe
+_EXPLAINABLE = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH', 'REPLACE')
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LISTS = re.compile(r'IN\s*\((?:\s*\?\s*,)*\s*\?\s*\)', re.IGNORECASE)
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize(sql):
+    """Statement text with literals replaced and whitespace collapsed"""
+    text = _LITERALS.sub('?', sql)
+    text = _IN_LISTS.sub('IN (...)', text)
+    return _WHITESPACE.sub(' ', text).strip()
+
+
+class QueryRecord:
+    """One executed statement"""
+
+    __slots__ = ('sql', 'params', 'param_count', 'duration', 'rows', 'conn')
+
+    def __init__(self, sql, params, conn):
+        self.sql = sql
+        self.params = params
+        self.param_count = len(params) if params else 0
+        self.duration = 0.0
+        self.rows = 0
+        self.conn = conn
+
+    def to_dict(self):
+        return {
+            'sql': normalize(self.sql),
+            'params': self.param_count,
+            'ms': round(self.duration * 1000, 3),
+            'rows': self.rows,
+        }
+
+
+class QueryProfile:
+    """All statements issued while handling one request"""
+
+    def __init__(self):
+        self.records = []
+
+    @property
+    def count(self):
+        return len(self.records)
+
+    @property
+    def total_time(self):
+        return sum(record.duration for record in self.records)
+
+
+class ProfilingCursor(sqlite3.Cursor):
+    """Cursor that times execution and fetching, and counts rows returned"""
+
+    _record = None
+
+    def _start(self, sql, params):
+        profile = _current.get()
+        self._record = QueryRecord(sql, params, self.connection) if profile else None
+        if profile:
+            profile.records.append(self._record)
+
+    def _timed(self, method, *args):
+        record = self._record
+        if record is None:
+            return method(*args)
+        started = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            record.duration += time.perf_counter() - started
+
+    def execute(self, sql, params=()):
+        self._start(sql, params)
+        return self._timed(super().execute, sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        self._start(sql, None)
+        return self._timed(super().executemany, sql, seq_of_params)
+
+    def fetchone(self):
+        row = self._timed(super().fetchone)
+        if row is not None and self._record:
+            self._record.rows += 1
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self._timed(super().fetchmany, size or self.arraysize)
+        if self._record:
+            self._record.rows += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._timed(super().fetchall)
+        if self._record:
+            self._record.rows += len(rows)
+        return rows
+
+    def __next__(self):
+        row = self._timed(super().__next__)
+        if self._record:
+            self._record.rows += 1
+        return row
+
+
+class ProfilingConnection(sqlite3.Connection):
+    """Connection whose cursors (including conn.execute) are ProfilingCursors"""
+
+    def cursor(self, factory=ProfilingCursor):
+        return super().cursor(factory)
+
+    # The C shortcuts create plain cursors, so route them through cursor()
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        return self.cursor().executemany(sql, seq_of_params)
+
+
+class RouteStats:
+    """Per-route query aggregates for this worker process"""
+
+    def __init__(self, top_n=10):
+        self.top_n = top_n
+        self._lock = threading.Lock()
+        self._routes = {}
+
+    def add(self, route, profile):
+        with self._lock:
+            stats = self._routes.setdefault(route, {
+                'requests': 0, 'queries': 0, 'db_time': 0.0, 'max_queries': 0, 'statements': {},
+            })
+            stats['requests'] += 1
+            stats['queries'] += profile.count
+            stats['db_time'] += profile.total_time
+            stats['max_queries'] = max(stats['max_queries'], profile.count)
+            for record in profile.records:
+                key = normalize(record.sql)
+                statement = stats['statements'].setdefault(key, {'calls': 0, 'time': 0.0, 'rows': 0})
+                statement['calls'] += 1
+                statement['time'] += record.duration
+                statement['rows'] += record.rows
+
+    def snapshot(self):
+        with self._lock:
+            report = {}
+            for route, stats in self._routes.items():
+                requests = stats['requests']
+                top = sorted(stats['statements'].items(), key=lambda item: item[1]['time'], reverse=True)
+                report[route] = {
+                    'requests': requests,
+                    'avg_queries': round(stats['queries'] / requests, 2),
+                    'max_queries': stats['max_queries'],
+                    'avg_db_ms': round(stats['db_time'] * 1000 / requests, 3),
+                    'top_statements': [
+                        {'sql': sql, 'calls': s['calls'], 'total_ms': round(s['time'] * 1000, 3),
+                         'avg_rows': round(s['rows'] / s['calls'], 1)}
+                        for sql, s in top[:self.top_n]
+                    ],
+                }
+            return report
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+
+
+def explain(record):
+    """EXPLAIN QUERY PLAN lines for a recorded statement, if it can be explained"""
+    if record.params is None or not record.sql.lstrip().upper().startswith(_EXPLAINABLE):
+        return []
+    try:
+        # A plain cursor, so the EXPLAIN itself is not recorded
+        rows = record.conn.cursor(sqlite3.Cursor).execute('EXPLAIN QUERY PLAN ' + record.sql, record.params)
+        return [row[3] for row in rows]
+    except sqlite3.Error as e:
+        return [f'(explain failed: {e})']
+
+
+def configure_slow_log(path, max_bytes=5 * 1024 * 1024, backup_count=5):
+    """Send slow queries to a size-rotated log file"""
+    if any(getattr(h, 'baseFilename', None) for h in slow_query_logger.handlers):
+        return
+    handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count)
+    handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+    slow_query_logger.addHandler(handler)
+    slow_query_logger.setLevel(logging.WARNING)
+    slow_query_logger.propagate = False
+
+
+def _start_profile():
+    g.query_profile = QueryProfile()
+    g.query_profile_token = _current.set(g.query_profile)
+
+
+def _finish_profile(response):
+    profile = g.get('query_profile')
+    if profile is None:
+        return response
+
+    config = current_app.config
+    route = request.url_rule.rule if request.url_rule else '<unmatched>'
+    current_app.extensions['query_stats'].add(f'{request.method} {route}', profile)
+
+    threshold = config['SLOW_QUERY_MS'] / 1000.0
+    for record in profile.records:
+        if record.duration >= threshold:
+            slow_query_logger.warning(
+                '%.1fms %s %s rows=%d params=%d | %s | plan: %s',
+                record.duration * 1000, request.method, route, record.rows, record.param_count,
+                normalize(record.sql), '; '.join(explain(record)) or '-'
+            )
+
+    if config['DB_QUERY_HEADERS']:
+        response.headers['X-DB-Queries'] = str(profile.count)
+        response.headers['X-DB-Time'] = f'{profile.total_time * 1000:.3f}ms'
+    return response
+
+
+def _reset_profile(error=None):
+    token = g.pop('query_profile_token', None)
+    if token is not None:
+        _current.reset(token)
+
+
+def init_app(app):
+    """Profile every request's SQL on connections created with ProfilingConnection"""
+    app.config.setdefault('SLOW_QUERY_MS', 100.0)
+    app.config.setdefault('DB_QUERY_HEADERS', app.debug)
+    app.extensions['query_stats'] = RouteStats()
+
+    if app.config.get('SLOW_QUERY_LOG'):
+        configure_slow_log(app.config['SLOW_QUERY_LOG'])
+
+    app.before_request(_start_profile)
+    app.after_request(_finish_profile)
+    app.teardown_request(_reset_profile)
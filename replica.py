@@ -0,0 +1,225 @@
+"""
+Report Replica
+Snapshot copy of the database for read-only reports, refreshed with the SQLite online backup API
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+from flask import current_app, g, request
+
+from database import DEFAULT_PRAGMAS, connect, get_db
+from versions import BOOKINGS, CATALOG, global_versions
+
+# Written into each snapshot so every worker reads the same snapshot time
+META_SCHEMA = '''
+    DROP TABLE IF EXISTS replica_meta;
+    CREATE TABLE replica_meta (
+        snapshot_at REAL NOT NULL,
+        bookings_version INTEGER,
+        catalog_version INTEGER
+    );
+'''
+
+
+def parse_staleness(text):
+    """{endpoint: seconds} from 'admin_dashboard=120,export_bookings=900'"""
+    bounds = {}
+    for part in (text or '').split(','):
+        if '=' in part:
+            endpoint, seconds = part.split('=', 1)
+            bounds[endpoint.strip()] = float(seconds)
+    return bounds
+
+
+class Replica:
+    """Snapshot of the primary database file for report queries.
+
+    refresh() copies the primary into a temporary file with the backup API
+    and renames it over the snapshot, so readers only ever open a complete
+    copy. Idle read-only connections are pooled per snapshot file and
+    closed once a newer snapshot replaces it.
+    """
+
+    def __init__(self, primary, path, max_size=4, pragmas=None, factory=sqlite3.Connection,
+                 on_connect=None):
+        self.primary = primary
+        self.path = path
+        self.max_size = max_size
+        self.pragmas = dict(DEFAULT_PRAGMAS, **(pragmas or {}))
+        self.pragmas.pop('synchronous', None)
+        self.pragmas['query_only'] = 1
+        self.factory = factory
+        self.on_connect = on_connect
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self.last_refresh_seconds = None
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._idle = []
+        self._meta = (None, None)
+
+    def _check_fork(self):
+        if self._pid != os.getpid():
+            self._reset()
+
+    def _snapshot_id(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_ino, stat.st_mtime_ns)
+
+    def refresh(self, pages=-1):
+        """Copy the primary into a new snapshot; returns seconds taken.
+
+        With WAL the backup reads one consistent snapshot of the primary
+        without blocking its writers.
+        """
+        with self._refresh_lock:
+            started = time.time()
+            temporary = f'{self.path}.{os.getpid()}.tmp'
+            source = sqlite3.connect(self.primary)
+            target = sqlite3.connect(temporary)
+            try:
+                source.backup(target, pages=pages)
+                target.execute('PRAGMA journal_mode = DELETE')
+                versions = global_versions(target, BOOKINGS, CATALOG)
+                target.executescript(META_SCHEMA)
+                target.execute('INSERT INTO replica_meta VALUES (?, ?, ?)',
+                               (started, versions.get(BOOKINGS), versions.get(CATALOG)))
+                target.commit()
+            finally:
+                target.close()
+                source.close()
+            os.replace(temporary, self.path)
+            self.last_refresh_seconds = round(time.time() - started, 3)
+            return self.last_refresh_seconds
+
+    def acquire(self):
+        """Read-only connection to the current snapshot, or None when there is none"""
+        snapshot = self._snapshot_id()
+        if snapshot is None:
+            return None
+        with self._lock:
+            self._check_fork()
+            while self._idle:
+                conn_snapshot, conn = self._idle.pop()
+                if conn_snapshot == snapshot:
+                    return conn
+                conn.close()
+        return connect(self.path, self.pragmas, self.factory, self.on_connect, readonly=True)
+
+    def release(self, conn):
+        """Return a connection to the pool if its snapshot is still current"""
+        snapshot = self._snapshot_id()
+        with self._lock:
+            self._check_fork()
+            if snapshot is not None and len(self._idle) < self.max_size:
+                self._idle.append((snapshot, conn))
+                return
+        conn.close()
+
+    def meta(self):
+        """Snapshot time and change versions of the current snapshot, or None"""
+        snapshot = self._snapshot_id()
+        if snapshot is None:
+            return None
+        cached_snapshot, meta = self._meta
+        if cached_snapshot == snapshot:
+            return meta
+        conn = self.acquire()
+        try:
+            row = conn.execute('SELECT * FROM replica_meta').fetchone()
+        except sqlite3.Error:
+            row = None
+        finally:
+            self.release(conn)
+        meta = dict(row) if row else None
+        self._meta = (snapshot, meta)
+        return meta
+
+    def age(self):
+        """Seconds since the current snapshot was taken, or None"""
+        meta = self.meta()
+        return time.time() - meta['snapshot_at'] if meta else None
+
+    def status(self, primary_conn=None):
+        """Snapshot age and, given a primary connection, the changes it is behind by"""
+        meta = self.meta()
+        if not meta:
+            return {'path': self.path, 'available': False}
+        status = {
+            'path': self.path,
+            'available': True,
+            'snapshot_at': datetime.fromtimestamp(meta['snapshot_at'], timezone.utc).isoformat(),
+            'age_seconds': round(time.time() - meta['snapshot_at'], 1),
+            'size_bytes': os.path.getsize(self.path),
+            'last_refresh_seconds': self.last_refresh_seconds,
+        }
+        if primary_conn is not None:
+            versions = global_versions(primary_conn, BOOKINGS, CATALOG)
+            status['bookings_behind'] = versions.get(BOOKINGS, 0) - (meta['bookings_version'] or 0)
+            status['catalog_behind'] = versions.get(CATALOG, 0) - (meta['catalog_version'] or 0)
+            # An old snapshot nothing has changed since is not stale at all
+            current = not status['bookings_behind'] and not status['catalog_behind']
+            status['lag_seconds'] = 0.0 if current else status['age_seconds']
+        return status
+
+
+def run_refresher(replica, interval=60.0, once=False, log=print):
+    """Refresh the snapshot every interval seconds until stopped"""
+    while True:
+        seconds = replica.refresh()
+        log(f'replica: refreshed {replica.path} in {seconds:.2f}s')
+        if once:
+            return
+        time.sleep(max(0.0, interval - seconds))
+
+
+def get_report_db():
+    """Connection for a read-only report query.
+
+    Uses the snapshot when it is no older than the route's bound in
+    REPLICA_MAX_STALENESS, otherwise the primary.
+    """
+    replica = current_app.extensions.get('replica')
+    max_staleness = current_app.config['REPLICA_MAX_STALENESS'].get(request.endpoint, 0)
+    if replica is None or max_staleness <= 0:
+        return get_db()
+
+    if 'report_db' not in g:
+        g.report_db = None
+        age = replica.age()
+        if age is not None and age <= max_staleness:
+            g.report_db = replica.acquire()
+            g.replica_age = age
+    return g.report_db or get_db()
+
+
+def _add_age_header(response):
+    age = g.get('replica_age')
+    if age is not None:
+        response.headers['X-Replica-Age'] = f'{age:.1f}'
+    return response
+
+
+def _release_report_db(error=None):
+    conn = g.pop('report_db', None)
+    if conn is not None:
+        current_app.extensions['replica'].release(conn)
+
+
+def init_app(app, replica):
+    """Route report queries to replica (None keeps them on the primary)"""
+    app.config.setdefault('REPLICA_MAX_STALENESS', {})
+    if replica is None:
+        return
+    app.extensions['replica'] = replica
+    app.after_request(_add_age_header)
+    app.teardown_appcontext(_release_report_db)
@@ -0,0 +1,239 @@
+"""
+Data Access
+Catalog, user and booking queries behind plain functions, in portable SQL
+"""
+
+import sqlite3
+
+from availability import available_room_ids, availability_map, existing_room_ids, free_room_clause
+from outbox import BOOKING_CANCELLED, enqueue
+from reviews import HOTEL, ROOM, review_page, summary as review_summary
+from stats import get_stats, reconcile as reconcile_stats
+
+# Statements here stick to SQL every server database accepts: '?' parameters,
+# single-quoted string literals and no SQLite-only functions. Routes call
+# these instead of writing SQL, so a second storage engine only has to
+# provide this module (the derived tables kept by triggers stay SQLite's).
+# Availability and dashboard counters are reached through here as well;
+# their set-based queries live in availability.py and stats.py.
+
+
+class DuplicateEmailError(Exception):
+    """The email address is already registered"""
+
+
+# Users
+
+def create_user(conn, name, email, password_hash, phone='', role='guest'):
+    """Insert a user; raises DuplicateEmailError when the email is taken"""
+    try:
+        cursor = conn.execute(
+            'INSERT INTO users (name, email, password, phone, role) VALUES (?, ?, ?, ?, ?)',
+            (name, email, password_hash, phone, role)
+        )
+        conn.commit()
+    except sqlite3.IntegrityError as e:
+        conn.rollback()
+        raise DuplicateEmailError(email) from e
+    return cursor.lastrowid
+
+
+def user_by_email(conn, email):
+    return conn.execute('SELECT * FROM users WHERE email = ?', (email,)).fetchone()
+
+
+def user_by_id(conn, user_id):
+    return conn.execute('SELECT * FROM users WHERE id = ?', (user_id,)).fetchone()
+
+
+def booking_count(conn, user_id):
+    """Bookings the user has made, in any status (checkout holds are not bookings)"""
+    return conn.execute(
+        'SELECT COUNT(*) FROM bookings WHERE user_id = ? AND hold_expires_at IS NULL', (user_id,)
+    ).fetchone()[0]
+
+
+# Catalog
+
+def featured_rooms(conn, limit=6):
+    return [dict(room) for room in conn.execute('''
+        SELECT r.*, h.name as hotel_name, h.city, h.rating
+        FROM rooms r
+        JOIN hotels h ON r.hotel_id = h.id
+        WHERE r.status = 'available'
+        LIMIT ?
+    ''', (limit,))]
+
+
+def hotel_page(conn, hotel_id, reviews=10):
+    """{hotel, rooms, reviews, review_summary, reviews_cursor} for the hotel detail page, or None"""
+    hotel = conn.execute('SELECT * FROM hotels WHERE id = ?', (hotel_id,)).fetchone()
+    if not hotel:
+        return None
+
+    rooms = conn.execute(
+        "SELECT * FROM rooms WHERE hotel_id = ? AND status = 'available'", (hotel_id,)
+    ).fetchall()
+    recent, cursor = review_page(conn, HOTEL, hotel_id, limit=reviews)
+    return {'hotel': dict(hotel), 'rooms': [dict(room) for room in rooms], 'reviews': recent,
+            'review_summary': review_summary(conn, HOTEL, hotel_id), 'reviews_cursor': cursor}
+
+
+def room_page(conn, room_id, reviews=10):
+    """{room, reviews, review_summary, reviews_cursor} for the room detail page, or None"""
+    room = conn.execute('''
+        SELECT r.*, h.name as hotel_name, h.city, h.rating, h.id as hotel_id
+        FROM rooms r
+        JOIN hotels h ON r.hotel_id = h.id
+        WHERE r.id = ?
+    ''', (room_id,)).fetchone()
+    if not room:
+        return None
+
+    recent, cursor = review_page(conn, ROOM, room_id, limit=reviews)
+    return {'room': dict(room), 'reviews': recent,
+            'review_summary': review_summary(conn, ROOM, room_id), 'reviews_cursor': cursor}
+
+
+def room_with_hotel(conn, room_id):
+    """Room plus its hotel's name and city, or None"""
+    return conn.execute('''
+        SELECT r.*, h.name as hotel_name, h.city
+        FROM rooms r
+        JOIN hotels h ON r.hotel_id = h.id
+        WHERE r.id = ?
+    ''', (room_id,)).fetchone()
+
+
+def list_hotels(conn):
+    return conn.execute('SELECT * FROM hotels').fetchall()
+
+
+def hotel_names(conn):
+    """(id, name) of every hotel, by name, for filter menus"""
+    return conn.execute('SELECT id, name FROM hotels ORDER BY name').fetchall()
+
+
+def list_rooms(conn):
+    return conn.execute('''
+        SELECT r.*, h.name as hotel_name
+        FROM rooms r
+        JOIN hotels h ON r.hotel_id = h.id
+    ''').fetchall()
+
+
+def room_rate(conn, room_id):
+    """Room id, hotel, type and nightly rate for pricing a stay, or None"""
+    return conn.execute(
+        'SELECT id, hotel_id, room_type, price_per_night FROM rooms WHERE id = ?', (room_id,)
+    ).fetchone()
+
+
+def add_hotel(conn, data):
+    """Insert a hotel from form data; returns its id"""
+    cursor = conn.execute('''
+        INSERT INTO hotels (name, description, city, address, phone, email, rating)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', (data['name'], data.get('description', ''), data['city'], data['address'],
+          data.get('phone', ''), data.get('email', ''), data.get('rating', 4.5)))
+    conn.commit()
+    return cursor.lastrowid
+
+
+def add_room(conn, data, room_id=None):
+    """Insert an available room from form data; returns its id (room_id when given)"""
+    columns = ['hotel_id', 'room_number', 'room_type', 'capacity', 'price_per_night', 'description', 'amenities']
+    values = [data['hotel_id'], data['room_number'], data['room_type'], data['capacity'],
+              data['price_per_night'], data.get('description', ''), data.get('amenities', '')]
+    if room_id is not None:
+        columns.insert(0, 'id')
+        values.insert(0, room_id)
+    cursor = conn.execute(f'''
+        INSERT INTO rooms ({', '.join(columns)}, status)
+        VALUES ({', '.join('?' for _ in values)}, 'available')
+    ''', values)
+    conn.commit()
+    return cursor.lastrowid
+
+
+# Availability
+
+def free_rooms(conn, room_ids, check_in, check_out, exclude_booking_id=None):
+    """room_ids free for the whole stay, in order"""
+    return available_room_ids(conn, room_ids, check_in, check_out, exclude_booking_id)
+
+
+def room_availability(conn, room_ids, check_in, check_out):
+    """{room_id: free for the stay} for every requested room (False for unknown rooms)"""
+    return availability_map(conn, room_ids, check_in, check_out)
+
+
+def known_rooms(conn, room_ids):
+    """The room_ids that exist"""
+    return existing_room_ids(conn, room_ids)
+
+
+def free_hotel_rooms(conn, hotel_id, check_in, check_out):
+    """Ids of the hotel's rooms with no booking overlapping the stay"""
+    return [row[0] for row in conn.execute(
+        'SELECT r.id FROM rooms r WHERE r.hotel_id = ? AND ' + free_room_clause('r'),
+        (hotel_id, check_out, check_in)
+    )]
+
+
+# Bookings
+
+def user_booking(conn, booking_id, user_id):
+    """A user's booking, or None (checkout holds are released, not cancelled)"""
+    return conn.execute(
+        'SELECT * FROM bookings WHERE booking_id = ? AND user_id = ? AND hold_expires_at IS NULL',
+        (booking_id, user_id)
+    ).fetchone()
+
+
+def cancel_booking(conn, booking_id):
+    """Mark a booking cancelled and queue its email in the same transaction; False for a hold"""
+    try:
+        cancelled = conn.execute(
+            "UPDATE bookings SET status = 'cancelled', updated_at = CURRENT_TIMESTAMP "
+            'WHERE booking_id = ? AND hold_expires_at IS NULL',
+            (booking_id,)
+        ).rowcount
+        if cancelled:
+            enqueue(conn, BOOKING_CANCELLED, {'booking_id': booking_id, 'status': 'cancelled'})
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return bool(cancelled)
+
+
+def recent_bookings(conn, limit=10):
+    """Newest bookings with room, hotel and guest names"""
+    return conn.execute('''
+        SELECT b.*, r.room_number, h.name as hotel_name, u.name as user_name
+        FROM bookings b
+        JOIN rooms r ON b.room_id = r.id
+        JOIN hotels h ON b.hotel_id = h.id
+        JOIN users u ON b.user_id = u.id
+        WHERE b.hold_expires_at IS NULL
+        ORDER BY b.created_at DESC
+        LIMIT ?
+    ''', (limit,)).fetchall()
+
+
+# Dashboard
+
+def dashboard_stats(conn, reconcile_interval=3600):
+    """Dashboard totals from the trigger-kept counters (see stats.py)"""
+    return get_stats(conn, reconcile_interval)
+
+
+def reconcile_dashboard(conn):
+    """Recompute the dashboard counters from the source tables"""
+    return reconcile_stats(conn)
+
+
+def ping(conn):
+    """Round trip to the database; raises when it is unreachable"""
+    conn.execute('SELECT 1').fetchone()
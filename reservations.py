@@ -0,0 +1,406 @@
+"""
+Reservation Commit Path
+Atomic check-and-insert of bookings and short-lived holds under a single SQLite write transaction
+"""
+
+import json
+import random
+import sqlite3
+import time
+
+from availability import booked_room_ids, occupying_clause
+from inventory import allocate_room, remaining
+from outbox import BOOKING_CONFIRMED, enqueue
+from pricing import load_rules, quote
+
+# Bounded retry when another writer holds the database lock past busy_timeout
+MAX_RETRIES = 5
+BACKOFF_BASE = 0.02   # seconds, doubled on every retry
+BACKOFF_MAX = 0.5
+
+
+class ReservationError(Exception):
+    """Base class for reservation failures"""
+
+
+class RoomNotFoundError(ReservationError):
+    """The requested room does not exist"""
+
+
+class RoomUnavailableError(ReservationError):
+    """The room already has an overlapping booking"""
+
+
+class ReservationBusyError(ReservationError):
+    """The database stayed locked through every retry"""
+
+
+class HoldExpiredError(ReservationError):
+    """The hold being confirmed no longer exists or has expired"""
+
+
+class BatchUnavailableError(RoomUnavailableError):
+    """Some items of a batch could not be booked, so none were"""
+
+    def __init__(self, failures):
+        super().__init__(f'{len(failures)} of the requested stays could not be booked')
+        self.failures = failures
+
+
+def _is_busy(error):
+    message = str(error).lower()
+    return 'locked' in message or 'busy' in message
+
+
+def _backoff(attempt):
+    delay = min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt))
+    time.sleep(delay * random.uniform(0.5, 1.0))
+
+
+def hold_expiry(seconds):
+    """UTC expiry timestamp in SQLite's CURRENT_TIMESTAMP format"""
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(time.time() + seconds))
+
+
+def _write(conn, work, max_retries=MAX_RETRIES):
+    """Run work(conn) in a BEGIN IMMEDIATE transaction, retrying while the database is busy"""
+    for attempt in range(max_retries + 1):
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                result = work(conn)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            return result
+        except sqlite3.OperationalError as e:
+            if not _is_busy(e):
+                raise
+            if attempt == max_retries:
+                raise ReservationBusyError('Booking system is busy, please retry') from e
+            _backoff(attempt)
+
+
+def reserve_room(conn, booking_id, user_id, room_id, check_in, check_out,
+                 guests=1, special_requests='', status='confirmed',
+                 max_retries=MAX_RETRIES, hold_seconds=None, allocate=False):
+    """Book a room atomically.
+
+    The overlap check and the INSERT run inside one BEGIN IMMEDIATE
+    transaction, so two concurrent requests can never both see the room
+    as free. The booking.confirmed outbox event commits with the booking.
+    The total comes from the room's precomputed rate calendar.
+
+    With hold_seconds, the row is a pending hold that stops blocking the
+    room once it expires; it replaces the user's earlier holds on the
+    room (or room type, when allocating) and sends no event until
+    confirm_hold().
+
+    With allocate, room_id names a hotel and room type: the type's
+    counted inventory is checked, then the allocator picks the concrete
+    room that leaves the fewest unsellable gaps among those that sleep
+    guests and cost no more per night than room_id (or the type's
+    cheapest free room, once room_id and every room at its rate are
+    taken). The total never exceeds the quote for room_id.
+    Returns a dict with booking_id, hotel_id, room_id, total_price,
+    hold_expires_at and replaced_holds.
+    """
+    def work(conn):
+        room = conn.execute(
+            'SELECT id, hotel_id, room_type, price_per_night FROM rooms WHERE id = ?', (room_id,)
+        ).fetchone()
+        if not room:
+            raise RoomNotFoundError(f'Room {room_id} not found')
+
+        replaced = []
+        if hold_seconds:
+            if allocate:
+                scope = 'room_id IN (SELECT id FROM rooms WHERE hotel_id = ? AND room_type = ?)'
+                scope_params = (room['hotel_id'], room['room_type'])
+            else:
+                scope, scope_params = 'room_id = ?', (room_id,)
+            replaced = [row[0] for row in conn.execute(
+                "SELECT booking_id FROM bookings WHERE user_id = ? AND status = 'pending' "
+                f'AND hold_expires_at IS NOT NULL AND {scope}', (user_id, *scope_params)
+            )]
+            conn.executemany(_RELEASE_HOLD, [(b,) for b in replaced])
+        requested = room
+        if allocate:
+            _sweep_type_holds(conn, room['hotel_id'], room['room_type'])
+            room = _allocate(conn, room['hotel_id'], room['room_type'], check_in, check_out,
+                             guests, room['price_per_night'])
+            if room is None:
+                raise RoomUnavailableError('No rooms of this type available for selected dates')
+        elif booked_room_ids(conn, [room_id], check_in, check_out):
+            raise RoomUnavailableError('Room not available for selected dates')
+
+        total_price = quote(conn, room, check_in, check_out)['total']
+        if room['id'] != requested['id']:
+            # The guest was quoted for the room they picked
+            total_price = min(total_price, quote(conn, requested, check_in, check_out)['total'])
+        expires_at = hold_expiry(hold_seconds) if hold_seconds else None
+        conn.execute('''
+            INSERT INTO bookings
+            (booking_id, user_id, room_id, hotel_id, check_in_date, check_out_date,
+             number_of_guests, total_price, status, special_requests, hold_expires_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (booking_id, user_id, room['id'], room['hotel_id'], check_in, check_out,
+              guests, total_price, 'pending' if hold_seconds else status, special_requests, expires_at))
+        if not hold_seconds:
+            # Side effects (confirmation mail) are delivered later by the outbox worker
+            enqueue(conn, BOOKING_CONFIRMED, {'booking_id': booking_id, 'status': status})
+        return {
+            'booking_id': booking_id,
+            'hotel_id': room['hotel_id'],
+            'room_id': room['id'],
+            'total_price': total_price,
+            'hold_expires_at': expires_at,
+            'replaced_holds': replaced,
+        }
+
+    return _write(conn, work, max_retries)
+
+
+def _sweep_type_holds(conn, hotel_id, room_type):
+    # Expired holds still count towards the type's inventory until swept
+    conn.execute('''
+        DELETE FROM bookings
+        WHERE hold_expires_at <= CURRENT_TIMESTAMP AND status IN ('pending', 'cancelled')
+        AND room_id IN (SELECT id FROM rooms WHERE hotel_id = ? AND room_type = ?)
+    ''', (hotel_id, room_type))
+
+
+def _allocate(conn, hotel_id, room_type, check_in, check_out, guests=1, max_price=None):
+    """Room row picked by the allocator, or None when no room of the type fits"""
+    if remaining(conn, hotel_id, room_type, check_in, check_out) <= 0:
+        return None
+    chosen = allocate_room(conn, hotel_id, room_type, check_in, check_out, guests, max_price)
+    if chosen is None:
+        return None
+    return conn.execute(
+        'SELECT id, hotel_id, room_type, price_per_night FROM rooms WHERE id = ?', (chosen,)
+    ).fetchone()
+
+
+# Batches
+
+def _conflicting_items(conn, items):
+    """Indexes of exact-room items that overlap existing bookings or each other"""
+    requested = json.dumps([[index, item['room_id'], item['check_in'], item['check_out']]
+                            for index, item in items])
+    conflicts = {row[0] for row in conn.execute(f'''
+        WITH requested AS (
+            SELECT value ->> 0 AS idx, value ->> 1 AS room_id,
+                   value ->> 2 AS check_in, value ->> 3 AS check_out
+            FROM json_each(?)
+        )
+        SELECT q.idx FROM requested q
+        WHERE EXISTS (
+            SELECT 1 FROM bookings b
+            WHERE b.room_id = q.room_id AND {occupying_clause('b')}
+            AND b.check_in_date < q.check_out AND b.check_out_date > q.check_in
+        )
+    ''', (requested,))}
+
+    # Stays for the same room inside the batch, in arrival order
+    by_room = {}
+    for index, item in items:
+        by_room.setdefault(item['room_id'], []).append((item['check_in'], item['check_out'], index))
+    for stays in by_room.values():
+        stays.sort()
+        last_out = ''
+        for check_in, check_out, index in stays:
+            if check_in < last_out:
+                conflicts.add(index)
+            last_out = max(last_out, check_out)
+    return conflicts
+
+
+def reserve_batch(conn, booking_ids, user_id, items, allocate=False, max_retries=MAX_RETRIES):
+    """Book many stays all-or-nothing in one write transaction.
+
+    Each item has check_in, check_out, optional guests and
+    special_requests, and either room_id or hotel_id plus room_type. Items
+    naming a type, or any item when allocating, get a room from the
+    allocator; exact rooms are checked against existing bookings in one
+    set query. booking_ids supplies one unique ID per item.
+
+    Raises BatchUnavailableError listing every failed item, and books
+    nothing, when any item cannot be booked. Returns one dict per item
+    with index, booking_id, hotel_id, room_id, check_in, check_out and
+    total_price.
+    """
+    def work(conn):
+        room_ids = json.dumps(sorted({item['room_id'] for item in items if item.get('room_id')}))
+        rooms = {row['id']: row for row in conn.execute(
+            'SELECT id, hotel_id, room_type, price_per_night FROM rooms WHERE id IN (SELECT value FROM json_each(?))',
+            (room_ids,)
+        )}
+
+        failures, exact, typed = [], [], []
+        for index, item in enumerate(items):
+            if item.get('room_id'):
+                room = rooms.get(item['room_id'])
+                if room is None:
+                    failures.append({'index': index, 'message': f"Room {item['room_id']} not found"})
+                elif allocate:
+                    typed.append((index, dict(item, hotel_id=room['hotel_id'], room_type=room['room_type'],
+                                              requested=room)))
+                else:
+                    exact.append((index, item))
+            else:
+                typed.append((index, item))
+
+        conflicts = _conflicting_items(conn, exact) if exact else set()
+        failures.extend({'index': index, 'message': 'Room not available for selected dates'}
+                        for index in sorted(conflicts))
+        if failures:
+            raise BatchUnavailableError(sorted(failures, key=lambda failure: failure['index']))
+
+        rules = load_rules(conn)
+        booked = []
+
+        def book(index, item, room):
+            booking_id = booking_ids[index]
+            total_price = quote(conn, room, item['check_in'], item['check_out'], rules)['total']
+            requested = item.get('requested')
+            if requested and room['id'] != requested['id']:
+                # Capped at the quote for the room the item named, as in reserve_room()
+                total_price = min(total_price, quote(conn, requested, item['check_in'], item['check_out'],
+                                                     rules)['total'])
+            conn.execute('''
+                INSERT INTO bookings
+                (booking_id, user_id, room_id, hotel_id, check_in_date, check_out_date,
+                 number_of_guests, total_price, status, special_requests)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'confirmed', ?)
+            ''', (booking_id, user_id, room['id'], room['hotel_id'], item['check_in'], item['check_out'],
+                  item.get('guests', 1), total_price, item.get('special_requests', '')))
+            enqueue(conn, BOOKING_CONFIRMED, {'booking_id': booking_id, 'status': 'confirmed'})
+            booked.append({
+                'index': index,
+                'booking_id': booking_id,
+                'hotel_id': room['hotel_id'],
+                'room_id': room['id'],
+                'check_in': item['check_in'],
+                'check_out': item['check_out'],
+                'total_price': total_price,
+            })
+
+        for index, item in exact:
+            book(index, item, rooms[item['room_id']])
+
+        # Typed items are allocated one by one, each seeing the rooms taken before it
+        swept = set()
+        for index, item in typed:
+            room_type = (item['hotel_id'], item['room_type'])
+            if room_type not in swept:
+                _sweep_type_holds(conn, *room_type)
+                swept.add(room_type)
+            requested = item.get('requested')
+            room = _allocate(conn, *room_type, item['check_in'], item['check_out'],
+                             item.get('guests', 1), requested['price_per_night'] if requested else None)
+            if room is None:
+                failures.append({'index': index, 'message': 'No rooms of this type available for selected dates'})
+            else:
+                book(index, item, room)
+        if failures:
+            raise BatchUnavailableError(failures)
+
+        return sorted(booked, key=lambda booking: booking['index'])
+
+    return _write(conn, work, max_retries)
+
+
+# Holds
+
+HOLD_SCHEMA = '''
+    CREATE INDEX IF NOT EXISTS idx_bookings_hold_expiry
+    ON bookings(hold_expires_at) WHERE hold_expires_at IS NOT NULL;
+'''
+
+
+# Released holds are cancelled rather than deleted, so other workers'
+# occupancy indexes see the change when they sync by updated_at; the
+# sweeper deletes them once their expiry passes.
+_RELEASE_HOLD = '''
+    UPDATE bookings SET status = 'cancelled', updated_at = CURRENT_TIMESTAMP
+    WHERE booking_id = ? AND status = 'pending' AND hold_expires_at IS NOT NULL
+'''
+
+
+def init_holds(conn):
+    """Add bookings.hold_expires_at and the partial index the sweeper scans"""
+    columns = {row[1] for row in conn.execute('PRAGMA table_info(bookings)')}
+    if 'hold_expires_at' not in columns:
+        conn.execute('ALTER TABLE bookings ADD COLUMN hold_expires_at TIMESTAMP')
+    conn.commit()
+    conn.executescript(HOLD_SCHEMA)
+
+
+def confirm_hold(conn, booking_id, user_id, room_id, check_in, check_out,
+                 guests=1, special_requests='', max_retries=MAX_RETRIES):
+    """Turn a live hold into a confirmed booking at its held price.
+
+    room_id may be any room of the held room's hotel and type, since
+    allocated holds can land on a sibling room. Raises HoldExpiredError
+    when the hold is gone, past its expiry, for a different room type or
+    stay, or on a room too small for guests, in which case the caller may
+    try reserve_room() for the requested stay.
+    """
+    def work(conn):
+        hold = conn.execute('''
+            SELECT booking_id, hotel_id, room_id, total_price FROM bookings
+            WHERE booking_id = ? AND user_id = ?
+            AND room_id IN (SELECT id FROM rooms WHERE (hotel_id, room_type) =
+                            (SELECT hotel_id, room_type FROM rooms WHERE id = ?))
+            AND check_in_date = ? AND check_out_date = ?
+            AND status = 'pending' AND hold_expires_at > CURRENT_TIMESTAMP
+            AND (SELECT capacity FROM rooms WHERE id = bookings.room_id) >= ?
+        ''', (booking_id, user_id, room_id, check_in, check_out, int(guests or 1))).fetchone()
+        if not hold:
+            raise HoldExpiredError('Your hold on this room has expired')
+        conn.execute('''
+            UPDATE bookings SET status = 'confirmed', hold_expires_at = NULL,
+                number_of_guests = ?, special_requests = ?, updated_at = CURRENT_TIMESTAMP
+            WHERE booking_id = ?
+        ''', (guests, special_requests, booking_id))
+        enqueue(conn, BOOKING_CONFIRMED, {'booking_id': booking_id, 'status': 'confirmed'})
+        return {
+            'booking_id': booking_id,
+            'hotel_id': hold['hotel_id'],
+            'room_id': hold['room_id'],
+            'total_price': hold['total_price'],
+            'hold_expires_at': None,
+        }
+
+    return _write(conn, work, max_retries)
+
+
+def release_hold(conn, booking_id, user_id):
+    """Drop a user's hold before it expires; returns whether one existed"""
+    released = conn.execute(
+        _RELEASE_HOLD + ' AND user_id = ?', (booking_id, user_id)
+    ).rowcount
+    conn.commit()
+    return bool(released)
+
+
+def sweep_expired_holds(conn, batch_size=1000):
+    """Delete expired holds in short batches so bookings are never blocked for long.
+
+    Expired and released holds already stop blocking availability;
+    sweeping only reclaims the rows. Returns the number deleted.
+    """
+    swept = 0
+    while True:
+        deleted = _write(conn, lambda conn: conn.execute('''
+            DELETE FROM bookings WHERE id IN (
+                SELECT id FROM bookings
+                WHERE hold_expires_at <= CURRENT_TIMESTAMP AND status IN ('pending', 'cancelled')
+                LIMIT ?
+            )
+        ''', (batch_size,)).rowcount)
+        swept += deleted
+        if deleted < batch_size:
+            return swept
@@ -0,0 +1,216 @@
+"""
+Guest Reviews
+Review submission, keyset-paginated listings and per-room/per-hotel rating aggregates kept by triggers
+"""
+
+from pagination import DEFAULT_PAGE_SIZE, encode_cursor
+from reservations import RoomNotFoundError
+
+ROOM = 'room'
+HOTEL = 'hotel'
+SCOPES = (ROOM, HOTEL)
+
+# Bookings that entitle a guest to review the room
+REVIEWABLE_STATUSES = ('confirmed', 'completed')
+
+# One aggregate row per room and per hotel: count, rating sum and a star
+# histogram, adjusted by triggers inside the writing transaction. A hotel's
+# rating follows its review average once it has reviews; until then it
+# keeps the value set by an admin.
+SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS review_stats (
+        scope TEXT NOT NULL CHECK(scope IN ('room', 'hotel')),
+        scope_id INTEGER NOT NULL,
+        review_count INTEGER NOT NULL DEFAULT 0,
+        rating_sum INTEGER NOT NULL DEFAULT 0,
+        stars_1 INTEGER NOT NULL DEFAULT 0,
+        stars_2 INTEGER NOT NULL DEFAULT 0,
+        stars_3 INTEGER NOT NULL DEFAULT 0,
+        stars_4 INTEGER NOT NULL DEFAULT 0,
+        stars_5 INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (scope, scope_id)
+    ) WITHOUT ROWID;
+
+    CREATE INDEX IF NOT EXISTS idx_reviews_room_created ON reviews(room_id, created_at, id);
+    CREATE INDEX IF NOT EXISTS idx_reviews_hotel_created ON reviews(hotel_id, created_at, id);
+
+    CREATE TRIGGER IF NOT EXISTS review_stats_insert AFTER INSERT ON reviews BEGIN
+        INSERT INTO review_stats (scope, scope_id, review_count, rating_sum,
+                                  stars_1, stars_2, stars_3, stars_4, stars_5)
+        SELECT scope, scope_id, 1, NEW.rating,
+               NEW.rating = 1, NEW.rating = 2, NEW.rating = 3, NEW.rating = 4, NEW.rating = 5
+        FROM (SELECT 'room' AS scope, NEW.room_id AS scope_id UNION ALL SELECT 'hotel', NEW.hotel_id)
+        WHERE true
+        ON CONFLICT(scope, scope_id) DO UPDATE SET
+            review_count = review_count + 1,
+            rating_sum = rating_sum + NEW.rating,
+            stars_1 = stars_1 + (NEW.rating = 1), stars_2 = stars_2 + (NEW.rating = 2),
+            stars_3 = stars_3 + (NEW.rating = 3), stars_4 = stars_4 + (NEW.rating = 4),
+            stars_5 = stars_5 + (NEW.rating = 5);
+        UPDATE hotels SET rating = (
+            SELECT round(rating_sum * 1.0 / review_count, 1) FROM review_stats
+            WHERE scope = 'hotel' AND scope_id = NEW.hotel_id
+        ) WHERE id = NEW.hotel_id;
+    END;
+    CREATE TRIGGER IF NOT EXISTS review_stats_delete AFTER DELETE ON reviews BEGIN
+        UPDATE review_stats SET
+            review_count = review_count - 1,
+            rating_sum = rating_sum - OLD.rating,
+            stars_1 = stars_1 - (OLD.rating = 1), stars_2 = stars_2 - (OLD.rating = 2),
+            stars_3 = stars_3 - (OLD.rating = 3), stars_4 = stars_4 - (OLD.rating = 4),
+            stars_5 = stars_5 - (OLD.rating = 5)
+        WHERE (scope = 'room' AND scope_id = OLD.room_id) OR (scope = 'hotel' AND scope_id = OLD.hotel_id);
+        UPDATE hotels SET rating = (
+            SELECT round(rating_sum * 1.0 / review_count, 1) FROM review_stats
+            WHERE scope = 'hotel' AND scope_id = OLD.hotel_id
+        ) WHERE id = OLD.hotel_id AND EXISTS (
+            SELECT 1 FROM review_stats WHERE scope = 'hotel' AND scope_id = OLD.hotel_id AND review_count > 0
+        );
+    END;
+    CREATE TRIGGER IF NOT EXISTS review_stats_update AFTER UPDATE OF rating, room_id, hotel_id ON reviews BEGIN
+        UPDATE review_stats SET
+            review_count = review_count - 1,
+            rating_sum = rating_sum - OLD.rating,
+            stars_1 = stars_1 - (OLD.rating = 1), stars_2 = stars_2 - (OLD.rating = 2),
+            stars_3 = stars_3 - (OLD.rating = 3), stars_4 = stars_4 - (OLD.rating = 4),
+            stars_5 = stars_5 - (OLD.rating = 5)
+        WHERE (scope = 'room' AND scope_id = OLD.room_id) OR (scope = 'hotel' AND scope_id = OLD.hotel_id);
+        INSERT INTO review_stats (scope, scope_id, review_count, rating_sum,
+                                  stars_1, stars_2, stars_3, stars_4, stars_5)
+        SELECT scope, scope_id, 1, NEW.rating,
+               NEW.rating = 1, NEW.rating = 2, NEW.rating = 3, NEW.rating = 4, NEW.rating = 5
+        FROM (SELECT 'room' AS scope, NEW.room_id AS scope_id UNION ALL SELECT 'hotel', NEW.hotel_id)
+        WHERE true
+        ON CONFLICT(scope, scope_id) DO UPDATE SET
+            review_count = review_count + 1,
+            rating_sum = rating_sum + NEW.rating,
+            stars_1 = stars_1 + (NEW.rating = 1), stars_2 = stars_2 + (NEW.rating = 2),
+            stars_3 = stars_3 + (NEW.rating = 3), stars_4 = stars_4 + (NEW.rating = 4),
+            stars_5 = stars_5 + (NEW.rating = 5);
+        UPDATE hotels SET rating = (
+            SELECT round(rating_sum * 1.0 / review_count, 1) FROM review_stats
+            WHERE scope = 'hotel' AND scope_id = hotels.id
+        ) WHERE id IN (OLD.hotel_id, NEW.hotel_id) AND EXISTS (
+            SELECT 1 FROM review_stats WHERE scope = 'hotel' AND scope_id = hotels.id AND review_count > 0
+        );
+    END;
+'''
+
+
+class ReviewNotAllowedError(Exception):
+    """The guest has no stay in the room to review"""
+
+
+class DuplicateReviewError(Exception):
+    """The guest has already reviewed the room"""
+
+
+def init_reviews(conn):
+    """Create the aggregate table, indexes and triggers, then aggregate existing reviews"""
+    conn.executescript(SCHEMA)
+    rebuild(conn)
+
+
+def rebuild(conn):
+    """Recompute every room and hotel aggregate (and review-based hotel rating) from reviews"""
+    stars = ', '.join(f'SUM(rating = {n})' for n in range(1, 6))
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        conn.execute('DELETE FROM review_stats')
+        for scope, column in ((ROOM, 'room_id'), (HOTEL, 'hotel_id')):
+            conn.execute(f'''
+                INSERT INTO review_stats (scope, scope_id, review_count, rating_sum,
+                                          stars_1, stars_2, stars_3, stars_4, stars_5)
+                SELECT '{scope}', {column}, COUNT(*), SUM(rating), {stars}
+                FROM reviews GROUP BY {column}
+            ''')
+        conn.execute('''
+            UPDATE hotels SET rating = (
+                SELECT round(rating_sum * 1.0 / review_count, 1) FROM review_stats
+                WHERE scope = 'hotel' AND scope_id = hotels.id
+            )
+            WHERE id IN (SELECT scope_id FROM review_stats WHERE scope = 'hotel' AND review_count > 0)
+        ''')
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def summary(conn, scope, scope_id):
+    """{count, average, histogram} for a room or hotel in one primary-key read"""
+    row = conn.execute(
+        'SELECT * FROM review_stats WHERE scope = ? AND scope_id = ?', (scope, scope_id)
+    ).fetchone()
+    count = row['review_count'] if row else 0
+    return {
+        'count': count,
+        'average': round(row['rating_sum'] / count, 2) if count else None,
+        'histogram': {str(n): row[f'stars_{n}'] if row else 0 for n in range(1, 6)},
+    }
+
+
+def review_page(conn, scope, scope_id, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """Newest-first reviews of a room or hotel, plus the cursor for the next page (or None).
+
+    Walks idx_reviews_room_created / idx_reviews_hotel_created from the
+    cursor, so a page costs the same however many reviews there are.
+    """
+    column = 'room_id' if scope == ROOM else 'hotel_id'
+    conditions, params = [f'r.{column} = ?'], [scope_id]
+    if cursor:
+        conditions.append('(r.created_at, r.id) < (?, ?)')
+        params.extend(cursor)
+    rows = conn.execute(f'''
+        SELECT r.id, r.user_id, r.room_id, r.hotel_id, r.rating, r.title, r.comment, r.created_at,
+               u.name as user_name
+        FROM reviews r
+        JOIN users u ON r.user_id = u.id
+        WHERE {' AND '.join(conditions)}
+        ORDER BY r.created_at DESC, r.id DESC
+        LIMIT ?
+    ''', params + [limit + 1]).fetchall()
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return [dict(row) for row in rows[:limit]], next_cursor
+
+
+def add_review(conn, user_id, room_id, rating, title='', comment=''):
+    """Record a guest's review of a room they booked; returns the stored review.
+
+    Raises ValueError for a bad rating, RoomNotFoundError for an unknown room,
+    ReviewNotAllowedError without a stay and DuplicateReviewError for a
+    second review of the same room.
+    """
+    try:
+        rating = int(rating)
+    except (TypeError, ValueError):
+        raise ValueError('Rating must be a whole number from 1 to 5')
+    if not 1 <= rating <= 5:
+        raise ValueError('Rating must be a whole number from 1 to 5')
+
+    statuses = ', '.join('?' for _ in REVIEWABLE_STATUSES)
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        room = conn.execute('SELECT id, hotel_id FROM rooms WHERE id = ?', (room_id,)).fetchone()
+        if room is None:
+            raise RoomNotFoundError(room_id)
+        stayed = conn.execute(
+            f'SELECT 1 FROM bookings WHERE user_id = ? AND room_id = ? AND status IN ({statuses}) LIMIT 1',
+            (user_id, room_id, *REVIEWABLE_STATUSES)
+        ).fetchone()
+        if not stayed:
+            raise ReviewNotAllowedError('Only guests who booked this room can review it')
+        if conn.execute('SELECT 1 FROM reviews WHERE user_id = ? AND room_id = ?',
+                        (user_id, room_id)).fetchone():
+            raise DuplicateReviewError('You have already reviewed this room')
+
+        cursor = conn.execute('''
+            INSERT INTO reviews (user_id, room_id, hotel_id, rating, title, comment)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (user_id, room_id, room['hotel_id'], rating, title, comment))
+        review = conn.execute('SELECT * FROM reviews WHERE id = ?', (cursor.lastrowid,)).fetchone()
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return dict(review)
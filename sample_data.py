@@ -24,11 +24,10 @@ def init_sample_data():
             ('Mike Johnson', 'mike@example.com', generate_password_hash('password123'), '+1-555-0103', 'guest'),
         ]
         
-        for user in users:
-            c.execute(
-                'INSERT INTO users (name, email, password, phone, role) VALUES (?, ?, ?, ?, ?)',
-                user
-            )
+        c.executemany(
+            'INSERT INTO users (name, email, password, phone, role) VALUES (?, ?, ?, ?, ?)',
+            users
+        )
         
         # Add sample hotels
         hotels = [
@@ -87,12 +86,15 @@ def init_sample_data():
             (5, room_ids[8], (today + timedelta(days=15)).date(), (today + timedelta(days=17)).date(), 1, 259.00, 'pending', 'High floor requested'),
         ]
         
-        for i, booking in enumerate(bookings):
-            booking_id = f"BK{datetime.now().strftime('%Y%m%d%H%M%S')}{str(i).zfill(3)}"
-            c.execute(
-                'INSERT INTO bookings (booking_id, user_id, room_id, hotel_id, check_in_date, check_out_date, number_of_guests, total_price, status, special_requests) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
-                (booking_id, booking[0], booking[1], hotels.index([h for h in hotels if h[0] in ['Grand Plaza Hotel']][0]) + 1, booking[2], booking[3], booking[4], booking[5], booking[6], booking[7])
-            )
+        room_hotels = dict(zip(room_ids, (room[0] for room in rooms)))
+        timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
+        c.executemany(
+            'INSERT INTO bookings (booking_id, user_id, room_id, hotel_id, check_in_date, check_out_date, number_of_guests, total_price, status, special_requests) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            [
+                (f"BK{timestamp}{str(i).zfill(3)}", booking[0], booking[1], room_hotels[booking[1]]) + booking[2:]
+                for i, booking in enumerate(bookings)
+            ]
+        )
         
         # Add sample reviews
         reviews = [
@@ -101,11 +103,10 @@ def init_sample_data():
             (5, room_ids[8], hotel_ids[3], 5, 'Modern amenities and perfect location.', 'Perfect Stay'),
         ]
         
-        for review in reviews:
-            c.execute(
-                'INSERT INTO reviews (user_id, room_id, hotel_id, rating, comment, title) VALUES (?, ?, ?, ?, ?, ?)',
-                review
-            )
+        c.executemany(
+            'INSERT INTO reviews (user_id, room_id, hotel_id, rating, comment, title) VALUES (?, ?, ?, ?, ?, ?)',
+            reviews
+        )
         
         conn.commit()
         print("✅ Sample data initialized successfully!")
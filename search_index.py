@@ -0,0 +1,297 @@
+"""
+Search Index
+FTS5 full-text index over hotels and rooms, with amenity facets kept in sync by triggers
+"""
+
+import json
+import re
+from datetime import date, timedelta
+
+from availability import free_room_clause
+from inventory import remaining_sql
+from pricing import rate_sql
+
+DEFAULT_LIMIT = 60
+MAX_LIMIT = 200
+
+# Upper bounds of the nightly-rate facet buckets; the last bucket is open-ended
+PRICE_BUCKETS = (100, 200, 300, 500)
+
+# bm25 column weights, in room_search column order
+RANK_WEIGHTS = (4.0, 2.0, 1.0, 1.5, 2.0)
+
+# Amenities are stored as 'WiFi, AC, TV'; turn that into a JSON array so
+# json_each can split it inside a trigger (CTEs are not allowed there)
+_AMENITY_LIST = (
+    """json_each('["' || replace(replace(replace(COALESCE({room}.amenities, ''), '\\', ''), '"', ''), ',', '","') || '"]')"""
+)
+_AMENITY_ROWS = f"""
+    SELECT {{room}}.id, trim(value) FROM {_AMENITY_LIST} WHERE trim(value) != ''
+"""
+
+_SEARCH_ROW = '''
+    SELECT {room}.id, h.name, h.city, h.description, {room}.description, {room}.amenities
+    FROM hotels h WHERE h.id = {room}.hotel_id
+'''
+
+SCHEMA = f'''
+    CREATE VIRTUAL TABLE IF NOT EXISTS room_search USING fts5(
+        hotel_name, city, hotel_description, room_description, amenities,
+        tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+    );
+
+    CREATE TABLE IF NOT EXISTS room_amenities (
+        amenity TEXT NOT NULL COLLATE NOCASE,
+        room_id INTEGER NOT NULL,
+        PRIMARY KEY (amenity, room_id)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS idx_room_amenities_room ON room_amenities(room_id);
+    CREATE INDEX IF NOT EXISTS idx_hotels_city ON hotels(city COLLATE NOCASE);
+
+    CREATE TRIGGER IF NOT EXISTS search_rooms_insert AFTER INSERT ON rooms BEGIN
+        INSERT INTO room_search (rowid, hotel_name, city, hotel_description, room_description, amenities)
+        {_SEARCH_ROW.format(room='new')};
+        INSERT OR IGNORE INTO room_amenities (room_id, amenity) {_AMENITY_ROWS.format(room='new')};
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS search_rooms_update
+    AFTER UPDATE OF hotel_id, description, amenities ON rooms BEGIN
+        DELETE FROM room_search WHERE rowid = old.id;
+        INSERT INTO room_search (rowid, hotel_name, city, hotel_description, room_description, amenities)
+        {_SEARCH_ROW.format(room='new')};
+        DELETE FROM room_amenities WHERE room_id = old.id;
+        INSERT OR IGNORE INTO room_amenities (room_id, amenity) {_AMENITY_ROWS.format(room='new')};
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS search_rooms_delete AFTER DELETE ON rooms BEGIN
+        DELETE FROM room_search WHERE rowid = old.id;
+        DELETE FROM room_amenities WHERE room_id = old.id;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS search_hotels_update
+    AFTER UPDATE OF name, city, description ON hotels BEGIN
+        UPDATE room_search
+        SET hotel_name = new.name, city = new.city, hotel_description = new.description
+        WHERE rowid IN (SELECT id FROM rooms WHERE hotel_id = new.id);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS search_hotels_delete AFTER DELETE ON hotels BEGIN
+        DELETE FROM room_search WHERE rowid IN (SELECT id FROM rooms WHERE hotel_id = old.id);
+    END;
+'''
+
+
+def init_search(conn):
+    """Create the index and triggers, then build the index from existing rows"""
+    conn.executescript(SCHEMA)
+    rebuild(conn)
+
+
+def rebuild(conn):
+    """Repopulate room_search and room_amenities from rooms and hotels"""
+    conn.execute('BEGIN IMMEDIATE')
+    conn.execute('DELETE FROM room_search')
+    conn.execute('DELETE FROM room_amenities')
+    conn.execute('''
+        INSERT INTO room_search (rowid, hotel_name, city, hotel_description, room_description, amenities)
+        SELECT r.id, h.name, h.city, h.description, r.description, r.amenities
+        FROM rooms r JOIN hotels h ON h.id = r.hotel_id
+    ''')
+    conn.execute(f'''
+        INSERT OR IGNORE INTO room_amenities (room_id, amenity)
+        SELECT r.id, trim(value) FROM rooms r, {_AMENITY_LIST.format(room='r')}
+        WHERE trim(value) != ''
+    ''')
+    conn.commit()
+
+
+def match_expression(text, column=None):
+    """FTS5 query matching every word of free text as a prefix.
+
+    Words are quoted, so user input can never inject FTS5 syntax.
+    """
+    words = re.findall(r'\w+', text or '')
+    if not words:
+        return None
+    expression = ' '.join(f'"{word}"*' for word in words)
+    return f'{column} : ({expression})' if column else expression
+
+
+def price_bucket_sql(column):
+    """CASE expression labelling a price with its facet bucket"""
+    cases, lower = [], 0
+    for upper in PRICE_BUCKETS:
+        cases.append(f"WHEN {column} < {upper} THEN '{lower}-{upper}'")
+        lower = upper
+    return f"CASE {' '.join(cases)} ELSE '{lower}+' END"
+
+
+def build_query(filters, limit=DEFAULT_LIMIT):
+    """SQL and params for one round trip returning results, total and facets.
+
+    Results are one row per hotel room type, with the type's lowest
+    average nightly rate for the stay (tonight when undated) and the rooms
+    of that type left on the counted inventory. Dated searches drop sold
+    out types and price them from the rooms still free for the stay; the
+    type's cheapest such room stands in for it as id, and the amenity
+    facet counts a type when any of its rooms has the amenity.
+    """
+    dated = bool(filters.get('check_in') and filters.get('check_out'))
+    if dated:
+        stay = [filters['check_in'], filters['check_out']]
+    else:
+        tonight = date.today()
+        stay = [tonight.isoformat(), (tonight + timedelta(days=1)).isoformat()]
+
+    conditions = ["r.status = 'available'", 'r.capacity >= ?']
+    params = [filters.get('guests', 1)]
+
+    match_parts = [
+        part for part in (
+            match_expression(filters.get('q')),
+            match_expression(filters.get('city'), column='city'),
+        ) if part
+    ]
+    if match_parts:
+        source = 'room_search JOIN rooms r ON r.id = room_search.rowid JOIN hotels h ON h.id = r.hotel_id'
+        conditions.append('room_search MATCH ?')
+        params.append(' AND '.join(match_parts))
+        score = f"bm25(room_search, {', '.join(str(w) for w in RANK_WEIGHTS)})"
+    else:
+        source = 'rooms r JOIN hotels h ON h.id = r.hotel_id'
+        score = '0.0'
+    source += ' LEFT JOIN rate_calendar rc ON rc.room_id = r.id'
+
+    if filters.get('room_type'):
+        conditions.append('r.room_type = ?')
+        params.append(filters['room_type'])
+    for amenity in filters.get('amenities') or ():
+        conditions.append('r.id IN (SELECT room_id FROM room_amenities WHERE amenity = ?)')
+        params.append(amenity)
+
+    query = f'''
+        WITH candidates AS (
+            SELECT r.id, r.room_type, r.capacity, r.price_per_night,
+                   h.id AS hotel_id, h.name AS hotel_name, h.city, h.rating,
+                   {rate_sql('r', 'rc')} AS nightly_rate,
+                   {free_room_clause('r') if dated else '1'} AS free,
+                   {score} AS score
+            FROM {source}
+            WHERE {' AND '.join(conditions)}
+        ),
+        priced AS (
+            SELECT *, ROW_NUMBER() OVER (
+                PARTITION BY hotel_id, room_type ORDER BY free DESC, nightly_rate, price_per_night, id
+            ) AS price_rank
+            FROM candidates
+            WHERE nightly_rate BETWEEN ? AND ?
+        ),
+        types AS (
+            SELECT MIN(CASE WHEN price_rank = 1 THEN id END) AS id, hotel_id, room_type,
+                   COUNT(*) AS rooms, MAX(capacity) AS capacity,
+                   MIN(CASE WHEN price_rank = 1 THEN price_per_night END) AS price_per_night,
+                   MIN(CASE WHEN price_rank = 1 THEN nightly_rate END) AS nightly_rate,
+                   hotel_name, city, rating, MIN(score) AS score
+            FROM priced
+            GROUP BY hotel_id, room_type
+        ),
+        matches AS MATERIALIZED (
+            SELECT * FROM (
+                SELECT t.*, {remaining_sql('t')} AS remaining,
+                       (SELECT amenities FROM rooms WHERE id = t.id) AS amenities
+                FROM types t
+            ){' WHERE remaining > 0' if dated else ''}
+        )
+        SELECT
+            (SELECT COUNT(*) FROM matches) AS total,
+            (SELECT json_group_array(json_object(
+                'id', id, 'room_type', room_type, 'capacity', capacity, 'rooms', rooms, 'remaining', remaining,
+                'price_per_night', price_per_night, 'nightly_rate', nightly_rate, 'amenities', amenities,
+                'hotel_id', hotel_id, 'hotel_name', hotel_name, 'city', city, 'rating', rating,
+                'score', round(score, 4)))
+             FROM (SELECT * FROM matches ORDER BY score, rating DESC, id LIMIT ?)) AS results,
+            (SELECT json_group_object(room_type, n)
+             FROM (SELECT room_type, COUNT(*) AS n FROM matches GROUP BY room_type ORDER BY n DESC)) AS room_types,
+            (SELECT json_group_object(amenity, n)
+             FROM (SELECT a.amenity, COUNT(DISTINCT m.id) AS n FROM matches m
+                   JOIN priced p ON p.hotel_id = m.hotel_id AND p.room_type = m.room_type
+                   JOIN room_amenities a ON a.room_id = p.id
+                   GROUP BY a.amenity ORDER BY n DESC)) AS amenities,
+            (SELECT json_group_object(bucket, n)
+             FROM (SELECT {price_bucket_sql('nightly_rate')} AS bucket, COUNT(*) AS n,
+                          MIN(nightly_rate) AS low
+                   FROM matches GROUP BY bucket ORDER BY low)) AS price_buckets,
+            (SELECT json_group_object(city, n)
+             FROM (SELECT city, COUNT(*) AS n FROM matches GROUP BY city ORDER BY n DESC)) AS cities
+    '''
+    # Placeholders in statement order: rate expression, free-room check, filters, price range, remaining count
+    free = [stay[1], stay[0]] if dated else []
+    params = stay + free + params + [filters.get('min_price', 0), filters.get('max_price', 10000)] + stay + [limit]
+    return query, params
+
+
+def search(conn, filters, limit=DEFAULT_LIMIT):
+    """Ranked room types plus facet counts for them"""
+    limit = max(1, min(int(limit), MAX_LIMIT))
+    query, params = build_query(filters, limit)
+    row = conn.execute(query, params).fetchone()
+    return {
+        'total': row['total'],
+        'results': json.loads(row['results']),
+        'facets': {
+            'room_type': json.loads(row['room_types']),
+            'amenity': json.loads(row['amenities']),
+            'price': json.loads(row['price_buckets']),
+            'city': json.loads(row['cities']),
+        },
+    }
+
+
+def filters_from_args(args):
+    """Search filters from request query parameters"""
+    return {
+        'q': args.get('q', '').strip(),
+        'city': args.get('city', '').strip(),
+        'room_type': args.get('room_type', ''),
+        'amenities': [a.strip() for a in args.getlist('amenity') if a.strip()],
+        'min_price': args.get('min_price', 0, type=float),
+        'max_price': args.get('max_price', 10000, type=float),
+        'guests': args.get('guests', 1, type=int),
+        'check_in': args.get('check_in', ''),
+        'check_out': args.get('check_out', ''),
+    }
+
+
+def _bucket_labels():
+    labels, lower = [], 0
+    for upper in PRICE_BUCKETS:
+        labels.append(f'{lower}-{upper}')
+        lower = upper
+    return labels + [f'{lower}+']
+
+
+def merge_results(found, limit=DEFAULT_LIMIT):
+    """Combine search() results from several hotel shards.
+
+    Facet counts add up and results are re-ranked on the same key the
+    query orders by. bm25 scores are computed per shard, so text matches
+    rank on each shard's own term statistics.
+    """
+    limit = max(1, min(int(limit), MAX_LIMIT))
+    results = sorted((row for part in found for row in part['results']),
+                     key=lambda row: (row['score'], -(row['rating'] or 0), row['id']))
+    facets = {}
+    for name in ('room_type', 'amenity', 'price', 'city'):
+        counts = {}
+        for part in found:
+            for key, n in part['facets'][name].items():
+                counts[key] = counts.get(key, 0) + n
+        if name == 'price':
+            facets[name] = {label: counts[label] for label in _bucket_labels() if label in counts}
+        else:
+            facets[name] = dict(sorted(counts.items(), key=lambda item: -item[1]))
+    return {
+        'total': sum(part['total'] for part in found),
+        'results': results[:limit],
+        'facets': facets,
+    }
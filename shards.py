@@ -0,0 +1,266 @@
+"""
+Hotel Shards
+Rooms, bookings and reviews partitioned by hotel across SQLite files, with a thread-pool fan-out
+"""
+
+import contextvars
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app, g
+
+from database import get_db
+
+# The catalog database (DATABASE_PATH) keeps users, hotels and the room ->
+# hotel map. Each shard is a full SmartStay database holding copies of
+# users and hotels plus the rooms, bookings and reviews of the hotels with
+# hotel_id % SHARD_COUNT == its index, so a booking and every trigger it
+# fires stay inside one file and different shards commit in parallel.
+CATALOG_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS room_shards (
+        room_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        hotel_id INTEGER NOT NULL
+    );
+'''
+
+# Catalog tables copied to every shard, with the columns copied
+MIRRORED = {
+    'users': ('id', 'name', 'email', 'password', 'phone', 'role', 'profile_image', 'created_at', 'updated_at'),
+    'hotels': ('id', 'name', 'description', 'city', 'address', 'phone', 'email', 'rating', 'image', 'created_at'),
+}
+PARTITIONED = ('rooms', 'bookings', 'reviews')
+
+
+def shard_paths(database, count):
+    """Shard file names next to the catalog: hotel_booking.shard0.db, ..."""
+    root, ext = os.path.splitext(database)
+    return [f'{root}.shard{index}{ext or ".db"}' for index in range(count)]
+
+
+def init_catalog(conn):
+    conn.executescript(CATALOG_SCHEMA)
+    conn.commit()
+
+
+class ShardSet:
+    """Connection pools for the hotel shards, with routing and parallel fan-out"""
+
+    def __init__(self, pools):
+        self.pools = pools
+        self._room_hotels = {}
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+
+    def __len__(self):
+        return len(self.pools)
+
+    def index_for_hotel(self, hotel_id):
+        return int(hotel_id) % len(self.pools)
+
+    def hotel_for_room(self, catalog_conn, room_id):
+        """Hotel owning a room, from the catalog's room map (cached: rooms never move)"""
+        room_id = int(room_id)
+        hotel_id = self._room_hotels.get(room_id)
+        if hotel_id is None:
+            row = catalog_conn.execute(
+                'SELECT hotel_id FROM room_shards WHERE room_id = ?', (room_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            hotel_id = self._room_hotels[room_id] = row[0]
+        return hotel_id
+
+    def _pool_executor(self):
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=len(self.pools), thread_name_prefix='shard')
+                self._pid = os.getpid()
+            return self._executor
+
+    def fan_out(self, work):
+        """[work(conn) for every shard], in shard order, run in parallel.
+
+        Each call runs in a copy of the caller's context, so the request,
+        session and query profiling stay visible inside work.
+        """
+        def run(pool):
+            conn = pool.acquire()
+            try:
+                return work(conn)
+            finally:
+                pool.release(conn)
+        contexts = [contextvars.copy_context() for _ in self.pools]
+        return list(self._pool_executor().map(lambda context, pool: context.run(run, pool),
+                                              contexts, self.pools))
+
+    def each(self, work):
+        """[work(conn) for every shard], one shard after another"""
+        results = []
+        for pool in self.pools:
+            conn = pool.acquire()
+            try:
+                results.append(work(conn))
+            finally:
+                pool.release(conn)
+        return results
+
+
+# Mirroring and room ids
+
+def mirror_rows(catalog_conn, shard_conn, table, ids=None):
+    """Upsert catalog users/hotels rows (all, or the given ids) into one shard"""
+    columns = MIRRORED[table]
+    query = f"SELECT {', '.join(columns)} FROM {table}"
+    params = ()
+    if ids is not None:
+        query += f" WHERE id IN ({', '.join('?' for _ in ids)})"
+        params = tuple(ids)
+    rows = catalog_conn.execute(query, params).fetchall()
+    updates = ', '.join(f'{column} = excluded.{column}' for column in columns[1:])
+    shard_conn.executemany(
+        f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)}) "
+        f'ON CONFLICT(id) DO UPDATE SET {updates}',
+        [tuple(row) for row in rows]
+    )
+    shard_conn.commit()
+    return len(rows)
+
+
+def new_room_id(catalog_conn, hotel_id):
+    """Reserve a globally unique room id in the catalog's room map"""
+    cursor = catalog_conn.execute('INSERT INTO room_shards (hotel_id) VALUES (?)', (hotel_id,))
+    catalog_conn.commit()
+    return cursor.lastrowid
+
+
+def split(catalog_conn, shard_conns):
+    """Move rooms, bookings and reviews from the catalog into empty, migrated shards.
+
+    Rows are inserted through the shards' triggers, so counters, search,
+    inventory and rate queues are built as they go. Returns rows moved per
+    shard. Deliver the catalog's outbox before splitting; queued events are
+    not moved.
+    """
+    count = len(shard_conns)
+    moved = []
+    for index, conn in enumerate(shard_conns):
+        for table in MIRRORED:
+            mirror_rows(catalog_conn, conn, table)
+        rows = 0
+        for table in PARTITIONED:
+            columns = [row[1] for row in catalog_conn.execute(f'PRAGMA table_info({table})')]
+            data = catalog_conn.execute(
+                f"SELECT {', '.join(columns)} FROM {table} WHERE hotel_id % ? = ?", (count, index)
+            ).fetchall()
+            conn.executemany(
+                f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})",
+                [tuple(row) for row in data]
+            )
+            rows += len(data)
+        conn.commit()
+        moved.append(rows)
+
+    catalog_conn.execute('BEGIN IMMEDIATE')
+    try:
+        catalog_conn.execute('INSERT OR IGNORE INTO room_shards (room_id, hotel_id) SELECT id, hotel_id FROM rooms')
+        for table in reversed(PARTITIONED):
+            catalog_conn.execute(f'DELETE FROM {table}')
+        catalog_conn.commit()
+    except Exception:
+        catalog_conn.rollback()
+        raise
+    return moved
+
+
+# Request routing
+
+def get_shards():
+    """The app's ShardSet, or None when running unsharded"""
+    return current_app.extensions.get('shards')
+
+
+def shard_db(index):
+    """Request connection to one shard, taken from its pool on first use"""
+    if 'shard_dbs' not in g:
+        g.shard_dbs = {}
+    if index not in g.shard_dbs:
+        g.shard_dbs[index] = current_app.extensions['shards'].pools[index].acquire()
+    return g.shard_dbs[index]
+
+
+def hotel_db(hotel_id):
+    """Connection holding a hotel's rooms, bookings and reviews"""
+    shards = get_shards()
+    if shards is None or hotel_id is None:
+        return get_db()
+    return shard_db(shards.index_for_hotel(hotel_id))
+
+
+def room_db(room_id):
+    """Connection holding a room (the catalog, which has no rooms, when unknown)"""
+    shards = get_shards()
+    if shards is None:
+        return get_db()
+    return hotel_db(shards.hotel_for_room(get_db(), room_id))
+
+
+def booking_db(booking_id):
+    """Connection of the shard holding a booking (the catalog when not found)"""
+    shards = get_shards()
+    if shards is None:
+        return get_db()
+    found = shards.fan_out(lambda conn: conn.execute(
+        'SELECT 1 FROM bookings WHERE booking_id = ?', (booking_id,)
+    ).fetchone() is not None)
+    return shard_db(found.index(True)) if True in found else get_db()
+
+
+def fan_out(work):
+    """[work(conn)] for every shard in parallel, or [work(catalog)] when unsharded"""
+    shards = get_shards()
+    return shards.fan_out(work) if shards else [work(get_db())]
+
+
+def shard_dbs():
+    """Request connections to every shard (just the catalog when unsharded)"""
+    shards = get_shards()
+    if shards is None:
+        return [get_db()]
+    return [shard_db(index) for index in range(len(shards))]
+
+
+def mirror(table, row_id):
+    """Copy one users/hotels row from the catalog to every shard"""
+    shards = get_shards()
+    if shards is not None:
+        catalog = get_db()
+        shards.each(lambda conn: mirror_rows(catalog, conn, table, [row_id]))
+
+
+def pull_hotel_rating(hotel_id):
+    """Copy a hotel's review-driven rating from its shard back to the catalog"""
+    shards = get_shards()
+    if shards is None:
+        return
+    row = hotel_db(hotel_id).execute('SELECT rating FROM hotels WHERE id = ?', (hotel_id,)).fetchone()
+    if row is not None:
+        catalog = get_db()
+        catalog.execute('UPDATE hotels SET rating = ? WHERE id = ? AND rating IS NOT ?', (row[0], hotel_id, row[0]))
+        catalog.commit()
+
+
+def _release_shard_dbs(error=None):
+    conns = g.pop('shard_dbs', {})
+    pools = current_app.extensions['shards'].pools
+    for index, conn in conns.items():
+        pools[index].release(conn)
+
+
+def init_app(app, shards):
+    """Route per-hotel queries to shards (None keeps everything in the catalog)"""
+    if shards is None:
+        return
+    app.extensions['shards'] = shards
+    app.teardown_appcontext(_release_shard_dbs)
@@ -0,0 +1,214 @@
+"""
+Dashboard Statistics
+Incrementally maintained totals for the admin dashboard, with periodic reconciliation
+"""
+
+import time
+
+# Booking statuses whose price counts as revenue
+REVENUE_STATUSES = ('confirmed', 'completed')
+
+# Counter name -> query that recomputes it from the source tables
+COUNTER_QUERIES = {
+    'total_hotels': 'SELECT COUNT(*) FROM hotels',
+    'total_rooms': 'SELECT COUNT(*) FROM rooms',
+    'total_bookings': 'SELECT COUNT(*) FROM bookings',
+    'total_users': "SELECT COUNT(*) FROM users WHERE role = 'guest'",
+    'total_revenue': "SELECT COALESCE(SUM(total_price), 0) FROM bookings WHERE status IN ('confirmed', 'completed')",
+    'pending_bookings': "SELECT COUNT(*) FROM bookings WHERE status = 'pending'",
+}
+
+# Bookings moved to bookings_archive (see lifecycle.py) still count towards these
+ARCHIVE_QUERIES = {
+    'total_bookings': 'SELECT COUNT(*) FROM bookings_archive',
+    'total_revenue': "SELECT COALESCE(SUM(total_price), 0) FROM bookings_archive "
+                     "WHERE status IN ('confirmed', 'completed')",
+}
+
+# Checkout holds (bookings.hold_expires_at, see reservations.py) are not
+# bookings until confirm_hold() clears the column; once it exists these
+# replace the plain booking counts above
+HOLD_QUERIES = {
+    'total_bookings': 'SELECT COUNT(*) FROM bookings WHERE hold_expires_at IS NULL',
+    'total_revenue': "SELECT COALESCE(SUM(total_price), 0) FROM bookings "
+                     "WHERE status IN ('confirmed', 'completed') AND hold_expires_at IS NULL",
+    'pending_bookings': "SELECT COUNT(*) FROM bookings WHERE status = 'pending' AND hold_expires_at IS NULL",
+}
+
+RECONCILED_AT = 'reconciled_at'
+
+# Triggers run inside the writing transaction, so every insert/update path
+# (routes, bulk loads, scripts) keeps the counters exact without extra code
+SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS stats_counters (
+        name TEXT PRIMARY KEY,
+        value REAL NOT NULL DEFAULT 0
+    );
+
+    CREATE TRIGGER IF NOT EXISTS stats_hotels_insert AFTER INSERT ON hotels BEGIN
+        UPDATE stats_counters SET value = value + 1 WHERE name = 'total_hotels';
+    END;
+    CREATE TRIGGER IF NOT EXISTS stats_hotels_delete AFTER DELETE ON hotels BEGIN
+        UPDATE stats_counters SET value = value - 1 WHERE name = 'total_hotels';
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS stats_rooms_insert AFTER INSERT ON rooms BEGIN
+        UPDATE stats_counters SET value = value + 1 WHERE name = 'total_rooms';
+    END;
+    CREATE TRIGGER IF NOT EXISTS stats_rooms_delete AFTER DELETE ON rooms BEGIN
+        UPDATE stats_counters SET value = value - 1 WHERE name = 'total_rooms';
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS stats_users_insert AFTER INSERT ON users
+    WHEN NEW.role = 'guest' BEGIN
+        UPDATE stats_counters SET value = value + 1 WHERE name = 'total_users';
+    END;
+    CREATE TRIGGER IF NOT EXISTS stats_users_delete AFTER DELETE ON users
+    WHEN OLD.role = 'guest' BEGIN
+        UPDATE stats_counters SET value = value - 1 WHERE name = 'total_users';
+    END;
+    CREATE TRIGGER IF NOT EXISTS stats_users_role AFTER UPDATE OF role ON users
+    WHEN OLD.role IS NOT NEW.role BEGIN
+        UPDATE stats_counters
+        SET value = value + (NEW.role = 'guest') - (OLD.role = 'guest')
+        WHERE name = 'total_users';
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS stats_bookings_insert AFTER INSERT ON bookings BEGIN
+        UPDATE stats_counters SET value = value + 1 WHERE name = 'total_bookings';
+        UPDATE stats_counters SET value = value + NEW.total_price
+        WHERE name = 'total_revenue' AND NEW.status IN ('confirmed', 'completed');
+        UPDATE stats_counters SET value = value + 1
+        WHERE name = 'pending_bookings' AND NEW.status = 'pending';
+    END;
+    CREATE TRIGGER IF NOT EXISTS stats_bookings_update AFTER UPDATE OF status, total_price ON bookings BEGIN
+        UPDATE stats_counters
+        SET value = value
+            + (CASE WHEN NEW.status IN ('confirmed', 'completed') THEN NEW.total_price ELSE 0 END)
+            - (CASE WHEN OLD.status IN ('confirmed', 'completed') THEN OLD.total_price ELSE 0 END)
+        WHERE name = 'total_revenue';
+        UPDATE stats_counters
+        SET value = value + (NEW.status = 'pending') - (OLD.status = 'pending')
+        WHERE name = 'pending_bookings';
+    END;
+    CREATE TRIGGER IF NOT EXISTS stats_bookings_delete AFTER DELETE ON bookings BEGIN
+        UPDATE stats_counters SET value = value - 1 WHERE name = 'total_bookings';
+        UPDATE stats_counters SET value = value - OLD.total_price
+        WHERE name = 'total_revenue' AND OLD.status IN ('confirmed', 'completed');
+        UPDATE stats_counters SET value = value - 1
+        WHERE name = 'pending_bookings' AND OLD.status = 'pending';
+    END;
+'''
+
+# The booking triggers above, rebuilt to skip checkout holds
+HOLD_TRIGGERS = '''
+    DROP TRIGGER IF EXISTS stats_bookings_insert;
+    DROP TRIGGER IF EXISTS stats_bookings_update;
+    DROP TRIGGER IF EXISTS stats_bookings_delete;
+
+    CREATE TRIGGER stats_bookings_insert AFTER INSERT ON bookings
+    WHEN NEW.hold_expires_at IS NULL BEGIN
+        UPDATE stats_counters SET value = value + 1 WHERE name = 'total_bookings';
+        UPDATE stats_counters SET value = value + NEW.total_price
+        WHERE name = 'total_revenue' AND NEW.status IN ('confirmed', 'completed');
+        UPDATE stats_counters SET value = value + 1
+        WHERE name = 'pending_bookings' AND NEW.status = 'pending';
+    END;
+    CREATE TRIGGER stats_bookings_update
+    AFTER UPDATE OF status, total_price, hold_expires_at ON bookings
+    WHEN OLD.hold_expires_at IS NULL OR NEW.hold_expires_at IS NULL BEGIN
+        UPDATE stats_counters
+        SET value = value + (NEW.hold_expires_at IS NULL) - (OLD.hold_expires_at IS NULL)
+        WHERE name = 'total_bookings';
+        UPDATE stats_counters
+        SET value = value
+            + (CASE WHEN NEW.status IN ('confirmed', 'completed') AND NEW.hold_expires_at IS NULL
+               THEN NEW.total_price ELSE 0 END)
+            - (CASE WHEN OLD.status IN ('confirmed', 'completed') AND OLD.hold_expires_at IS NULL
+               THEN OLD.total_price ELSE 0 END)
+        WHERE name = 'total_revenue';
+        UPDATE stats_counters
+        SET value = value
+            + (NEW.status = 'pending' AND NEW.hold_expires_at IS NULL)
+            - (OLD.status = 'pending' AND OLD.hold_expires_at IS NULL)
+        WHERE name = 'pending_bookings';
+    END;
+    CREATE TRIGGER stats_bookings_delete AFTER DELETE ON bookings
+    WHEN OLD.hold_expires_at IS NULL BEGIN
+        UPDATE stats_counters SET value = value - 1 WHERE name = 'total_bookings';
+        UPDATE stats_counters SET value = value - OLD.total_price
+        WHERE name = 'total_revenue' AND OLD.status IN ('confirmed', 'completed');
+        UPDATE stats_counters SET value = value - 1
+        WHERE name = 'pending_bookings' AND OLD.status = 'pending';
+    END;
+'''
+
+
+def init_stats(conn):
+    """Create the counters table and triggers, then seed the counters"""
+    conn.executescript(SCHEMA)
+    reconcile(conn)
+
+
+def exclude_holds(conn):
+    """Rebuild the booking counter triggers to skip checkout holds, then recount"""
+    conn.executescript(HOLD_TRIGGERS)
+    reconcile(conn)
+
+
+def reconcile(conn):
+    """Recompute every counter from the source tables in one transaction.
+
+    Inside a caller's open transaction the counters are written there and
+    left for the caller to commit.
+    """
+    started = not conn.in_transaction
+    if started:
+        conn.execute('BEGIN IMMEDIATE')  # block writers so no delta is lost
+    queries = dict(COUNTER_QUERIES)
+    if any(row[1] == 'hold_expires_at' for row in conn.execute('PRAGMA table_info(bookings)')):
+        queries.update(HOLD_QUERIES)
+    values = {name: conn.execute(query).fetchone()[0] for name, query in queries.items()}
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'bookings_archive'").fetchone():
+        for name, query in ARCHIVE_QUERIES.items():
+            values[name] += conn.execute(query).fetchone()[0]
+    values[RECONCILED_AT] = time.time()
+    conn.executemany(
+        'INSERT INTO stats_counters (name, value) VALUES (?, ?) '
+        'ON CONFLICT(name) DO UPDATE SET value = excluded.value',
+        values.items()
+    )
+    if started:
+        conn.commit()
+    return values
+
+
+def get_stats(conn, reconcile_interval=3600):
+    """Dashboard totals in one primary-key read.
+
+    Counters are re-derived from the source tables when they are missing
+    or older than reconcile_interval seconds, to correct any drift.
+    """
+    values = dict(conn.execute('SELECT name, value FROM stats_counters').fetchall())
+    reconciled_at = values.get(RECONCILED_AT)
+
+    if reconciled_at is None or time.time() - reconciled_at > reconcile_interval \
+            or not set(COUNTER_QUERIES) <= set(values):
+        values = reconcile(conn)
+
+    stats = {name: int(values[name]) for name in COUNTER_QUERIES if name != 'total_revenue'}
+    stats['total_revenue'] = round(values['total_revenue'], 2)
+    return stats
+
+
+# Counters of tables split across hotel shards; the rest come from the catalog
+SHARDED_COUNTERS = ('total_rooms', 'total_bookings', 'total_revenue', 'pending_bookings')
+
+
+def merge_stats(catalog, shards):
+    """Dashboard totals from the catalog's and every shard's get_stats()"""
+    stats = dict(catalog)
+    for name in SHARDED_COUNTERS:
+        stats[name] = sum(part[name] for part in shards)
+    stats['total_revenue'] = round(stats['total_revenue'], 2)
+    return stats
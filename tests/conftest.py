@@ -0,0 +1,90 @@
+"""
+Test Fixtures
+The app module imported over fresh, migrated database files in tmp_path
+"""
+
+import importlib
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _import_hotel(tmp_path, monkeypatch, shard_count):
+    monkeypatch.setenv('DATABASE_PATH', str(tmp_path / 'hotel_booking.db'))
+    monkeypatch.setenv('SHARD_COUNT', str(shard_count))
+    monkeypatch.delenv('DATABASE_URL', raising=False)
+    monkeypatch.chdir(tmp_path)
+    sys.modules.pop('hotel', None)
+    hotel = importlib.import_module('hotel')
+    hotel.init_db()
+    for path in hotel.SHARD_PATHS:
+        hotel.init_db(path)
+    hotel.app.config['TESTING'] = True
+    return hotel
+
+
+@pytest.fixture
+def app_module(tmp_path, monkeypatch):
+    """hotel imported over one unsharded database"""
+    yield _import_hotel(tmp_path, monkeypatch, 1)
+    sys.modules.pop('hotel', None)
+
+
+@pytest.fixture
+def sharded_app(tmp_path, monkeypatch):
+    """hotel imported with SHARD_COUNT=2"""
+    yield _import_hotel(tmp_path, monkeypatch, 2)
+    sys.modules.pop('hotel', None)
+
+
+@pytest.fixture
+def conn(app_module):
+    """Standalone connection to the unsharded database"""
+    conn = app_module.get_db_connection()
+    yield conn
+    conn.close()
+
+
+def add_guest(conn, email='guest@example.com'):
+    """Insert a guest user; returns its id"""
+    cursor = conn.execute(
+        "INSERT INTO users (name, email, password, role) VALUES ('Guest', ?, 'x', 'guest')", (email,)
+    )
+    conn.commit()
+    return cursor.lastrowid
+
+
+def add_rooms(conn, prices, room_type='Double', capacity=2, hotel_id=None):
+    """Insert a hotel (unless hotel_id is given) with one room per price; returns the room ids"""
+    if hotel_id is None:
+        hotel_id = conn.execute(
+            "INSERT INTO hotels (name, city, address) VALUES ('Test Hotel', 'Testville', '1 Test St')"
+        ).lastrowid
+    room_ids = [conn.execute('''
+        INSERT INTO rooms (hotel_id, room_number, room_type, capacity, price_per_night, status)
+        VALUES (?, ?, ?, ?, ?, 'available')
+    ''', (hotel_id, f'{room_type[0]}{number}', room_type, capacity, price)).lastrowid
+        for number, price in enumerate(prices, 101)]
+    conn.commit()
+    return room_ids
+
+
+def admin_client(app):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = 1
+        session['user_role'] = 'admin'
+        session['user_name'] = 'Admin'
+    return client
+
+
+def guest_client(app, user_id):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = user_id
+        session['user_role'] = 'guest'
+        session['user_name'] = 'Guest'
+    return client
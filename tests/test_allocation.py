@@ -0,0 +1,57 @@
+"""
+Room-Type Allocation
+Search quotes and allocation when the cheapest room of a type is taken
+"""
+
+from datetime import date, timedelta
+
+from conftest import add_guest, add_rooms
+from reservations import reserve_batch, reserve_room
+from search_index import search
+
+CHECK_IN = (date.today() + timedelta(days=30)).isoformat()
+CHECK_OUT = (date.today() + timedelta(days=32)).isoformat()
+
+
+def book(conn, booking_id, user_id, room_id, **options):
+    return reserve_room(conn, booking_id, user_id, room_id, CHECK_IN, CHECK_OUT, **options)
+
+
+def test_dated_search_quotes_the_cheapest_free_room(conn):
+    cheapest, second, _ = add_rooms(conn, [100, 101, 102])
+    book(conn, 'BK1', add_guest(conn), cheapest)
+
+    results = search(conn, {'check_in': CHECK_IN, 'check_out': CHECK_OUT})['results']
+
+    assert [(result['id'], result['nightly_rate'], result['remaining']) for result in results] == [(second, 101, 2)]
+
+
+def test_booking_a_type_whose_cheapest_room_is_taken(conn):
+    cheapest, second, _ = add_rooms(conn, [100, 101, 102])
+    book(conn, 'BK1', add_guest(conn), cheapest)
+
+    # A guest who saw the cheapest room before it went still gets the type
+    booking = book(conn, 'BK2', add_guest(conn, 'late@example.com'), cheapest, allocate=True)
+
+    assert booking['room_id'] == second
+    assert booking['total_price'] == 200
+
+
+def test_allocation_prefers_rooms_at_the_quoted_rate(conn):
+    cheap, _ = add_rooms(conn, [100, 500])
+
+    booking = book(conn, 'BK1', add_guest(conn), cheap, allocate=True)
+
+    assert booking['room_id'] == cheap
+
+
+def test_batch_item_for_a_held_room_gets_a_free_room_of_its_type(conn):
+    held, second, third = add_rooms(conn, [100, 101, 102])
+    book(conn, 'BK1', add_guest(conn), held, hold_seconds=600)
+
+    items = [{'room_id': held, 'check_in': CHECK_IN, 'check_out': CHECK_OUT},
+             {'room_id': held, 'check_in': CHECK_IN, 'check_out': CHECK_OUT}]
+    booked = reserve_batch(conn, ['BK2', 'BK3'], add_guest(conn, 'batch@example.com'), items, allocate=True)
+
+    assert sorted(booking['room_id'] for booking in booked) == [second, third]
+    assert [booking['total_price'] for booking in booked] == [200, 200]
@@ -0,0 +1,39 @@
+"""
+Availability API
+Single and batch availability checks, including rooms that do not exist
+"""
+
+from datetime import date, timedelta
+
+from conftest import add_guest, add_rooms
+from reservations import reserve_room
+
+CHECK_IN = (date.today() + timedelta(days=30)).isoformat()
+CHECK_OUT = (date.today() + timedelta(days=32)).isoformat()
+
+
+def check(app_module, **body):
+    return app_module.app.test_client().post(
+        '/api/check-availability', json=dict(body, check_in_date=CHECK_IN, check_out_date=CHECK_OUT)
+    )
+
+
+def test_batch_reports_unknown_rooms_unavailable(app_module, conn):
+    free, booked = add_rooms(conn, [100, 100])
+    reserve_room(conn, 'BK1', add_guest(conn), booked, CHECK_IN, CHECK_OUT)
+
+    response = check(app_module, room_ids=[free, booked, 9999, str(free)])
+
+    assert response.status_code == 200
+    assert response.get_json() == {
+        'availability': {str(free): True, str(booked): False, '9999': False},
+        'available_room_ids': [free],
+    }
+
+
+def test_single_unknown_room_is_not_found(app_module, conn):
+    room_id = add_rooms(conn, [100])[0]
+
+    assert check(app_module, room_id=room_id).get_json() == {'available': True}
+    assert check(app_module, room_id=9999).status_code == 404
+    assert check(app_module, room_ids=['x']).status_code == 400
@@ -0,0 +1,112 @@
+"""
+Checkout Holds
+Holds block their room until confirmed, released or expired, and are never counted or listed as bookings
+"""
+
+from datetime import date, timedelta
+
+import pytest
+
+from availability import available_room_ids
+from conftest import add_guest, add_rooms
+from export import build_query as export_query
+from pagination import build_query as page_query
+from reservations import (
+    HoldExpiredError, RoomUnavailableError, confirm_hold, release_hold, reserve_room, sweep_expired_holds
+)
+from stats import COUNTER_QUERIES, reconcile
+
+CHECK_IN = (date.today() + timedelta(days=30)).isoformat()
+CHECK_OUT = (date.today() + timedelta(days=32)).isoformat()
+
+
+def counters(conn):
+    values = dict(conn.execute('SELECT name, value FROM stats_counters').fetchall())
+    return {name: values[name] for name in COUNTER_QUERIES}
+
+
+def is_free(conn, room_id):
+    return available_room_ids(conn, [room_id], CHECK_IN, CHECK_OUT) == [room_id]
+
+
+@pytest.fixture
+def held(conn):
+    """(room_id, holding user, hold) with the counters reconciled before the hold"""
+    room_id = add_rooms(conn, [100])[0]
+    user_id = add_guest(conn)
+    reconcile(conn)
+    hold = reserve_room(conn, 'BKHOLD', user_id, room_id, CHECK_IN, CHECK_OUT, hold_seconds=600)
+    return room_id, user_id, hold
+
+
+def test_hold_blocks_the_room(conn, held):
+    room_id, _, hold = held
+
+    assert hold['hold_expires_at'] is not None
+    assert not is_free(conn, room_id)
+    with pytest.raises(RoomUnavailableError):
+        reserve_room(conn, 'BKOTHER', add_guest(conn, 'other@example.com'), room_id, CHECK_IN, CHECK_OUT)
+
+
+def test_confirm_turns_the_hold_into_a_booking(conn, held):
+    room_id, user_id, hold = held
+    before = counters(conn)
+
+    booking = confirm_hold(conn, 'BKHOLD', user_id, room_id, CHECK_IN, CHECK_OUT, 2, 'Late arrival')
+
+    row = conn.execute('SELECT * FROM bookings WHERE booking_id = ?', ('BKHOLD',)).fetchone()
+    assert (row['status'], row['hold_expires_at'], row['number_of_guests']) == ('confirmed', None, 2)
+    assert booking['total_price'] == hold['total_price'] == 200
+    assert counters(conn) == dict(before, total_bookings=before['total_bookings'] + 1,
+                                  total_revenue=before['total_revenue'] + 200)
+    assert conn.execute("SELECT COUNT(*) FROM outbox WHERE event = 'booking.confirmed'").fetchone()[0] == 1
+    assert not is_free(conn, room_id)
+
+
+def test_release_frees_the_room(conn, held):
+    room_id, user_id, _ = held
+
+    assert release_hold(conn, 'BKHOLD', user_id)
+
+    assert is_free(conn, room_id)
+    assert not release_hold(conn, 'BKHOLD', user_id)
+    with pytest.raises(HoldExpiredError):
+        confirm_hold(conn, 'BKHOLD', user_id, room_id, CHECK_IN, CHECK_OUT)
+    reserve_room(conn, 'BKNEXT', add_guest(conn, 'next@example.com'), room_id, CHECK_IN, CHECK_OUT)
+
+
+def test_expired_hold_frees_the_room_and_is_swept(conn, held):
+    room_id, _, _ = held
+    conn.execute("UPDATE bookings SET hold_expires_at = datetime('now', '-1 minute') WHERE booking_id = 'BKHOLD'")
+    conn.commit()
+
+    assert is_free(conn, room_id)
+    assert sweep_expired_holds(conn) == 1
+    assert conn.execute('SELECT COUNT(*) FROM bookings').fetchone()[0] == 0
+
+
+def test_holds_are_not_counted(conn, held):
+    _, user_id, _ = held
+    bookings = ('total_bookings', 'total_revenue', 'pending_bookings')
+
+    assert [counters(conn)[name] for name in bookings] == [0, 0, 0]
+    assert counters(conn) == {name: value for name, value in reconcile(conn).items() if name in COUNTER_QUERIES}
+
+    release_hold(conn, 'BKHOLD', user_id)
+    conn.execute("UPDATE bookings SET hold_expires_at = datetime('now', '-1 minute')")
+    conn.commit()
+    sweep_expired_holds(conn)
+    assert [counters(conn)[name] for name in bookings] == [0, 0, 0]
+
+
+def test_holds_are_not_listed_or_exported(conn, held):
+    _, user_id, _ = held
+    reserve_room(conn, 'BKREAL', add_guest(conn, 'real@example.com'),
+                 add_rooms(conn, [100], hotel_id=1, room_type='Single')[0], CHECK_IN, CHECK_OUT)
+
+    query, params = page_query({})
+    assert [row['booking_id'] for row in conn.execute(query, params)] == ['BKREAL']
+    query, params = page_query({}, user_id=user_id)
+    assert conn.execute(query, params).fetchall() == []
+    query, params = export_query({}, with_names=False)
+    assert [row['booking_id'] for row in conn.execute(query, params)] == ['BKREAL']
@@ -0,0 +1,85 @@
+"""
+Booking Lifecycle
+Archiving keeps the dashboard totals, and every expired pending booking queues one cancellation email
+"""
+
+import json
+
+from conftest import add_guest, add_rooms
+from lifecycle import archive_bookings, complete_stays, expire_pending
+from stats import COUNTER_QUERIES, get_stats, reconcile
+
+
+def add_booking(conn, booking_id, user_id, room_id, status, check_in, check_out, price=200,
+                created_at="datetime('now')"):
+    conn.execute(f'''
+        INSERT INTO bookings (booking_id, user_id, room_id, hotel_id, check_in_date, check_out_date,
+                              number_of_guests, total_price, status, created_at)
+        VALUES (?, ?, ?, (SELECT hotel_id FROM rooms WHERE id = ?), ?, ?, 1, ?, ?, {created_at})
+    ''', (booking_id, user_id, room_id, room_id, check_in, check_out, price, status))
+
+
+def counters(conn):
+    values = dict(conn.execute('SELECT name, value FROM stats_counters').fetchall())
+    return {name: values[name] for name in COUNTER_QUERIES}
+
+
+def test_archiving_keeps_the_dashboard_totals(conn):
+    room_id = add_rooms(conn, [100])[0]
+    user_id = add_guest(conn)
+    for number, status in enumerate(['completed', 'completed', 'cancelled', 'confirmed']):
+        add_booking(conn, f'BK{number}', user_id, room_id, status, f'2020-0{number + 1}-01', f'2020-0{number + 1}-03',
+                    price=100 * (number + 1))
+    add_booking(conn, 'BKNEW', user_id, room_id, 'completed', '2030-01-01', '2030-01-03')
+    conn.commit()
+    reconcile(conn)
+    before = counters(conn)
+
+    # Batches of one exercise the per-batch counter correction
+    assert archive_bookings(conn, older_than_days=365, batch_size=1) == 3
+
+    assert counters(conn) == before
+    assert counters(conn) == {name: value for name, value in reconcile(conn).items() if name in COUNTER_QUERIES}
+    assert get_stats(conn)['total_bookings'] == 5
+    assert get_stats(conn)['total_revenue'] == 100 + 200 + 400 + 200
+    archived = [row[0] for row in conn.execute('SELECT booking_id FROM bookings_archive ORDER BY id')]
+    assert archived == ['BK0', 'BK1', 'BK2']
+    assert [row[0] for row in conn.execute('SELECT booking_id FROM bookings ORDER BY id')] == ['BK3', 'BKNEW']
+
+
+def test_completed_stays_stay_in_revenue(conn):
+    room_id = add_rooms(conn, [100])[0]
+    add_booking(conn, 'BK1', add_guest(conn), room_id, 'confirmed', '2020-01-01', '2020-01-03')
+    conn.commit()
+    reconcile(conn)
+    before = counters(conn)
+
+    assert complete_stays(conn) == 1
+
+    assert counters(conn) == before
+
+
+def test_each_expired_booking_queues_one_cancellation(conn):
+    room_id = add_rooms(conn, [100])[0]
+    user_id = add_guest(conn)
+    stale = "datetime('now', '-2 days')"
+    add_booking(conn, 'BKOLD1', user_id, room_id, 'pending', '2030-01-01', '2030-01-03', created_at=stale)
+    add_booking(conn, 'BKOLD2', user_id, room_id, 'pending', '2030-02-01', '2030-02-03', created_at=stale)
+    add_booking(conn, 'BKPAST', user_id, room_id, 'pending', '2020-01-01', '2020-01-03')
+    add_booking(conn, 'BKFRESH', user_id, room_id, 'pending', '2030-03-01', '2030-03-03')
+    add_booking(conn, 'BKDONE', user_id, room_id, 'confirmed', '2030-04-01', '2030-04-03', created_at=stale)
+    conn.commit()
+    reconcile(conn)
+    pending = counters(conn)['pending_bookings']
+
+    assert expire_pending(conn, older_than_hours=24, batch_size=2) == 3
+
+    statuses = dict(conn.execute('SELECT booking_id, status FROM bookings').fetchall())
+    assert statuses == {'BKOLD1': 'cancelled', 'BKOLD2': 'cancelled', 'BKPAST': 'cancelled',
+                        'BKFRESH': 'pending', 'BKDONE': 'confirmed'}
+    events = [(row[0], json.loads(row[1])['booking_id']) for row in conn.execute('SELECT event, payload FROM outbox')]
+    assert sorted(events) == [('booking.cancelled', 'BKOLD1'), ('booking.cancelled', 'BKOLD2'),
+                              ('booking.cancelled', 'BKPAST')]
+    assert counters(conn)['pending_bookings'] == pending - 3
+    assert expire_pending(conn) == 0
+    assert conn.execute('SELECT COUNT(*) FROM outbox').fetchone()[0] == 3
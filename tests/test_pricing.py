@@ -0,0 +1,106 @@
+"""
+Rate Calendars
+Incremental calendar refreshes match a full recompute, and quotes match the stay_rate SQL function
+"""
+
+from datetime import date, timedelta
+
+from conftest import add_guest, add_rooms
+from pricing import (
+    CALENDAR_DAYS, add_rule, delete_rule, hotel_occupancy, load_rules, nightly_rates, quote, refresh
+)
+
+TODAY = date.today()
+
+
+def recomputed(conn):
+    """{room_id: (base_price, rates)} as a full rebuild from today would write them"""
+    rules = load_rules(conn)
+    calendars = {}
+    for room in conn.execute('SELECT id, hotel_id, room_type, price_per_night FROM rooms'):
+        occupancy = hotel_occupancy(conn, room['hotel_id'], TODAY, CALENDAR_DAYS)
+        calendars[room['id']] = (room['price_per_night'],
+                                 nightly_rates(room, TODAY, CALENDAR_DAYS, rules, occupancy).tobytes())
+    return calendars
+
+
+def stored(conn):
+    return {row['room_id']: (row['base_price'], row['rates'])
+            for row in conn.execute('SELECT room_id, base_price, rates FROM rate_calendar')}
+
+
+def refreshed(conn):
+    """Drain the change queue incrementally; returns the calendars afterwards"""
+    refresh(conn, today=TODAY)
+    assert conn.execute('SELECT COUNT(*) FROM rate_dirty').fetchone()[0] == 0
+    return stored(conn)
+
+
+def test_incremental_refresh_matches_a_full_recompute(conn):
+    doubles = add_rooms(conn, [100, 150])
+    singles = add_rooms(conn, [80], room_type='Single', hotel_id=1)
+    other = add_rooms(conn, [200])
+    assert refreshed(conn) == recomputed(conn)
+    unchanged = stored(conn)
+
+    season = add_rule(conn, {'kind': 'season', 'hotel_id': 1, 'adjustment': 20,
+                             'start_date': (TODAY + timedelta(days=10)).isoformat(),
+                             'end_date': (TODAY + timedelta(days=40)).isoformat()})
+    after_season = refreshed(conn)
+    assert after_season == recomputed(conn)
+    assert after_season[doubles[0]] != unchanged[doubles[0]]
+    assert after_season[other[0]] == unchanged[other[0]]
+
+    add_rule(conn, {'kind': 'weekday', 'room_type': 'Single', 'weekdays': [4, 5],
+                    'adjustment_type': 'amount', 'adjustment': 15, 'priority': 1})
+    assert refreshed(conn) == recomputed(conn)
+
+    add_rule(conn, {'kind': 'occupancy', 'hotel_id': 1, 'min_occupancy': 0.25, 'adjustment': 10})
+    assert refreshed(conn) == recomputed(conn)
+    conn.execute('''
+        INSERT INTO bookings (booking_id, user_id, room_id, hotel_id, check_in_date, check_out_date,
+                              number_of_guests, total_price, status)
+        VALUES ('BK1', ?, ?, 1, ?, ?, 1, 300, 'confirmed')
+    ''', (add_guest(conn), doubles[0], (TODAY + timedelta(days=20)).isoformat(),
+          (TODAY + timedelta(days=23)).isoformat()))
+    conn.commit()
+    assert refreshed(conn) == recomputed(conn)
+
+    conn.execute('UPDATE rooms SET price_per_night = 125 WHERE id = ?', (doubles[1],))
+    conn.execute("UPDATE rooms SET room_type = 'Double' WHERE id = ?", (singles[0],))
+    conn.commit()
+    assert refreshed(conn) == recomputed(conn)
+
+    assert delete_rule(conn, season)
+    assert refreshed(conn) == recomputed(conn)
+    assert refresh(conn, full=True, today=TODAY) == 0
+
+
+def test_quotes_match_the_calendar_and_stay_rate(conn):
+    room_id = add_rooms(conn, [100])[0]
+    add_rule(conn, {'kind': 'weekday', 'weekdays': [5, 6], 'adjustment': 50})
+    add_rule(conn, {'kind': 'length_of_stay', 'min_nights': 7, 'adjustment': -10})
+    refresh(conn, today=TODAY)
+    room = conn.execute('SELECT id, hotel_id, room_type, price_per_night FROM rooms WHERE id = ?',
+                        (room_id,)).fetchone()
+    check_in = (TODAY + timedelta(days=5)).isoformat()
+    check_out = (TODAY + timedelta(days=12)).isoformat()
+
+    stay = quote(conn, room, check_in, check_out)
+    sql_rate = conn.execute('''
+        SELECT stay_rate(rc.rates, rc.start_date, r.price_per_night, ?, ?)
+        FROM rooms r LEFT JOIN rate_calendar rc ON rc.room_id = r.id WHERE r.id = ?
+    ''', (check_in, check_out, room_id)).fetchone()[0]
+
+    assert stay['subtotal'] == 100 * 5 + 150 * 2
+    assert stay['total'] == round(stay['subtotal'] * 0.9, 2)
+    assert sql_rate == round(stay['subtotal'] / 7, 2)
+
+    # A price change not yet refreshed is quoted from the rules, not the stale calendar
+    conn.execute('UPDATE rooms SET price_per_night = 120 WHERE id = ?', (room_id,))
+    conn.commit()
+    repriced = dict(room, price_per_night=120)
+    before_refresh = quote(conn, repriced, check_in, check_out)
+    refresh(conn, today=TODAY)
+    assert before_refresh == quote(conn, repriced, check_in, check_out)
+    assert before_refresh['subtotal'] == 120 * 5 + 180 * 2
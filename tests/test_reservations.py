@@ -0,0 +1,75 @@
+"""
+Reservation Commit Path
+Concurrent bookings of one room under BEGIN IMMEDIATE, through the busy retry path
+"""
+
+import threading
+import time
+from datetime import date, timedelta
+
+import pytest
+
+import reservations
+from conftest import add_guest, add_rooms
+from database import DEFAULT_PRAGMAS, connect
+from reservations import ReservationBusyError, RoomUnavailableError, reserve_room
+
+CHECK_IN = (date.today() + timedelta(days=30)).isoformat()
+CHECK_OUT = (date.today() + timedelta(days=33)).isoformat()
+
+# Fail at once on a locked database, so every wait goes through _write's retries
+NO_WAIT = dict(DEFAULT_PRAGMAS, busy_timeout=0)
+
+
+def test_parallel_bookings_of_one_room_never_overlap(app_module, conn, monkeypatch):
+    room_id = add_rooms(conn, [100])[0]
+    user_ids = [add_guest(conn, f'guest{number}@example.com') for number in range(8)]
+    retries = []
+    real_backoff = reservations._backoff
+    monkeypatch.setattr(reservations, '_backoff', lambda attempt: (retries.append(attempt), real_backoff(attempt)))
+
+    outcomes = {}
+    start = threading.Barrier(len(user_ids))
+
+    def book(user_id):
+        worker = connect(app_module.DATABASE, NO_WAIT)
+        start.wait()
+        try:
+            # Overlapping stays: the same dates shifted by a night for odd guests
+            check_in = CHECK_IN if user_id % 2 else (date.fromisoformat(CHECK_IN) + timedelta(days=1)).isoformat()
+            reserve_room(worker, f'BK{user_id}', user_id, room_id, check_in, CHECK_OUT, max_retries=50)
+            outcomes[user_id] = 'booked'
+        except RoomUnavailableError:
+            outcomes[user_id] = 'unavailable'
+        finally:
+            worker.close()
+
+    # Hold the write lock while the bookings start, so each of them meets a busy database
+    conn.execute('BEGIN IMMEDIATE')
+    threads = [threading.Thread(target=book, args=(user_id,)) for user_id in user_ids]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.2)
+    conn.rollback()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(outcomes.values()) == ['booked'] + ['unavailable'] * (len(user_ids) - 1)
+    assert len(retries) >= len(user_ids)
+    assert conn.execute('SELECT COUNT(*) FROM bookings WHERE room_id = ?', (room_id,)).fetchone()[0] == 1
+
+
+def test_booking_gives_up_when_the_database_stays_locked(app_module, conn):
+    room_id = add_rooms(conn, [100])[0]
+    user_id = add_guest(conn)
+    worker = connect(app_module.DATABASE, NO_WAIT)
+
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        with pytest.raises(ReservationBusyError):
+            reserve_room(worker, 'BK1', user_id, room_id, CHECK_IN, CHECK_OUT, max_retries=1)
+    finally:
+        conn.rollback()
+        worker.close()
+
+    assert conn.execute('SELECT COUNT(*) FROM bookings').fetchone()[0] == 0
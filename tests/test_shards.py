@@ -0,0 +1,162 @@
+"""
+Hotel Shards
+Splitting, routing and fan-out across two hotel shards
+"""
+
+import json
+import sqlite3
+
+from conftest import add_guest, add_rooms, admin_client
+
+
+def test_requeue_dead_events_of_one_shard(sharded_app):
+    for path in sharded_app.SHARD_PATHS:
+        conn = sqlite3.connect(path)
+        conn.execute("INSERT INTO outbox (event, payload, available_at, status) "
+                     "VALUES ('booking.cancelled', '{}', 0, 'dead')")
+        conn.commit()
+        conn.close()
+
+    response = admin_client(sharded_app.app).post('/admin/outbox/requeue', json={'shard': 1})
+
+    assert response.status_code == 200
+    assert response.get_json() == {'success': True, 'requeued': 1}
+    statuses = [sqlite3.connect(path).execute('SELECT status FROM outbox').fetchone()[0]
+                for path in sharded_app.SHARD_PATHS]
+    assert statuses == ['dead', 'pending']
+
+
+def split_catalog(hotel, bookings_per_hotel=3):
+    """Two hotels (ids 1 and 2) with rooms and bookings in the catalog, split across the shards.
+
+    Returns {hotel_id: (room_ids, booking_ids)}; bookings of the two
+    hotels interleave in created_at.
+    """
+    catalog = hotel.get_db_connection()
+    user_id = add_guest(catalog)
+    made = {}
+    for hotel_id in (1, 2):
+        room_ids = add_rooms(catalog, [100, 120])
+        assert catalog.execute('SELECT hotel_id FROM rooms WHERE id = ?', (room_ids[0],)).fetchone()[0] == hotel_id
+        made[hotel_id] = (room_ids, [])
+    for number in range(bookings_per_hotel * 2):
+        hotel_id = 1 + number % 2
+        booking_id = f'BK{number:03d}'
+        catalog.execute('''
+            INSERT INTO bookings (booking_id, user_id, room_id, hotel_id, check_in_date, check_out_date,
+                                  number_of_guests, total_price, status, created_at)
+            VALUES (?, ?, ?, ?, '2030-01-01', '2030-01-03', 1, 200, 'confirmed', ?)
+        ''', (booking_id, user_id, made[hotel_id][0][0], hotel_id, f'2026-01-01 00:00:{number:02d}'))
+        made[hotel_id][1].append(booking_id)
+    catalog.commit()
+
+    conns = hotel.get_booking_connections()
+    try:
+        moved = hotel.split_shards(catalog, conns)
+    finally:
+        for conn in conns:
+            conn.close()
+    catalog.close()
+    assert moved == [2 + bookings_per_hotel, 2 + bookings_per_hotel]
+    return made
+
+
+def test_split_moves_each_hotel_to_its_shard(sharded_app):
+    made = split_catalog(sharded_app)
+
+    catalog = sqlite3.connect(sharded_app.DATABASE)
+    assert catalog.execute('SELECT COUNT(*) FROM rooms').fetchone()[0] == 0
+    assert catalog.execute('SELECT COUNT(*) FROM bookings').fetchone()[0] == 0
+    assert dict(catalog.execute('SELECT room_id, hotel_id FROM room_shards').fetchall()) == {
+        room_id: hotel_id for hotel_id, (room_ids, _) in made.items() for room_id in room_ids
+    }
+    for index, path in enumerate(sharded_app.SHARD_PATHS):
+        shard = sqlite3.connect(path)
+        hotel_id = 2 if index == 0 else 1
+        assert [row[0] for row in shard.execute('SELECT id FROM rooms ORDER BY id')] == made[hotel_id][0]
+        assert [row[0] for row in shard.execute('SELECT booking_id FROM bookings ORDER BY id')] == made[hotel_id][1]
+        # Catalog users and hotels are mirrored to every shard
+        assert shard.execute('SELECT COUNT(*) FROM hotels').fetchone()[0] == 2
+
+
+def test_rooms_and_bookings_route_to_their_hotel_shard(sharded_app):
+    made = split_catalog(sharded_app)
+
+    with sharded_app.app.test_request_context():
+        for hotel_id, (room_ids, booking_ids) in made.items():
+            shard = sharded_app.shard_db(hotel_id % 2)
+            assert sharded_app.hotel_db(hotel_id) is shard
+            assert sharded_app.room_db(room_ids[1]) is shard
+            assert sharded_app.room_db(str(room_ids[1])) is shard
+            assert sharded_app.booking_db(booking_ids[0]) is shard
+        catalog = sharded_app.get_db()
+        assert sharded_app.room_db(9999) is catalog
+        assert sharded_app.booking_db('BK-missing') is catalog
+
+
+def test_fan_out_runs_on_every_shard_in_order(sharded_app):
+    split_catalog(sharded_app)
+
+    with sharded_app.app.test_request_context():
+        counts = sharded_app.fan_out(
+            lambda conn: conn.execute('SELECT hotel_id, COUNT(*) FROM rooms GROUP BY hotel_id').fetchall()
+        )
+    assert [[tuple(row) for row in rows] for rows in counts] == [[(2, 2)], [(1, 2)]]
+
+
+def test_fan_out_without_shards_runs_on_the_database(app_module):
+    with app_module.app.test_request_context():
+        assert app_module.fan_out(lambda conn: conn is app_module.get_db()) == [True]
+
+
+def test_booking_pages_merge_shards_newest_first(sharded_app):
+    made = split_catalog(sharded_app)
+    client = admin_client(sharded_app.app)
+
+    seen, cursor = [], None
+    while True:
+        response = client.get('/api/admin/bookings?per_page=2' + (f'&cursor={cursor}' if cursor else ''))
+        assert response.status_code == 200
+        page = response.get_json()
+        assert len(page['bookings']) <= 2
+        seen += [booking['booking_id'] for booking in page['bookings']]
+        cursor = page['next_cursor']
+        if not cursor:
+            break
+
+    assert seen == sorted(made[1][1] + made[2][1], reverse=True)
+
+
+def test_hotel_filtered_page_reads_one_shard(sharded_app):
+    made = split_catalog(sharded_app)
+
+    response = admin_client(sharded_app.app).get('/api/admin/bookings?hotel_id=2')
+
+    assert [booking['booking_id'] for booking in response.get_json()['bookings']] == made[2][1][::-1]
+
+
+def test_export_covers_every_shard(sharded_app):
+    made = split_catalog(sharded_app)
+
+    response = admin_client(sharded_app.app).get('/admin/bookings/export?format=ndjson&names=0')
+
+    assert response.status_code == 200
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert sorted(row['booking_id'] for row in rows) == sorted(made[1][1] + made[2][1])
+
+
+def test_rate_calendar_stats_cover_every_shard(sharded_app):
+    split_catalog(sharded_app)
+    client = admin_client(sharded_app.app)
+    assert client.post('/admin/rates/rebuild').status_code == 200
+
+    calendar = client.get('/admin/rates').get_json()['calendar']
+
+    rooms, size = 0, 0
+    for path in sharded_app.SHARD_PATHS:
+        shard = sqlite3.connect(path)
+        count, total = shard.execute('SELECT COUNT(*), SUM(length(rates)) FROM rate_calendar').fetchone()
+        assert count == 2
+        rooms, size = rooms + count, size + total
+    assert (calendar['rooms'], calendar['bytes']) == (rooms, size)
+    assert calendar['oldest_start_date'] is not None
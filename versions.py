@@ -0,0 +1,116 @@
+"""
+Change Versions
+Per-hotel and per-room change counters, plus global catalog/bookings versions
+"""
+
+from datetime import datetime, timezone
+
+CATALOG = 'catalog'
+BOOKINGS = 'bookings'
+
+# Triggers bump a row's version and updated_at on every change, a hotel's
+# version whenever one of its rooms or reviews changes, and the global
+# counters for any catalog or booking write. The WHEN guards stop the
+# version-bumping UPDATEs from re-firing the triggers.
+SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS change_versions (
+        name TEXT PRIMARY KEY,
+        value INTEGER NOT NULL DEFAULT 0
+    );
+    INSERT OR IGNORE INTO change_versions (name, value) VALUES ('catalog', 1), ('bookings', 1);
+
+    CREATE TRIGGER IF NOT EXISTS versions_hotels_insert AFTER INSERT ON hotels BEGIN
+        UPDATE change_versions SET value = value + 1 WHERE name = 'catalog';
+    END;
+    CREATE TRIGGER IF NOT EXISTS versions_hotels_update AFTER UPDATE ON hotels
+    WHEN NEW.version = OLD.version BEGIN
+        UPDATE hotels SET version = OLD.version + 1, updated_at = CURRENT_TIMESTAMP WHERE id = NEW.id;
+        UPDATE change_versions SET value = value + 1 WHERE name = 'catalog';
+    END;
+    CREATE TRIGGER IF NOT EXISTS versions_hotels_delete AFTER DELETE ON hotels BEGIN
+        UPDATE change_versions SET value = value + 1 WHERE name = 'catalog';
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS versions_rooms_insert AFTER INSERT ON rooms BEGIN
+        UPDATE hotels SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE id = NEW.hotel_id;
+        UPDATE change_versions SET value = value + 1 WHERE name = 'catalog';
+    END;
+    CREATE TRIGGER IF NOT EXISTS versions_rooms_update AFTER UPDATE ON rooms
+    WHEN NEW.version = OLD.version BEGIN
+        UPDATE rooms SET version = OLD.version + 1, updated_at = CURRENT_TIMESTAMP WHERE id = NEW.id;
+        UPDATE hotels SET version = version + 1, updated_at = CURRENT_TIMESTAMP
+        WHERE id IN (OLD.hotel_id, NEW.hotel_id);
+        UPDATE change_versions SET value = value + 1 WHERE name = 'catalog';
+    END;
+    CREATE TRIGGER IF NOT EXISTS versions_rooms_delete AFTER DELETE ON rooms BEGIN
+        UPDATE hotels SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE id = OLD.hotel_id;
+        UPDATE change_versions SET value = value + 1 WHERE name = 'catalog';
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS versions_reviews_insert AFTER INSERT ON reviews BEGIN
+        UPDATE rooms SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE id = NEW.room_id;
+        UPDATE hotels SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE id = NEW.hotel_id;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS versions_bookings_insert AFTER INSERT ON bookings BEGIN
+        UPDATE change_versions SET value = value + 1 WHERE name = 'bookings';
+    END;
+    CREATE TRIGGER IF NOT EXISTS versions_bookings_update AFTER UPDATE ON bookings BEGIN
+        UPDATE change_versions SET value = value + 1 WHERE name = 'bookings';
+    END;
+    CREATE TRIGGER IF NOT EXISTS versions_bookings_delete AFTER DELETE ON bookings BEGIN
+        UPDATE change_versions SET value = value + 1 WHERE name = 'bookings';
+    END;
+'''
+
+
+def _columns(conn, table):
+    return {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+
+
+def init_versions(conn):
+    """Add version/updated_at columns where missing, then the counters and triggers"""
+    if 'version' not in _columns(conn, 'hotels'):
+        conn.execute('ALTER TABLE hotels ADD COLUMN version INTEGER NOT NULL DEFAULT 1')
+    if 'updated_at' not in _columns(conn, 'hotels'):
+        # ADD COLUMN cannot default to CURRENT_TIMESTAMP; backfill instead
+        conn.execute('ALTER TABLE hotels ADD COLUMN updated_at TIMESTAMP')
+        conn.execute('UPDATE hotels SET updated_at = COALESCE(created_at, CURRENT_TIMESTAMP)')
+    if 'version' not in _columns(conn, 'rooms'):
+        conn.execute('ALTER TABLE rooms ADD COLUMN version INTEGER NOT NULL DEFAULT 1')
+    conn.commit()
+    conn.executescript(SCHEMA)
+
+
+def parse_timestamp(value):
+    """SQLite CURRENT_TIMESTAMP text (UTC) as an aware datetime"""
+    if not value:
+        return None
+    try:
+        return datetime.strptime(str(value)[:19], '%Y-%m-%d %H:%M:%S').replace(tzinfo=timezone.utc)
+    except ValueError:
+        return None
+
+
+def hotel_version(conn, hotel_id):
+    """(version, updated_at) of a hotel, or None if it does not exist"""
+    row = conn.execute('SELECT version, updated_at FROM hotels WHERE id = ?', (hotel_id,)).fetchone()
+    return (row[0], parse_timestamp(row[1])) if row else None
+
+
+def room_version(conn, room_id):
+    """(room version, hotel version, latest updated_at) of a room, or None"""
+    row = conn.execute('''
+        SELECT r.version, h.version, MAX(COALESCE(r.updated_at, ''), COALESCE(h.updated_at, ''))
+        FROM rooms r JOIN hotels h ON h.id = r.hotel_id
+        WHERE r.id = ?
+    ''', (room_id,)).fetchone()
+    return (row[0], row[1], parse_timestamp(row[2])) if row else None
+
+
+def global_versions(conn, *names):
+    """{name: value} for the requested global counters"""
+    placeholders = ', '.join('?' for _ in names)
+    return dict(conn.execute(
+        f'SELECT name, value FROM change_versions WHERE name IN ({placeholders})', names
+    ).fetchall())